@@ -0,0 +1,55 @@
+"""
+Measures how long it takes to import the pipeline modules in a fresh interpreter.
+
+Each module is imported in a new Python process, so every run pays the full cold
+import cost, including anything the module does at import time. Run from the
+repository root:
+
+    python -m benchmarks.startup_time [--runs 5]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+# Modules imported by main.py, ui.py and uis.py at startup
+MODULES = [
+    'src.rogue_record_generator',
+    'src.data_cleaner',
+    'src.upload_to_gcs'
+]
+
+
+def time_import(module, runs):
+    """Return the wall times, in seconds, of importing `module` in `runs` fresh interpreters."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', f'import {module}'], capture_output=True, text=True)
+        timings.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help="Number of fresh interpreters per module.")
+    args = parser.parse_args()
+
+    baseline = statistics.median(time_import('pandas', args.runs))
+    print(f"{'module':<30} {'median (s)':>10} {'min (s)':>10} {'over pandas (s)':>16}")
+    print(f"{'pandas':<30} {baseline:>10.3f}")
+    for module in MODULES:
+        try:
+            timings = time_import(module, args.runs)
+        except RuntimeError as e:
+            print(f"{module:<30} {'failed':>10}  {str(e).strip().splitlines()[-1]}")
+            continue
+        median = statistics.median(timings)
+        print(f"{module:<30} {median:>10.3f} {min(timings):>10.3f} {median - baseline:>16.3f}")
+
+
+if __name__ == "__main__":
+    main()
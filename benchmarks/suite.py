@@ -0,0 +1,196 @@
+"""
+Benchmarks each pipeline stage and flags regressions against a stored baseline.
+
+Every stage runs at each size (10k, 1M and 10M rows by default): record generation,
+each DataCleaner.clean_* step on its own, the full cleaning chain, reading a raw
+file, save_cleaned_data and GCSUploader.upload_file against a local fake bucket
+(LocalFileSystemBackend). For each stage and size the best wall time of `--repeat`
+runs gives the throughput in rows/s (and MB/s for stages that move a file), and a
+separate run under tracemalloc gives the peak memory allocated by the stage.
+
+Results are written as JSON. With a baseline (by default benchmarks/baseline.json,
+if it exists), any stage whose throughput dropped, or whose peak memory grew, by
+more than `--threshold` is flagged and the exit status is 1. Run from the
+repository root:
+
+    python -m benchmarks.suite [--sizes 10000,1000000] [--repeat 3] [--save-baseline]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from src.data_cleaner import DataCleaner
+from src.file_io import read_frame
+from src.rogue_record_generator import RogueRecordGenerator
+from src.storage_backends import LocalFileSystemBackend
+from src.upload_ledger import UploadLedger
+from src.upload_to_gcs import GCSUploader
+
+DEFAULT_SIZES = [10_000, 1_000_000, 10_000_000]
+DEFAULT_BASELINE_PATH = os.path.join('benchmarks', 'baseline.json')
+DEFAULT_OUTPUT_PATH = os.path.join('benchmarks', 'results.json')
+
+# Relative change, e.g. 0.2 = 20%, beyond which a stage counts as a regression
+DEFAULT_THRESHOLD = 0.2
+
+# Cleaning steps benchmarked one by one
+CLEANING_STEPS = ['clean_missing_customer_name', 'clean_invalid_payment_type', 'clean_negative_qty',
+                  'clean_datetime_format']
+
+
+def build_stages(num_records, work_dir):
+    """
+    Return the stages to benchmark at `num_records` rows as (name, function, file path or None) tuples.
+
+    The inputs every stage needs (raw DataFrame, raw file, cleaned DataFrame) are built once
+    up front, so each stage measures only its own work.
+    """
+    raw_df = RogueRecordGenerator(num_records=num_records, seed=42).generate_records()
+    raw_path = os.path.join(work_dir, 'rogue_bench.csv')
+    raw_df.to_csv(raw_path, index=False)
+    raw_df = read_frame(raw_path)
+    cleaned_df = DataCleaner(raw_df).apply_cleaning_steps().get_cleaned_data()
+
+    uploader = GCSUploader(backend=LocalFileSystemBackend(os.path.join(work_dir, 'bucket')),
+                           ledger=UploadLedger(os.path.join(work_dir, 'upload_ledger.json')))
+
+    stages = [
+        ('generate_records', lambda: RogueRecordGenerator(num_records=num_records, seed=42).generate_records(), None),
+        ('read_raw_csv', lambda: read_frame(raw_path), raw_path)
+    ]
+    for step in CLEANING_STEPS:
+        stages.append((step, lambda step=step: getattr(DataCleaner(raw_df), step)().get_cleaned_data(), None))
+    stages += [
+        ('apply_cleaning_steps', lambda: DataCleaner(raw_df).apply_cleaning_steps().get_cleaned_data(), None),
+        ('save_cleaned_data', lambda: DataCleaner(cleaned_df).save_cleaned_data(
+            os.path.join(work_dir, 'cleaned', 'cleaned.csv')), None),
+        ('upload_file', lambda: uploader.upload_file('bench-bucket', raw_path, 'rogue_bench.csv',
+                                                     skip_unchanged=False), raw_path)
+    ]
+    return stages
+
+
+def measure(func, repeat):
+    """Return the best wall time, in seconds, of `repeat` runs and the peak memory, in bytes, of one traced run."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    # Traced separately, as tracemalloc slows allocation-heavy code down
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(timings), peak
+
+
+def run_suite(sizes, repeat):
+    """Run every stage at every size and return the results keyed by 'stage@rows'."""
+    results = {}
+    for num_records in sizes:
+        with tempfile.TemporaryDirectory() as work_dir:
+            # Run inside the scratch folder, so files the stages write (catalog, manifests) stay out of 'data'
+            previous_dir = os.getcwd()
+            os.chdir(work_dir)
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    stages = build_stages(num_records, work_dir)
+                for name, func, file_path in stages:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        seconds, peak = measure(func, repeat)
+                    result = {
+                        'rows': num_records,
+                        'seconds': seconds,
+                        'rows_per_second': num_records / seconds,
+                        'peak_mb': peak / 1e6
+                    }
+                    if file_path:
+                        result['mb_per_second'] = os.path.getsize(file_path) / 1e6 / seconds
+                    results[f"{name}@{num_records}"] = result
+                    print(f"{name:<30} {num_records:>10} {seconds:>10.3f} {result['rows_per_second']:>14,.0f} "
+                          f"{result['peak_mb']:>10.1f}")
+            finally:
+                os.chdir(previous_dir)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Return a description of every stage that is slower or uses more memory than the baseline beyond `threshold`."""
+    regressions = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        throughput_change = result['rows_per_second'] / reference['rows_per_second'] - 1
+        if throughput_change < -threshold:
+            regressions.append(f"{key}: throughput {throughput_change:+.0%} "
+                               f"({reference['rows_per_second']:,.0f} -> {result['rows_per_second']:,.0f} rows/s)")
+        if reference['peak_mb'] > 0:
+            memory_change = result['peak_mb'] / reference['peak_mb'] - 1
+            if memory_change > threshold:
+                regressions.append(f"{key}: peak memory {memory_change:+.0%} "
+                                   f"({reference['peak_mb']:.1f} -> {result['peak_mb']:.1f} MB)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help="Comma-separated row counts to run every stage at.")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per stage; the best one counts.")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT_PATH, help="JSON file receiving the results.")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE_PATH, help="JSON results to compare against.")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Relative change flagged as a regression (0.2 = 20%%).")
+    parser.add_argument('--save-baseline', action='store_true', help="Also store the results as the new baseline.")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    output_path, baseline_path = os.path.abspath(args.output), os.path.abspath(args.baseline)
+
+    print(f"{'stage':<30} {'rows':>10} {'best (s)':>10} {'rows/s':>14} {'peak (MB)':>10}")
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'environment': {'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+                        'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'results': run_suite(sizes, args.repeat)
+    }
+
+    with open(output_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to '{output_path}'.")
+
+    regressions = []
+    if os.path.exists(baseline_path) and not args.save_baseline:
+        with open(baseline_path) as f:
+            regressions = compare(report['results'], json.load(f)['results'], args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%} against '{baseline_path}':")
+            for regression in regressions:
+                print(f"  REGRESSION {regression}")
+        else:
+            print(f"No regressions beyond {args.threshold:.0%} against '{baseline_path}'.")
+
+    if args.save_baseline:
+        with open(baseline_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to '{baseline_path}'.")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,28 @@
 import streamlit as st
-import pandas as pd
 import os
 from datetime import datetime
 from src.rogue_record_generator import RogueRecordGenerator
-from src.data_cleaner import DataCleaner
+from src.data_cleaner import clean_pending_files, clean_raw_file
 from src.data_cleaner import get_latest_rogue_csv_file
-from src.upload_to_gcs import GCSUploader  # Import the GCSUploader from the upload_to_gcs module
+from src.catalog import find_latest_artifact, record_artifact  # Files written here are added to the artifact catalog
+from src.upload_to_gcs import get_uploader  # Shared GCSUploader from the upload_to_gcs module
+from src.cache import invalidate, load_cleaned_frame, load_frame  # Cached across Streamlit reruns
+from src.jobs import get_job_runner, pipeline_stage, upload_stage  # Background jobs shared by all sessions
+from src.metrics import export_metrics, registry, set_memory_tracing  # Per-stage timings of this process
+from src.rollups import ROLLUPS, RollupStore  # Precomputed aggregates of the cleaned files
+
+
+def upload_unless_present(uploader, bucket_name, file_path, destination_blob_name):
+    """Upload a file unless its content is already in the bucket, and report which happened."""
+    # The blob names below are timestamped, so look the content up under any name
+    existing_blob_name = uploader.find_existing_blob(bucket_name, file_path)
+    if existing_blob_name:
+        st.info(f"'{file_path}' is already in GCS as {existing_blob_name}, upload skipped.")
+    elif uploader.upload_file(bucket_name, file_path, destination_blob_name, skip_unchanged=False):
+        st.success(f"Uploaded {destination_blob_name} to GCS.")
+    else:
+        st.error(f"Uploading '{file_path}' failed.")
+
 
 # Title of the app
 st.markdown("<h1 style='text-align: center;'>E-Com Data Analytics Workflow</h1>", unsafe_allow_html=True)
@@ -38,6 +55,8 @@ with col1:
                 filename = f"rogue_{timestamp}.csv"
                 # Save to the specified directory
                 rogue_df.to_csv(os.path.join('data', 'raw', filename), index=False)
+                record_artifact(os.path.join('data', 'raw', filename), 'raw', rows=len(rogue_df))
+                invalidate(os.path.join('data', 'raw', filename))
 
                 st.success(f"Rogue records generated and saved to 'data/raw/{filename}'")
             except Exception as e:
@@ -48,23 +67,50 @@ with col1:
         try:
             latest_csv_path = get_latest_rogue_csv_file()
             if latest_csv_path:
-                df_with_rogue_records = pd.read_csv(latest_csv_path)
-                cleaner = DataCleaner(df_with_rogue_records)
-
-                cleaner.perform_eda()\
-                       .clean_missing_customer_name()\
-                       .clean_invalid_payment_type()\
-                       .clean_negative_qty()\
-                       .clean_datetime_format()
-
-                cleaned_file_path = 'data/cleaned/cleaned.csv'
-                cleaner.save_cleaned_data(cleaned_file_path)
-                st.success(f"Data cleaned and saved to '{cleaned_file_path}'")
+                # Raw files that were already cleaned are skipped and their cleaned output reused
+                cleaned_file_path = clean_raw_file(latest_csv_path, 'data/cleaned/cleaned.csv')
+                if cleaned_file_path:
+                    invalidate(cleaned_file_path)
+                    st.success(f"Data cleaned and saved to '{cleaned_file_path}'")
+                else:
+                    st.error(f"Cleaning '{latest_csv_path}' failed.")
             else:
                 st.warning("No rogue files found to process.")
         except Exception as e:
             st.error(f"Error: {str(e)}")
 
+    # Clean every raw file that has not been cleaned yet, in parallel
+    if st.button("Clean All Pending Files", key="clean_all_pending"):
+        try:
+            results = clean_pending_files('data/raw', 'data/cleaned/cleaned.csv')
+            invalidate('data/cleaned')
+            failed = [raw_path for raw_path, cleaned_path in results.items() if not cleaned_path]
+            if not results:
+                st.info("All raw files are already cleaned.")
+            elif failed:
+                st.error(f"Cleaning failed for: {', '.join(failed)}")
+            else:
+                st.success(f"Cleaned {len(results)} raw file(s) into 'data/cleaned'.")
+        except Exception as e:
+            st.error(f"Error: {str(e)}")
+
+    # Preview the latest raw file; it is loaded and cleaned once, then served from the cache on reruns
+    if st.button("Preview Latest Data", key="preview_latest"):
+        st.session_state.show_preview = True
+
+    if st.session_state.get("show_preview", False):
+        try:
+            latest_csv_path = get_latest_rogue_csv_file()
+            if latest_csv_path:
+                raw_df = load_frame(latest_csv_path)
+                cleaned_df = load_cleaned_frame(latest_csv_path)
+                st.write(f"'{latest_csv_path}': {len(raw_df)} rows, {len(cleaned_df)} after cleaning.")
+                st.dataframe(cleaned_df.head(20))
+            else:
+                st.warning("No rogue files found to preview.")
+        except Exception as e:
+            st.error(f"Error: {str(e)}")
+
 # Row 3: Upload to GCS
 st.markdown("<br>", unsafe_allow_html=True)  # Add space between buttons
 
@@ -74,7 +120,7 @@ if st.button("Upload to GCS", key="upload_to_gcs"):
 
 # Display the dropdown if the button has been clicked
 if st.session_state.get("show_file_choice", False):
-    file_choice = st.selectbox("Select which file to upload to GCS", options=["Raw", "Cleaned"])
+    file_choice = st.selectbox("Select which file to upload to GCS", options=["Raw", "Cleaned", "All cleaned files"])
 
     # If Raw is selected, provide sub-options
     if file_choice == "Raw":
@@ -98,7 +144,7 @@ if st.session_state.get("show_file_choice", False):
 
     if st.button("Confirm Upload to GCS", key="confirm_upload_to_gcs"):
         try:
-            uploader = GCSUploader(
+            uploader = get_uploader(
                 project_id="batch5",  # replace with your project ID
                 service_account_key_path="C:\\Users\\yeruv\\Downloads\\projectp2-437312-1236b25e88e2.json"  # replace with your service account key path
             )
@@ -106,14 +152,30 @@ if st.session_state.get("show_file_choice", False):
             # Determine the file path and name based on the selection
             if file_choice == "Cleaned":
                 if cleaned_file_choice == "Upload latest":
-                    latest_csv_path = 'data/cleaned/cleaned.csv'  # Assuming cleaned.csv is the file to be uploaded
-                    destination_blob_name = f"cleaned_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+                    # Retrieve the latest cleaned file
+                    latest_csv_path = find_latest_artifact('cleaned', 'data/cleaned')
+                    if not latest_csv_path:
+                        st.warning("No cleaned files found to upload.")
                 elif cleaned_file_choice == "Choose file path" and custom_cleaned_file_path:
                     latest_csv_path = custom_cleaned_file_path
-                    destination_blob_name = f"cleaned_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
                 else:
                     latest_csv_path = None  # No valid file selected
 
+            elif file_choice == "All cleaned files":
+                # Upload every cleaned file concurrently through the shared client
+                latest_csv_path = None
+                cleaned_files = uploader.get_all_cleaned_files()
+                if cleaned_files:
+                    # Progress is reported from the upload threads, so only record it there
+                    last_progress = {}
+                    bucket_name = "revbucketgen"  # replace with your bucket name
+                    results = uploader.upload_files(bucket_name, cleaned_files, progress_callback=last_progress.update)
+                    st.success(f"Uploaded {sum(results.values())} of {len(results)} cleaned files to GCS "
+                               f"({last_progress['bytes_done'] / 1e6:.1f} MB at {last_progress['mb_per_second']:.1f} MB/s, "
+                               f"{last_progress['files_skipped']} already there).")
+                else:
+                    st.warning("No cleaned files found to upload.")
+
             elif file_choice == "Raw":
                 if raw_file_choice == "Upload latest":
                     latest_csv_path = get_latest_rogue_csv_file()  # Retrieve the latest rogue file
@@ -127,10 +189,13 @@ if st.session_state.get("show_file_choice", False):
                     destination_blob_name = f"rogue_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
 
             if latest_csv_path:
+                if file_choice == "Cleaned":
+                    # Named after the file's real format, which may be Parquet or Arrow
+                    extension = os.path.splitext(latest_csv_path)[1]
+                    destination_blob_name = f"cleaned_{datetime.now().strftime('%Y%m%d_%H%M%S')}{extension}"
                 bucket_name = "revbucketgen"  # replace with your bucket name
-                uploader.upload_file(bucket_name, latest_csv_path, destination_blob_name)
-                st.success(f"Uploaded {destination_blob_name} to GCS.")
-            else:
+                upload_unless_present(uploader, bucket_name, latest_csv_path, destination_blob_name)
+            elif file_choice != "All cleaned files":
                 st.warning("No files found to upload.")
         except Exception as e:
             st.error(f"Error: {str(e)}")
@@ -144,40 +209,52 @@ if st.session_state.get("show_file_choice", False):
 with col2:
     st.markdown("<h2 style='text-align: center;'>Run in Batch Mode</h2>", unsafe_allow_html=True)
 
-    # Step 1: Generate rogue records, clean data, and then wait for the file choice before upload
+    # Step 1: Generate rogue records and clean them in a background job, then wait for the file choice before upload
     if st.button("Run All Processes", key="run_all"):
-        try:
-            # Generate rogue records
-            generator = RogueRecordGenerator(num_records=10000, rogue_prob=0.1)
-            rogue_df = generator.generate_records()
-
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"rogue_{timestamp}.csv"
-            rogue_df.to_csv(os.path.join('data', 'raw', filename), index=False)
-            st.success(f"Rogue records generated and saved to 'data/raw/{filename}'")
-
-            # Clean the data
-            latest_csv_path = get_latest_rogue_csv_file()
-            if latest_csv_path:
-                df_with_rogue_records = pd.read_csv(latest_csv_path)
-                cleaner = DataCleaner(df_with_rogue_records)
-
-                cleaner.perform_eda()\
-                       .clean_missing_customer_name()\
-                       .clean_invalid_payment_type()\
-                       .clean_negative_qty()\
-                       .clean_datetime_format()
+        # Queued behind any running job; the page stays usable while it runs. Generating and cleaning
+        # overlap chunk by chunk in one pipeline stage, which also records the raw and cleaned files
+        job = get_job_runner().submit("Run All Processes", [
+            pipeline_stage(num_records=10000, rogue_prob=0.1, file_path_prefix='data/cleaned/cleaned.csv')])
+        st.session_state.setdefault("job_ids", []).append(job.job_id)
+
+    # Step 2: Show the progress of this session's jobs
+    jobs_running = False
+    for job_id in st.session_state.get("job_ids", []):
+        job = get_job_runner().get_job(job_id)
+        if job is None:
+            continue
+        progress = job.progress()
+
+        if not job.finished:
+            jobs_running = True
+            stage = progress['stage'] or "waiting in queue"
+            st.progress(progress['stage_number'] / progress['stages_total'])
+            st.write(f"Job {job_id}: {stage} ({progress['stage_number']}/{progress['stages_total']}), "
+                     f"{progress['stage_rows']} rows at {progress['rows_per_second']:.0f} rows/s")
+            if st.button("Cancel Job", key=f"cancel_job_{job_id}"):
+                job.cancel()
+        elif progress['status'] == 'done' and 'upload' in job.results:
+            st.success(f"Job {job_id}: uploaded {job.results['upload']} to GCS in {progress['elapsed_seconds']:.1f}s.")
+        elif progress['status'] == 'done':
+            if not st.session_state.get(f"job_{job_id}_seen", False):
+                # New files landed, so drop the cached listings once
+                invalidate(job.results['generate'])
+                invalidate(job.results['clean'])
+                st.session_state[f"job_{job_id}_seen"] = True
+            st.success(f"Job {job_id}: rogue records saved to '{job.results['generate']}' and cleaned into "
+                       f"'{job.results['clean']}' in {progress['elapsed_seconds']:.1f}s.")
+            st.session_state["run_all_process_completed"] = True  # Set a session state flag to indicate the process is done
+            # The files "Raw" and "Cleaned" upload
+            st.session_state["run_all_raw_path"] = job.results['generate']
+            st.session_state["run_all_cleaned_path"] = job.results['clean']
+        elif progress['status'] == 'cancelled':
+            st.warning(f"Job {job_id} was cancelled.")
+        else:
+            st.error(f"Job {job_id} failed: {progress['error']}")
 
-                cleaned_file_path = 'data/cleaned/cleaned.csv'
-                cleaner.save_cleaned_data(cleaned_file_path)
-                st.success("Data cleaned and saved to 'data/cleaned/cleaned.csv'")
-
-                # Step 2: Prompt to choose which file to upload to GCS
-                st.session_state["run_all_process_completed"] = True  # Set a session state flag to indicate the process is done
-            else:
-                st.warning("No rogue files found to process.")
-        except Exception as e:
-            st.error(f"Error: {str(e)}")
+    # Clicking any button reruns the page, which redraws the progress above
+    if jobs_running:
+        st.button("Refresh Progress", key="refresh_jobs")
 
     # Step 3: Once processing is completed, ask for file upload choice
     if st.session_state.get("run_all_process_completed", False):
@@ -185,27 +262,26 @@ with col2:
 
         if st.button("Confirm File Upload", key="batch_confirm_upload"):
             try:
-                uploader = GCSUploader(
+                uploader = get_uploader(
                     project_id="batch5",  # replace with your project ID
                     service_account_key_path="C:\\Users\\yeruv\\Downloads\\projectp2-437312-1236b25e88e2.json"  # replace with your service account key path
                 )
 
+                # The file the last finished job generated or cleaned into
                 if file_choice == "Raw":
-                    latest_csv_path = get_latest_rogue_csv_file()  # Retrieve the latest rogue file
-                    if latest_csv_path:
-                        destination_blob_name = f"rogue_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-                        bucket_name = "revbucketgen"  # replace with your bucket name
-                        uploader.upload_file(bucket_name, latest_csv_path, destination_blob_name)
-                        st.success(f"Uploaded {destination_blob_name} to GCS.")
-                    else:
-                        st.warning("No raw files found to upload.")
+                    file_path, prefix = st.session_state["run_all_raw_path"], "rogue"
+                else:
+                    file_path, prefix = st.session_state["run_all_cleaned_path"], "cleaned"
+                extension = os.path.splitext(file_path)[1]
+                destination_blob_name = f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{extension}"
+                bucket_name = "revbucketgen"  # replace with your bucket name
 
-                elif file_choice == "Cleaned":
-                    cleaned_file_path = 'data/cleaned/cleaned.csv'  # Assuming cleaned.csv is the file to be uploaded
-                    destination_blob_name = f"cleaned_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-                    bucket_name = "revbucketgen"  # replace with your bucket name
-                    uploader.upload_file(bucket_name, cleaned_file_path, destination_blob_name)
-                    st.success(f"Uploaded {destination_blob_name} to GCS.")
+                # Uploaded in the background like the job that wrote the file; its progress shows above
+                job = get_job_runner().submit(f"Upload {file_choice}", [
+                    upload_stage(uploader, bucket_name, destination_blob_name, file_path=file_path)])
+                st.session_state["job_ids"].append(job.job_id)
+                st.info(f"Job {job.job_id}: upload of '{file_path}' queued.")
+                st.button("Refresh Progress", key="refresh_upload_job")
 
             except Exception as e:
                 st.error(f"Error: {str(e)}")
@@ -215,4 +291,59 @@ with col2:
         st.write("Quitting the application...")
         st.write("Please close this tab or window manually.")
         # Use os._exit(0) to close the app programmatically in local dev mode
-        os._exit(0)
\ No newline at end of file
+        os._exit(0)
+
+
+# Insights Section: read from the rollup store, which is updated as files are cleaned, never from the cleaned files
+st.markdown("<br>", unsafe_allow_html=True)
+with st.expander("Insights"):
+    try:
+        rollup_store = RollupStore()
+        if st.button("Update Insights from Cleaned Files", key="sync_rollups"):
+            # Only needed for cleaned files copied in by hand; cleaning updates the rollups itself
+            ingested = rollup_store.sync('data/cleaned')
+            st.success(f"{len(ingested)} new or changed cleaned file(s) added.")
+
+        dimensions = [dimension for dimension in ROLLUPS['revenue']['dimensions'] if dimension != 'month']
+        revenue_by = st.selectbox("Revenue by", dimensions, key="revenue_by")
+        revenue = rollup_store.revenue([revenue_by])
+        if revenue.empty:
+            st.info("No cleaned files have been added to the rollups yet.")
+        else:
+            st.bar_chart(revenue.set_index(revenue_by)['revenue'])
+            st.line_chart(rollup_store.revenue(['month']).set_index('month')['revenue'])
+            st.write("Payment failure rates by payment type:")
+            st.dataframe(rollup_store.failure_rates(['payment_type']))
+            st.write("Payment failures by reason:")
+            st.dataframe(rollup_store.failure_rates(['failure_reason']))
+    except Exception as e:
+        st.error(f"Error: {str(e)}")
+
+# Metrics Section: time, rows, bytes and peak memory of every stage run by this app so far
+st.markdown("<br>", unsafe_allow_html=True)
+with st.expander("Pipeline Metrics"):
+    # Stages of all sessions and background jobs are counted together, as they share the process
+    trace_memory = st.checkbox("Measure peak memory per stage (slower)", key="trace_memory")
+    set_memory_tracing(trace_memory)
+
+    stage_totals = registry.snapshot()
+    if stage_totals:
+        st.dataframe([{'stage': name, **totals} for name, totals in stage_totals.items()])
+        # Leave out sub-stages, whose time is already part of their parent stage's
+        top_stages = {name: totals['seconds'] for name, totals in stage_totals.items()
+                      if name.rpartition('.')[0] not in stage_totals}
+        slowest_stage = max(top_stages, key=top_stages.get)
+        st.write(f"Slowest stage: {slowest_stage} ({top_stages[slowest_stage]:.2f}s in total).")
+    else:
+        st.info("No stages have run yet.")
+
+    if st.button("Export Metrics", key="export_metrics"):
+        paths = export_metrics()
+        if paths:
+            st.success(f"Metrics saved to {', '.join(paths)}.")
+        else:
+            st.error("Exporting the metrics failed.")
+
+    if st.button("Reset Metrics", key="reset_metrics"):
+        registry.reset()
+        st.success("Metrics reset.")
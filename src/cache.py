@@ -0,0 +1,132 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from src.file_io import read_frame
+
+# Number of DataFrames kept in memory before the least recently used one is dropped
+DEFAULT_MAX_FRAMES = 8
+
+
+class FileCache:
+    """
+    In-process cache of DataFrames loaded from files and of folder listings.
+
+    DataFrames are keyed on the file's absolute path, size and modification time, so a
+    file that is rewritten is loaded again on next use, while repeated reads of an
+    unchanged file, e.g. on every Streamlit rerun, are served from memory. Listings are
+    keyed on the folder's modification time, which changes whenever a file is added or
+    removed. Files written by this process can also be invalidated explicitly.
+
+    Cached DataFrames are shared between callers and must not be modified in place.
+    The cache is thread-safe, as Streamlit serves each session from its own thread.
+    """
+
+    def __init__(self, max_frames=DEFAULT_MAX_FRAMES):
+        """
+        :param max_frames: Maximum number of DataFrames kept in memory.
+        """
+        self.max_frames = max_frames
+        self._frames = OrderedDict()
+        self._listings = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _file_key(file_path):
+        stat = os.stat(file_path)
+        return os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns
+
+    def get_frame(self, file_path, loader, kind='frame'):
+        """
+        Return `loader(file_path)`, reusing the cached result while the file is unchanged.
+
+        :param file_path: Path of the file the DataFrame is derived from.
+        :param loader: Function loading the DataFrame from `file_path`.
+        :param kind: Name separating different DataFrames derived from the same file.
+        """
+        key = (kind,) + self._file_key(file_path)
+        with self._lock:
+            if key in self._frames:
+                self._frames.move_to_end(key)
+                return self._frames[key]
+
+        # Loaded outside the lock, so a slow read does not block other sessions
+        df = loader(file_path)
+
+        with self._lock:
+            self._frames[key] = df
+            self._frames.move_to_end(key)
+            while len(self._frames) > self.max_frames:
+                self._frames.popitem(last=False)
+        return df
+
+    def list_files(self, folder_path, pattern):
+        """Return the sorted names of the files in `folder_path` matching the regex `pattern`."""
+        key = (os.path.abspath(folder_path), pattern)
+        mtime_ns = os.stat(folder_path).st_mtime_ns
+        with self._lock:
+            cached = self._listings.get(key)
+        if cached and cached[0] == mtime_ns:
+            return list(cached[1])
+
+        names = sorted(f for f in os.listdir(folder_path) if re.match(pattern, f))
+        with self._lock:
+            self._listings[key] = (mtime_ns, names)
+        return list(names)
+
+    def invalidate(self, path=None):
+        """
+        Drop cached entries for a file or folder, or everything if `path` is None.
+
+        Call this after writing files, so a change within the file system's timestamp
+        resolution is not missed.
+        """
+        with self._lock:
+            if path is None:
+                self._frames.clear()
+                self._listings.clear()
+                return
+
+            path = os.path.abspath(path)
+            for key in [k for k in self._frames if k[1] == path]:
+                del self._frames[key]
+            for key in [k for k in self._listings if k[0] in (path, os.path.dirname(path))]:
+                del self._listings[key]
+
+
+# Cache shared by the whole process
+file_cache = FileCache()
+
+
+def load_frame(file_path):
+    """Read a CSV, Parquet or Arrow file through the shared cache."""
+    return file_cache.get_frame(file_path, read_frame)
+
+
+def load_cleaned_frame(raw_path):
+    """
+    Return the cleaned version of a raw file through the shared cache, cleaning it in memory on first use.
+
+    The result depends on the cleaning rules as well as the file, so it is cached per rules
+    fingerprint: after an edit to the rules file, the file is cleaned again with the new rules.
+    """
+    # Imported here, as the cleaner itself lists files through this module
+    from src.data_cleaner import DataCleaner
+    from src.rules import load_rules
+
+    rules = load_rules()
+
+    def clean(file_path):
+        return DataCleaner(load_frame(file_path), rules).apply_cleaning_steps().get_cleaned_data()
+
+    return file_cache.get_frame(raw_path, clean, kind=f"cleaned:{rules.fingerprint}")
+
+
+def list_files(folder_path, pattern):
+    """List the files of `folder_path` matching `pattern` through the shared cache."""
+    return file_cache.list_files(folder_path, pattern)
+
+
+def invalidate(path=None):
+    """Drop cached entries for `path`, or everything, from the shared cache."""
+    file_cache.invalidate(path)
@@ -0,0 +1,285 @@
+import argparse
+import contextlib
+import os
+import re
+import sqlite3
+from datetime import datetime
+from src.cache import list_files
+from src.manifest import hash_file
+from src.schema import ORDER_SCHEMA_VERSION
+
+# Kinds of artifacts and the file names they are written under: '<prefix>_YYYYMMDD_HHMMSS.<csv|parquet|arrows>'
+ARTIFACT_PATTERNS = {
+    'raw': re.compile(r'rogue_(\d{8}_\d{6})\.(csv|parquet|arrows)$'),
+    'cleaned': re.compile(r'cleaned_(\d{8}_\d{6})\.(csv|parquet|arrows)$')
+}
+
+DEFAULT_CATALOG_PATH = os.path.join('data', 'catalog.sqlite')
+
+# Modification time of each (catalog, kind, folder) when find_latest_artifact last registered the folder's files
+_synced_folders = {}
+
+
+class ArtifactCatalog:
+    """
+    SQLite catalog of the files produced by the pipeline.
+
+    Every raw, cleaned and uploaded artifact gets a row with its path, kind, timestamp,
+    row count, byte size, schema version and, when known, SHA-256. Rows are indexed on (kind, folder,
+    timestamp), so "latest file" and time range queries are index lookups instead of
+    directory scans. Each call opens its own connection, so the catalog can be used
+    from worker threads and processes; SQLite serializes the writes.
+    """
+
+    def __init__(self, catalog_path=DEFAULT_CATALOG_PATH):
+        """
+        Opens the catalog, creating the database file and its table if needed.
+
+        :param catalog_path: Path of the SQLite database file.
+        """
+        self.catalog_path = catalog_path
+        directory = os.path.dirname(catalog_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS artifacts (
+                    path TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    folder TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    rows INTEGER,
+                    bytes INTEGER,
+                    sha256 TEXT,
+                    schema_version INTEGER,
+                    recorded_at TEXT NOT NULL
+                )''')
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS artifacts_kind_folder_timestamp ON artifacts (kind, folder, timestamp)')
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """Open a connection that commits on success, rolls back on error and is always closed."""
+        connection = sqlite3.connect(self.catalog_path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _folder_key(path):
+        """Folder an artifact is filed under: the absolute directory of a file, or the bucket of a 'gs://' URI."""
+        if path.startswith('gs://'):
+            return path[:path.index('/', 5)] if '/' in path[5:] else path
+        return os.path.dirname(os.path.abspath(path))
+
+    @staticmethod
+    def _path_key(path):
+        return path if path.startswith('gs://') else os.path.abspath(path)
+
+    def record(self, path, kind, rows=None, content_hash=None, timestamp=None, num_bytes=None,
+               schema_version=ORDER_SCHEMA_VERSION, compute_hash=False):
+        """
+        Add or update the entry of an artifact.
+
+        Values that are not given keep what an earlier record of the same path stored.
+
+        :param path: Path of a local file, or a 'gs://bucket/blob' URI.
+        :param kind: 'raw', 'cleaned' or 'upload'.
+        :param rows: Number of data rows, if known.
+        :param content_hash: SHA-256 of the content, if known; only computed for local files with `compute_hash`.
+        :param timestamp: 'YYYYMMDD_HHMMSS' of the artifact; defaults to the one in its name, else the current time.
+        :param num_bytes: Size in bytes; defaults to the size of the local file.
+        :param schema_version: Version of the order schema the artifact was written with.
+        :param compute_hash: Hash local files when `content_hash` is not given; off by default, as it reads
+                             the whole file again right after it was written.
+        """
+        with self._connect() as connection:
+            self._upsert(connection, [self._entry(path, kind, rows, content_hash, timestamp, num_bytes,
+                                                  schema_version, compute_hash)])
+
+    def _entry(self, path, kind, rows=None, content_hash=None, timestamp=None, num_bytes=None,
+               schema_version=ORDER_SCHEMA_VERSION, compute_hash=False):
+        """Build the column values of an artifact's row, filling in the defaults described in record."""
+        local = not path.startswith('gs://')
+        if timestamp is None:
+            match = re.search(r'(\d{8}_\d{6})', os.path.basename(path))
+            timestamp = match.group(1) if match else datetime.now().strftime('%Y%m%d_%H%M%S')
+        if num_bytes is None and local:
+            num_bytes = os.path.getsize(path)
+        if content_hash is None and compute_hash and local:
+            content_hash = hash_file(path)
+
+        return (self._path_key(path), kind, self._folder_key(path), timestamp, rows, num_bytes, content_hash,
+                schema_version, datetime.now().isoformat(timespec='seconds'))
+
+    @staticmethod
+    def _upsert(connection, entries):
+        connection.executemany('''
+            INSERT INTO artifacts (path, kind, folder, timestamp, rows, bytes, sha256, schema_version, recorded_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (path) DO UPDATE SET
+                kind = excluded.kind,
+                timestamp = excluded.timestamp,
+                rows = COALESCE(excluded.rows, rows),
+                bytes = COALESCE(excluded.bytes, bytes),
+                sha256 = COALESCE(excluded.sha256, sha256),
+                schema_version = COALESCE(excluded.schema_version, schema_version),
+                recorded_at = excluded.recorded_at''', entries)
+
+    def get(self, path):
+        """Return the entry of an artifact as a dict, or None if it is not in the catalog."""
+        with self._connect() as connection:
+            row = connection.execute('SELECT * FROM artifacts WHERE path = ?', (self._path_key(path),)).fetchone()
+        return dict(row) if row else None
+
+    def remove(self, path):
+        """Remove the entry of an artifact."""
+        with self._connect() as connection:
+            connection.execute('DELETE FROM artifacts WHERE path = ?', (self._path_key(path),))
+
+    def count(self, kind, folder_path):
+        """Return the number of artifacts of `kind` in `folder_path`."""
+        with self._connect() as connection:
+            return connection.execute('SELECT COUNT(*) FROM artifacts WHERE kind = ? AND folder = ?',
+                                      (kind, os.path.abspath(folder_path))).fetchone()[0]
+
+    def latest(self, kind, folder_path):
+        """
+        Return the path of the most recent artifact of `kind` in `folder_path`, or None.
+
+        Entries whose file was deleted since they were recorded are dropped on the way.
+        """
+        folder = os.path.abspath(folder_path)
+        while True:
+            with self._connect() as connection:
+                row = connection.execute(
+                    'SELECT path FROM artifacts WHERE kind = ? AND folder = ? ORDER BY timestamp DESC, path DESC LIMIT 1',
+                    (kind, folder)).fetchone()
+            if row is None:
+                return None
+            if os.path.exists(row['path']):
+                return row['path']
+            self.remove(row['path'])
+
+    def between(self, kind, start=None, end=None, folder_path=None):
+        """
+        Return the entries of `kind` with a timestamp in [start, end], oldest first.
+
+        :param start: Earliest timestamp, as a datetime or 'YYYYMMDD_HHMMSS'; None for no lower bound.
+        :param end: Latest timestamp, as a datetime or 'YYYYMMDD_HHMMSS'; None for no upper bound.
+        :param folder_path: Optional folder (or 'gs://bucket') to restrict the query to.
+        """
+        query = 'SELECT * FROM artifacts WHERE kind = ?'
+        params = [kind]
+        if folder_path is not None:
+            query += ' AND folder = ?'
+            params.append(folder_path if folder_path.startswith('gs://') else os.path.abspath(folder_path))
+        if start is not None:
+            query += ' AND timestamp >= ?'
+            params.append(_format_timestamp(start))
+        if end is not None:
+            query += ' AND timestamp <= ?'
+            params.append(_format_timestamp(end))
+
+        with self._connect() as connection:
+            return [dict(row) for row in connection.execute(query + ' ORDER BY timestamp, path', params)]
+
+    def sync_folder(self, kind, folder_path, compute_hash=False):
+        """
+        Register the files of `folder_path` matching `kind`'s name pattern that are not in the catalog yet.
+
+        Used for files that were not written through the pipeline, e.g. copied in by hand.
+
+        :return: Number of files added.
+        """
+        with self._connect() as connection:
+            known_paths = {row['path'] for row in connection.execute(
+                'SELECT path FROM artifacts WHERE kind = ? AND folder = ?', (kind, os.path.abspath(folder_path)))}
+
+            # Registered in a single transaction, as a commit per file would dominate for large folders
+            entries = [self._entry(path, kind, compute_hash=compute_hash)
+                       for path in (os.path.join(folder_path, f) for f in list_files(folder_path, ARTIFACT_PATTERNS[kind]))
+                       if os.path.abspath(path) not in known_paths]
+            self._upsert(connection, entries)
+        return len(entries)
+
+
+def _format_timestamp(value):
+    return value.strftime('%Y%m%d_%H%M%S') if isinstance(value, datetime) else value
+
+
+def record_artifact(path, kind, rows=None, content_hash=None, catalog_path=DEFAULT_CATALOG_PATH):
+    """
+    Record an artifact in the catalog, printing instead of raising on failure.
+
+    The catalog only speeds up lookups, so failing to update it never fails the step that wrote the file.
+    """
+    try:
+        ArtifactCatalog(catalog_path).record(path, kind, rows=rows, content_hash=content_hash)
+    except Exception as e:
+        print(f"An error occurred while recording '{path}' in the artifact catalog: {e}")
+
+
+def record_upload(bucket_name, blob_name, source_file_name, catalog_path=DEFAULT_CATALOG_PATH):
+    """Record an uploaded blob in the catalog, copying the row count and hash of its source file's entry."""
+    try:
+        catalog = ArtifactCatalog(catalog_path)
+        source = catalog.get(source_file_name) or {}
+        catalog.record(f"gs://{bucket_name}/{blob_name}", 'upload', rows=source.get('rows'),
+                       content_hash=source.get('sha256'), num_bytes=os.path.getsize(source_file_name),
+                       timestamp=datetime.now().strftime('%Y%m%d_%H%M%S'))
+    except Exception as e:
+        print(f"An error occurred while recording 'gs://{bucket_name}/{blob_name}' in the artifact catalog: {e}")
+
+
+def find_latest_artifact(kind, folder_path, catalog_path=DEFAULT_CATALOG_PATH):
+    """
+    Return the path of the most recent 'raw' or 'cleaned' file in `folder_path`, or None.
+
+    The catalog answers from its index. Whenever the folder's modification time changed
+    since the last call, i.e. a file was added or removed, its unknown files are registered
+    first, so files that were not written through the pipeline, e.g. copied in by hand or
+    written by another tool, are found too; calls on an unchanged folder skip the scan.
+    """
+    try:
+        catalog = ArtifactCatalog(catalog_path)
+        sync_key = (os.path.abspath(catalog_path), kind, os.path.abspath(folder_path))
+        mtime_ns = os.stat(folder_path).st_mtime_ns
+        if _synced_folders.get(sync_key) != mtime_ns:
+            catalog.sync_folder(kind, folder_path)
+            _synced_folders[sync_key] = mtime_ns
+        latest_path = catalog.latest(kind, folder_path)
+        # The catalog stores absolute paths; answer in the form the folder was given in
+        return os.path.join(folder_path, os.path.basename(latest_path)) if latest_path else None
+    except sqlite3.Error as e:
+        print(f"The artifact catalog is unavailable ({e}), scanning '{folder_path}' instead.")
+
+    # The timestamp in the name sorts chronologically as text, so no dates need parsing
+    files = list_files(folder_path, ARTIFACT_PATTERNS[kind])
+    if not files:
+        return None
+    latest = max(files, key=lambda f: ARTIFACT_PATTERNS[kind].match(f).group(1))
+    return os.path.join(folder_path, latest)
+
+
+def main():
+    """Register unknown files in 'data/raw' and 'data/cleaned' and print the latest artifact of each kind."""
+    parser = argparse.ArgumentParser(description="Inspect or update the artifact catalog.")
+    parser.add_argument('--sync', action='store_true', help="Register files not written through the pipeline.")
+    parser.add_argument('--hash', action='store_true', help="Hash the files registered by --sync.")
+    args = parser.parse_args()
+
+    catalog = ArtifactCatalog()
+    for kind, folder_path in (('raw', os.path.join('data', 'raw')), ('cleaned', os.path.join('data', 'cleaned'))):
+        if args.sync and os.path.isdir(folder_path):
+            print(f"Registered {catalog.sync_folder(kind, folder_path, compute_hash=args.hash)} {kind} file(s).")
+        print(f"{kind}: {catalog.count(kind, folder_path)} file(s), latest: {catalog.latest(kind, folder_path)}")
+
+# Usage: python -m src.catalog [--sync [--hash]]
+if __name__ == "__main__":
+    main()
@@ -1,149 +1,540 @@
+import argparse
 import os
-import re
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+import numpy as np
 import pandas as pd
+from src.cache import list_files
+from src.catalog import ARTIFACT_PATTERNS, find_latest_artifact, record_artifact
+from src.datetime_parser import parse_datetime_column
+from src.file_io import ChunkedFrameWriter, get_file_extension, iter_frame_chunks, write_frame
+from src.manifest import CleaningManifest, hash_file
+from src.metrics import StageRecord, registry, stage
+from src.profiler import DataProfile, profile_path_for
+from src.rollups import RollupBatch, update_rollups
+from src.rules import REASON_COLUMN, load_rules
+from src.schema import apply_order_schema
+
+# Number of rows read, cleaned and written per chunk in streaming mode
+DEFAULT_CHUNK_SIZE = 100_000
+
+# Version of the cleaning steps; bump it whenever they change so raw files are cleaned again
+# (changes to the rules file are picked up through its fingerprint)
+CLEANING_CONFIG_VERSION = 3
+
+# Raw files written by the generator: 'rogue_YYYYMMDD_HHMMSS.<csv|parquet|arrows>'
+ROGUE_FILE_PATTERN = ARTIFACT_PATTERNS['raw']
+
+# Rows rejected by 'drop' rules are written next to the cleaned file as 'quarantine_YYYYMMDD_HHMMSS.<ext>'
+QUARANTINE_PREFIX = 'quarantine_'
 
 class DataCleaner:
-    def __init__(self, df):
+    """
+    Cleans an order DataFrame through a fluent chain of cleaning steps.
+
+    The cleaning rules are declared in a rules file (config/cleaning_rules.json, see
+    src.rules) rather than in code: `apply_rules` adds them to the plan, and the clean_*
+    methods add the rules for one kind of defect. Each 'drop' rule becomes a row filter,
+    each 'fill' or 'clamp' rule a column fix.
+
+    Steps are only recorded in a lazy plan. The plan runs in a single pass when the data
+    is needed (get_cleaned_data, save_cleaned_data or perform_eda): all row filters are
+    combined into one boolean mask that is applied once, then the column fixes are
+    applied to the surviving rows, so adding rules adds no passes over the data. The
+    rejected rows are kept in `quarantine`, with a bitmask of the rules they failed in
+    its 'reject_reasons' column. The input DataFrame is never modified, so it does not
+    need to be copied up front; it is only brought into the compact order schema
+    (categoricals and narrow integers) if it is not already.
+    """
+
+    def __init__(self, df, rules=None):
+        """
+        :param df: DataFrame of order records.
+        :param rules: RuleSet to clean with; defaults to the rules in config/cleaning_rules.json.
+        """
         # Ensure the input is a valid DataFrame
         if not isinstance(df, pd.DataFrame):
             raise ValueError("Input must be a pandas DataFrame.")
         
-        self.df = df.copy()  # Make a copy to avoid modifying the original DataFrame
+        self.df = apply_order_schema(df)
+        self.rules = rules if rules is not None else load_rules()
+        # Pending steps as (step, 'filter', column, predicate) or (step, 'column', column, transform) tuples
+        self._plan = []
+        # Reason bit of each filter step, set in the reason bitmask of the rows it rejects
+        self._reason_bits = {}
+        # Rows rejected by the row filters so far, with their reason bitmask
+        self.quarantine = self.df.iloc[:0].assign(**{REASON_COLUMN: np.array([], dtype=np.uint32)})
+        # Number of non-empty datetime values that could not be parsed and became NaT
+        self.coerced_datetimes = 0
 
-    def perform_eda(self):
-        """Perform basic exploratory data analysis (EDA) on the DataFrame."""
-        # Display the first few rows of the DataFrame
-        print("\nFirst 5 rows of the DataFrame:")
-        print(self.df.head())
-        
-        # Display a summary of statistics for numerical columns
-        print("\nSummary Statistics:")
-        print(self.df.describe())
-        
-        # Display information about the DataFrame including data types and non-null counts
-        print("\nDataFrame Information:")
-        print(self.df.info())
+    def _require_column(self, column):
+        """Raise a KeyError if `column` is not in the DataFrame."""
+        if column not in self.df.columns:
+            raise KeyError(f"The '{column}' column is missing in the DataFrame.")
+
+    def _execute_plan(self):
+        """Run all pending steps in one pass and return the resulting DataFrame."""
+        if not self._plan:
+            return self.df
+
+        with stage('clean', rows_in=len(self.df)) as record:
+            df = self.df
+            mask = None
+            rows_kept = len(df)
+            pending_fixes = []
+            # Masks of the filter steps with a reason bit, to build the bitmask of the rejected rows
+            reason_masks = []
+            # One metrics record per step, adding up the time of its row filter or column fixes
+            step_records = {}
+
+            for step, kind, column, func in self._plan:
+                if kind == 'column':
+                    pending_fixes.append((step, column, func))
+                    continue
+
+                # A filter on a column that an earlier step rewrites must see the rewritten values, so
+                # those fixes are applied to the whole column now, leaving the other fixes pending
+                column_fixes = [fix for fix in pending_fixes if fix[1] == column]
+                if column_fixes:
+                    df = self._apply_fixes(df.copy(deep=False) if df is self.df else df, column_fixes, step_records)
+                    pending_fixes = [fix for fix in pending_fixes if fix[1] != column]
+
+                step_record = step_records.setdefault(step, StageRecord(f"clean.{step}", rows_in=rows_kept))
+                with step_record.measure():
+                    step_mask = np.asarray(func(df[column]), dtype=bool)
+                    mask = step_mask if mask is None else (mask & step_mask)
+                rows_kept = int(np.count_nonzero(mask))
+                step_record.rows_out = rows_kept
+                if step in self._reason_bits:
+                    reason_masks.append((self._reason_bits[step], step_mask))
+
+            if mask is not None and not mask.all():
+                self._quarantine_rows(df, mask, reason_masks)
+            self.df = self._apply_fused(df, mask, pending_fixes, step_records)
+            self._plan = []
+            record.rows_out = len(self.df)
+
+        for step_record in step_records.values():
+            registry.add(step_record)
+        return self.df
+
+    def _quarantine_rows(self, df, mask, reason_masks):
+        """Add the rows rejected by `mask` to `quarantine`, with the bits of every filter they failed."""
+        rejected = np.flatnonzero(~mask)
+        reasons = np.zeros(len(rejected), dtype=np.uint32)
+        for bit, step_mask in reason_masks:
+            reasons |= (~step_mask[rejected]).astype(np.uint32) << np.uint32(bit)
+
+        rows = df.take(rejected).assign(**{REASON_COLUMN: reasons})
+        self.quarantine = rows if self.quarantine.empty else pd.concat([self.quarantine, rows])
+
+    @staticmethod
+    def _apply_fused(df, mask, fixes, step_records):
+        """Apply a combined row mask once, then each column fix to the surviving rows."""
+        if mask is not None and not mask.all():
+            # The only copy of the data made by the plan
+            step_record = step_records.setdefault('filter_rows', StageRecord('clean.filter_rows', rows_in=len(df)))
+            with step_record.measure():
+                df = df.take(np.flatnonzero(mask))
+            step_record.rows_out = len(df)
+        else:
+            # Shallow copy: column fixes below replace whole columns, so the input stays untouched
+            df = df.copy(deep=False)
+        return DataCleaner._apply_fixes(df, fixes, step_records)
+
+    @staticmethod
+    def _apply_fixes(df, fixes, step_records):
+        """Replace the columns of `df` with the results of the column fixes, in place."""
+        for step, column, func in fixes:
+            step_record = step_records.setdefault(step, StageRecord(f"clean.{step}", rows_in=len(df),
+                                                                    rows_out=len(df)))
+            with step_record.measure():
+                df[column] = func(df[column])
+        return df
+
+    def perform_eda(self, profile_path=None):
+        """
+        Profile the cleaned DataFrame in a single pass and print a summary per column.
+
+        The profile (null counts, min/max/mean, approximate distinct counts and quantiles)
+        is kept as `self.profile`, so it can be merged with others or saved.
+
+        :param profile_path: Optional path to also save the profile to as JSON.
+        """
+        df = self._execute_plan()
+
+        self.profile = DataProfile().update(df)
+        print(f"\nProfile of {self.profile.rows} rows:")
+        print(self.profile.summary_frame().to_string())
+        if profile_path:
+            self.profile.save(profile_path)
+        return self
+
+    def apply_rules(self, names=None):
+        """
+        Add cleaning rules to the plan: 'drop' rules as row filters, 'fill' and 'clamp' rules as column fixes.
+
+        :param names: Names of the rules to apply, in order; defaults to every rule of the rule set.
+        """
+        for rule in self.rules.select(names):
+            self._require_column(rule.column)
+            if rule.action == 'drop':
+                self._plan.append((rule.name, 'filter', rule.column, rule.passes))
+                self._reason_bits[rule.name] = rule.bit
+            else:
+                self._plan.append((rule.name, 'column', rule.column, rule.fix))
         return self
 
     def clean_missing_customer_name(self):
         """Fill missing values for customer_name and failure_reason."""
-        if 'customer_name' in self.df.columns:
-            self.df.loc[:, 'customer_name'] = self.df['customer_name'].fillna('Unknown Customer')
-        else:
-            raise KeyError("The 'customer_name' column is missing in the DataFrame.")
-        
-        if 'failure_reason' in self.df.columns:
-            self.df.loc[:, 'failure_reason'] = self.df['failure_reason'].fillna('None')
-        else:
-            raise KeyError("The 'failure_reason' column is missing in the DataFrame.")
-        
-        return self
+        return self.apply_rules(['missing_customer_name', 'missing_failure_reason'])
 
     def clean_invalid_payment_type(self):
-        """Remove records with invalid payment types."""
-        if 'payment_type' not in self.df.columns:
-            raise KeyError("The 'payment_type' column is missing in the DataFrame.")
-        
-        valid_payment_types = ['Card', 'Internet Banking', 'UPI', 'Wallet']
-        self.df = self.df[self.df['payment_type'].isin(valid_payment_types)].copy()
-        return self
+        """Remove records with missing or invalid payment types."""
+        return self.apply_rules(['missing_payment_type', 'invalid_payment_type'])
 
     def clean_negative_qty(self):
         """Replace negative quantities with a default of 1."""
-        if 'qty' not in self.df.columns:
-            raise KeyError("The 'qty' column is missing in the DataFrame.")
-        
-        self.df.loc[:, 'qty'] = pd.to_numeric(self.df['qty'], errors='coerce')
-        self.df.loc[self.df['qty'] < 0, 'qty'] = 1
-        return self
+        return self.apply_rules(['negative_qty'])
+
+    def clean_missing_product_id(self):
+        """Remove records without a product_id."""
+        return self.apply_rules(['missing_product_id'])
+
+    def clean_future_order_date(self):
+        """Remove records dated in the future."""
+        return self.apply_rules(['future_order_date'])
 
     def clean_datetime_format(self):
-        """Convert 'datetime' column to pandas datetime format."""
-        if 'datetime' not in self.df.columns:
-            raise KeyError("The 'datetime' column is missing in the DataFrame.")
-        
-        self.df.loc[:, 'datetime'] = pd.to_datetime(self.df['datetime'], errors='coerce')
+        """
+        Convert the 'datetime' column to datetime64, with unparseable values as NaT.
+
+        The format is detected from a sample and parsed in one vectorized pass, with only the
+        outliers parsed value by value (see parse_datetime_column). The number of values
+        coerced to NaT is added to `coerced_datetimes`.
+        """
+        self._require_column('datetime')
+
+        def parse_datetimes(col):
+            parsed, report = parse_datetime_column(col)
+            self.coerced_datetimes += report['coerced']
+            return parsed
+
+        self._plan.append(('clean_datetime_format', 'column', 'datetime', parse_datetimes))
         return self
 
     def get_cleaned_data(self):
         """Return the cleaned DataFrame."""
-        return self.df
-    def save_cleaned_data(self, file_path_prefix):
-        """Save the cleaned DataFrame to a CSV file with a timestamp."""
+        return self._execute_plan()
+
+    def apply_cleaning_steps(self):
+        """Apply the standard cleaning chain: datetimes are parsed, then every rule of the rule set is applied."""
+        return self.clean_datetime_format()\
+                   .apply_rules()
+
+    def save_cleaned_data(self, file_path_prefix, file_format='csv'):
+        """
+        Save the cleaned DataFrame to a file with a timestamp.
+
+        :param file_path_prefix: Path whose directory receives the cleaned file.
+        :param file_format: 'csv' (default), or 'parquet' / 'arrow' for a compressed columnar file.
+        """
         try:
-            # Ensure the directory exists
-            directory = os.path.dirname(file_path_prefix)
-            if not os.path.exists(directory):
-                os.makedirs(directory)
-            
-            # Append the current timestamp to the file name
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            file_name = f"cleaned_{timestamp}.csv"
-            file_path = os.path.join(directory, file_name)
+            file_path = build_cleaned_file_path(file_path_prefix, file_format)
             
-            # Save the DataFrame to CSV
-            self.df.to_csv(file_path, index=False)
+            # Run the cleaning plan and save the DataFrame
+            df = self._execute_plan()
+            write_frame(df, file_path)
+            # The rows have no raw file to key the rollups by, so the file's own hash is used for both
+            content_hash = hash_file(file_path)
+            record_artifact(file_path, 'cleaned', rows=len(df), content_hash=content_hash)
+            # Saved next to the cleaned file, so it can be reused without reading the file again
+            DataProfile().update(df).save(profile_path_for(file_path))
+            update_rollups(file_path, RollupBatch().update(df), content_hash)
             print(f"Data cleaning completed. Cleaned data saved to '{file_path}'.")
+            if not self.quarantine.empty:
+                quarantine_path = build_quarantine_file_path(file_path)
+                write_frame(self.quarantine, quarantine_path)
+                print(f"{len(self.quarantine)} rejected row(s) quarantined to '{quarantine_path}'.")
+            if self.coerced_datetimes:
+                print(f"{self.coerced_datetimes} datetime value(s) could not be parsed and were set to NaT.")
+            return file_path
         except Exception as e:
             print(f"An error occurred while saving the file: {e}")
 
-def get_latest_rogue_csv_file(folder_path='data/raw'):
-    """Find the latest rogue CSV file in the given folder based on timestamp."""
+def build_cleaned_file_path(file_path_prefix, file_format='csv', timestamp=None):
+    """
+    Return a timestamped 'cleaned_*' path in the directory of `file_path_prefix`, creating it if needed.
+
+    :param timestamp: 'YYYYMMDD_HHMMSS' string for the file name; defaults to the current time.
+    """
+    # Ensure the directory exists
+    directory = os.path.dirname(file_path_prefix)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    # Append the timestamp to the file name
+    timestamp = timestamp or datetime.now().strftime('%Y%m%d_%H%M%S')
+    file_name = f"cleaned_{timestamp}{get_file_extension(file_format)}"
+    return os.path.join(directory, file_name)
+
+def build_quarantine_file_path(cleaned_file_path):
+    """Return the 'quarantine_*' path receiving the rows rejected while cleaning into `cleaned_file_path`."""
+    directory, file_name = os.path.split(cleaned_file_path)
+    return os.path.join(directory, QUARANTINE_PREFIX + file_name.removeprefix('cleaned_'))
+
+def clean_csv_in_chunks(input_path, file_path_prefix, chunksize=DEFAULT_CHUNK_SIZE, file_format='csv',
+                        timestamp=None, progress_callback=None, content_hash=None):
+    """
+    Clean a raw file without loading it whole.
+
+    The file is read `chunksize` rows at a time, each chunk goes through the standard
+    cleaning chain and is appended to the timestamped 'cleaned_*' output, so memory
+    use depends on the chunk size only, not on the size of the input file.
+
+    :param input_path: Path of the raw CSV, Parquet or Arrow file.
+    :param file_path_prefix: Path whose directory receives the cleaned file.
+    :param chunksize: Number of rows per chunk.
+    :param file_format: Format of the cleaned file: 'csv' (default), 'parquet' or 'arrow'.
+    :param timestamp: Timestamp for the cleaned file name; defaults to the current time.
+    :param progress_callback: Optional callable receiving the number of input rows of each cleaned
+                              chunk; if it raises, cleaning stops and the cleaned file is removed.
+    :param content_hash: Content hash of the raw file, if already known; the rollups replace the
+                         earlier contribution of the same raw file with this one.
+    :return: Path of the cleaned file, or None if cleaning failed.
+    """
     try:
-        # List all files in the folder
-        files = os.listdir(folder_path)
+        file_path = build_cleaned_file_path(file_path_prefix, file_format, timestamp)
+        quarantine_path = build_quarantine_file_path(file_path)
+        if os.path.exists(quarantine_path):
+            # Left by an earlier cleaning into the same file name; it must not outlive its cleaned file
+            os.remove(quarantine_path)
+        rows_in = rows_out = rows_quarantined = coerced_datetimes = 0
+        profile = DataProfile()
+        # Aggregated in the same pass as the profile, so the rollups never read the cleaned file again
+        rollup = RollupBatch()
+        rules = load_rules()
 
-        # Filter files that match the 'rogue_YYYYMMDD_HHMMSS.csv' pattern
-        rogue_files = [f for f in files if re.match(r'rogue_\d{8}_\d{6}\.csv', f)]
+        # The quarantine file is only created once a chunk has rejected rows
+        with ChunkedFrameWriter(file_path) as writer, ChunkedFrameWriter(quarantine_path) as quarantine_writer:
+            for chunk in iter_frame_chunks(input_path, chunksize):
+                cleaner = DataCleaner(chunk, rules).apply_cleaning_steps()
+                cleaned_chunk = cleaner.get_cleaned_data()
+                coerced_datetimes += cleaner.coerced_datetimes
+                writer.write(cleaned_chunk)
+                if not cleaner.quarantine.empty:
+                    quarantine_writer.write(cleaner.quarantine)
+                    rows_quarantined += len(cleaner.quarantine)
+                profile.update(cleaned_chunk)
+                rollup.update(cleaned_chunk)
+                rows_in += len(chunk)
+                rows_out += len(cleaned_chunk)
+                if progress_callback:
+                    progress_callback(len(chunk))
 
-        if not rogue_files:
-            raise FileNotFoundError("No rogue CSV files found in the specified folder.")
+        record_artifact(file_path, 'cleaned', rows=rows_out)
+        profile.save(profile_path_for(file_path))
+        update_rollups(file_path, rollup, content_hash or hash_file(input_path))
 
-        # Sort files by timestamp extracted from the filename
-        rogue_files.sort(
-            key=lambda x: datetime.strptime(x.split('_')[1] + x.split('_')[2].split('.')[0], '%Y%m%d%H%M%S'),
-            reverse=True
-        )
+        print(f"Data cleaning completed ({rows_out} of {rows_in} rows kept). "
+              f"Cleaned data saved to '{file_path}'.")
+        if rows_quarantined:
+            print(f"{rows_quarantined} rejected row(s) quarantined to '{quarantine_path}'.")
+        if coerced_datetimes:
+            print(f"{coerced_datetimes} datetime value(s) could not be parsed and were set to NaT.")
+        return file_path
+    except Exception as e:
+        print(f"An error occurred while cleaning the file in chunks: {e}")
 
-        # Return the most recent rogue file
-        return os.path.join(folder_path, rogue_files[0])
-    
+def iter_cleaned_chunks(input_path, chunksize=DEFAULT_CHUNK_SIZE):
+    """
+    Yield a raw file as cleaned DataFrame chunks of at most `chunksize` rows.
+
+    Lets the cleaned data be streamed elsewhere, e.g. with GCSUploader.upload_frames,
+    without writing a cleaned file to disk first.
+    """
+    for chunk in iter_frame_chunks(input_path, chunksize):
+        yield DataCleaner(chunk).apply_cleaning_steps().get_cleaned_data()
+
+def clean_raw_file(raw_path, file_path_prefix='data/cleaned/cleaned.csv', file_format='csv',
+                   manifest=None, chunksize=DEFAULT_CHUNK_SIZE, progress_callback=None):
+    """
+    Clean a raw file unless an identical file was already cleaned with the same configuration.
+
+    The raw file's content hash is looked up in the cleaning manifest; if a cleaned output
+    for that content, cleaning version and output format still exists, it is reused instead
+    of cleaning the file again. Otherwise the file is cleaned chunk by chunk and the new
+    output is recorded in the manifest.
+
+    :param raw_path: Path of the raw CSV, Parquet or Arrow file.
+    :param file_path_prefix: Path whose directory receives the cleaned file.
+    :param file_format: Format of the cleaned file: 'csv' (default), 'parquet' or 'arrow'.
+    :param manifest: CleaningManifest to use; defaults to 'manifest.json' next to the cleaned files.
+    :param chunksize: Number of rows per chunk when cleaning.
+    :param progress_callback: Optional callable receiving the number of input rows of each cleaned chunk.
+    :return: Path of the cleaned file, or None if cleaning failed.
+    """
+    try:
+        manifest = manifest or load_cleaning_manifest(file_path_prefix)
+        content_hash = manifest.hash_file(raw_path)
+        config_key = cleaning_config_key(file_format)
+
+        cleaned_path = manifest.lookup(content_hash, config_key)
+        if cleaned_path:
+            print(f"'{raw_path}' was already cleaned into '{cleaned_path}', skipping.")
+        else:
+            cleaned_path = clean_csv_in_chunks(raw_path, file_path_prefix, chunksize, file_format,
+                                               progress_callback=progress_callback, content_hash=content_hash)
+            if cleaned_path:
+                manifest.record(content_hash, config_key, raw_path, cleaned_path)
+                # The raw file's hash is known now, so store it with its catalog entry
+                record_artifact(raw_path, 'raw', content_hash=content_hash)
+
+        # Saved even when skipping, so newly computed file hashes are cached
+        manifest.save()
+        return cleaned_path
     except Exception as e:
-        print(f"An error occurred while finding the latest rogue CSV file: {e}")
-        return None
+        print(f"An error occurred while cleaning '{raw_path}': {e}")
+
+def load_cleaning_manifest(file_path_prefix):
+    """Load the cleaning manifest kept next to the cleaned files."""
+    return CleaningManifest(os.path.join(os.path.dirname(file_path_prefix), 'manifest.json'))
 
-# Usage example:
-try:
-    # Get the path to the most recent rogue CSV file
-    latest_csv_path = get_latest_rogue_csv_file()
+def cleaning_config_key(file_format):
+    """Manifest key for the current cleaning configuration, cleaning rules and output format."""
+    # Editing the rules file changes its fingerprint, so raw files are cleaned again with the new rules
+    return f"v{CLEANING_CONFIG_VERSION}:{load_rules().fingerprint}:{file_format}"
 
-    if latest_csv_path:
-        print(f"Processing the latest rogue file: {latest_csv_path}")
+def find_pending_raw_files(folder_path='data/raw', file_path_prefix='data/cleaned/cleaned.csv',
+                           file_format='csv', manifest=None):
+    """
+    Return the rogue files in `folder_path` that have no cleaned output yet, oldest first.
 
-        # Load the DataFrame from the latest rogue CSV
-        df_with_rogue_records = pd.read_csv(latest_csv_path)
+    :return: List of (raw_path, content_hash) tuples.
+    """
+    manifest = manifest or load_cleaning_manifest(file_path_prefix)
+    config_key = cleaning_config_key(file_format)
 
-        # Initialize the DataCleaner class with the DataFrame
-        cleaner = DataCleaner(df_with_rogue_records)
+    rogue_files = list_files(folder_path, ROGUE_FILE_PATTERN)
+    pending = []
+    for file_name in rogue_files:
+        raw_path = os.path.join(folder_path, file_name)
+        content_hash = manifest.hash_file(raw_path)
+        if manifest.lookup(content_hash, config_key) is None:
+            pending.append((raw_path, content_hash))
+    return pending
 
-        # Apply the cleaning steps
-        cleaner.perform_eda()\
-               .clean_missing_customer_name()\
-               .clean_invalid_payment_type()\
-               .clean_negative_qty()\
-               .clean_datetime_format()
+def clean_pending_files(folder_path='data/raw', file_path_prefix='data/cleaned/cleaned.csv', file_format='csv',
+                        max_workers=None, chunksize=DEFAULT_CHUNK_SIZE):
+    """
+    Clean every rogue file in `folder_path` that has not been cleaned yet, concurrently.
 
-        # Save the cleaned DataFrame to the 'data/cleaned' folder
-        cleaner.save_cleaned_data('data/cleaned/cleaned.csv')
+    Files are cleaned chunk by chunk in a process pool, one cleaned output per input. Each
+    output is named after its raw file's timestamp ('rogue_<ts>' -> 'cleaned_<ts>'), moved
+    on to the next free second when that name is already on disk or taken by another pending
+    file (e.g. 'rogue_<ts>.csv' and 'rogue_<ts>.parquet'), so no file is overwritten and no two
+    workers write the same path. The manifest is only written by this process, once the
+    workers are done.
+
+    :param folder_path: Folder holding the rogue files.
+    :param file_path_prefix: Path whose directory receives the cleaned files.
+    :param file_format: Format of the cleaned files: 'csv' (default), 'parquet' or 'arrow'.
+    :param max_workers: Number of worker processes (defaults to the number of CPUs).
+    :param chunksize: Number of rows per chunk when cleaning.
+    :return: Dict mapping each pending raw file to its cleaned file (None if cleaning it failed).
+    """
+    manifest = load_cleaning_manifest(file_path_prefix)
+    config_key = cleaning_config_key(file_format)
+    pending = find_pending_raw_files(folder_path, file_path_prefix, file_format, manifest)
+    results = {}
+
+    if pending:
+        print(f"Cleaning {len(pending)} pending raw file(s)...")
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+            claimed = set()
+            for raw_path, content_hash in pending:
+                timestamp = ROGUE_FILE_PATTERN.match(os.path.basename(raw_path)).group(1)
+                timestamp = _free_timestamp(file_path_prefix, file_format, timestamp, claimed)
+                future = executor.submit(clean_csv_in_chunks, raw_path, file_path_prefix,
+                                         chunksize, file_format, timestamp, content_hash=content_hash)
+                futures[future] = (raw_path, content_hash)
+
+            for future in as_completed(futures):
+                raw_path, content_hash = futures[future]
+                cleaned_path = future.result()
+                results[raw_path] = cleaned_path
+                if cleaned_path:
+                    manifest.record(content_hash, config_key, raw_path, cleaned_path)
+                    record_artifact(raw_path, 'raw', content_hash=content_hash)
     else:
-        print("No rogue files found to process.")
+        print("No pending raw files to clean.")
 
-except FileNotFoundError:
-    print("Error: The specified file was not found.")
-except Exception as e:
-    print(f"An unexpected error occurred: {e}")
+    manifest.save()
+    return results
+
+def _free_timestamp(file_path_prefix, file_format, timestamp, claimed):
+    """
+    Return `timestamp`, or the first later second, whose cleaned file is neither on disk nor in `claimed`.
+
+    The cleaned file path of the returned timestamp is added to `claimed`.
+    """
+    try:
+        moment = datetime.strptime(timestamp, '%Y%m%d_%H%M%S')
+    except ValueError:
+        # Digits that are not a date, e.g. a raw file renamed by hand; start from the current time instead
+        moment = datetime.now().replace(microsecond=0)
+    while True:
+        file_path = build_cleaned_file_path(file_path_prefix, file_format, moment.strftime('%Y%m%d_%H%M%S'))
+        if file_path not in claimed and not os.path.exists(file_path):
+            claimed.add(file_path)
+            return moment.strftime('%Y%m%d_%H%M%S')
+        moment += timedelta(seconds=1)
 
+def get_latest_rogue_csv_file(folder_path='data/raw'):
+    """Find the latest rogue CSV, Parquet or Arrow file in the given folder based on timestamp."""
+    try:
+        # Look the file up in the artifact catalog's index instead of scanning the folder
+        latest_path = find_latest_artifact('raw', folder_path)
 
+        if not latest_path:
+            raise FileNotFoundError("No rogue CSV files found in the specified folder.")
 
+        # Return the most recent rogue file
+        return latest_path
+    
+    except Exception as e:
+        print(f"An error occurred while finding the latest rogue CSV file: {e}")
+        return None
+
+def main():
+    """Clean the most recent (or, with --all, every pending) rogue file in 'data/raw' into 'data/cleaned'."""
+    parser = argparse.ArgumentParser(description="Clean rogue order files from 'data/raw' into 'data/cleaned'.")
+    parser.add_argument('--all', action='store_true', help="Clean every raw file that has not been cleaned yet.")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes for --all (default: CPU count).")
+    args = parser.parse_args()
+
+    try:
+        if args.all:
+            clean_pending_files('data/raw', 'data/cleaned/cleaned.csv', max_workers=args.workers)
+            return
+
+        # Get the path to the most recent rogue CSV file
+        latest_csv_path = get_latest_rogue_csv_file()
+
+        if latest_csv_path:
+            print(f"Processing the latest rogue file: {latest_csv_path}")
+
+            # Clean it into the 'data/cleaned' folder, unless it was already cleaned
+            clean_raw_file(latest_csv_path, 'data/cleaned/cleaned.csv')
+        else:
+            print("No rogue files found to process.")
+
+    except FileNotFoundError:
+        print("Error: The specified file was not found.")
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
 
+# Usage: python -m src.data_cleaner [--all [--workers N]]
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import warnings
+import numpy as np
+import pandas as pd
+
+# Formats tried on the sample, most likely first; the generator and pandas write the first one
+DATETIME_FORMATS = [
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%d %H:%M:%S.%f',
+    '%Y-%m-%dT%H:%M:%S.%f',
+    '%Y-%m-%d',
+    '%Y/%m/%d %H:%M:%S',
+    '%d/%m/%Y %H:%M:%S',
+    '%m/%d/%Y %H:%M:%S',
+    '%d-%m-%Y %H:%M:%S'
+]
+
+# Number of values the format is detected from
+FORMAT_SAMPLE_SIZE = 1000
+
+# Fixed-width fields of the formats parsed with NumPy: directive -> (number of digits, largest value)
+FIXED_WIDTH_FIELDS = {'%Y': (4, 9999), '%m': (2, 12), '%d': (2, 31), '%H': (2, 23), '%M': (2, 59), '%S': (2, 59)}
+
+
+def detect_datetime_format(values, formats=DATETIME_FORMATS, sample_size=FORMAT_SAMPLE_SIZE):
+    """
+    Return the format in `formats` that parses the most values of an evenly spaced sample, or None.
+
+    pandas infers the format from the first value only, so a single odd value at the top
+    of a column would turn every other value into NaT; a sample across the column avoids that.
+    """
+    if len(values) == 0:
+        return None
+    sample = values[np.linspace(0, len(values) - 1, num=min(sample_size, len(values)), dtype=np.int64)]
+    # Empty strings are missing values, as in a CSV file
+    sample = sample[pd.notna(sample) & (sample != '')]
+    if len(sample) == 0:
+        return None
+
+    best_format, best_count = None, 0
+    for datetime_format in formats:
+        count = int(pd.to_datetime(sample, format=datetime_format, errors='coerce').notna().sum())
+        if count > best_count:
+            best_format, best_count = datetime_format, count
+            if count == len(sample):
+                break
+    return best_format
+
+
+def _compile_fixed_width(datetime_format):
+    """
+    Return (width, {directive: start}, [(position, literal code point)]) for a format made only of
+    FIXED_WIDTH_FIELDS and literal characters, or None for any other format.
+    """
+    fields, literals, position, i = {}, [], 0, 0
+    while i < len(datetime_format):
+        if datetime_format[i] == '%':
+            directive = datetime_format[i:i + 2]
+            if directive not in FIXED_WIDTH_FIELDS or directive in fields:
+                return None
+            fields[directive] = position
+            position += FIXED_WIDTH_FIELDS[directive][0]
+            i += 2
+        else:
+            literals.append((position, ord(datetime_format[i])))
+            position += 1
+            i += 1
+    if not {'%Y', '%m', '%d'} <= set(fields):
+        return None
+    return position, fields, literals
+
+
+def _parse_fixed_width(values, datetime_format):
+    """
+    Parse zero-padded, fixed-width datetime strings with NumPy arithmetic on their characters.
+
+    pandas parses formats other than ISO 8601 one value at a time; reading the digits
+    straight out of a character matrix is over ten times faster. Values of another width,
+    with other separators or out-of-range fields become NaT. Returns None if the format
+    can't be parsed this way.
+    """
+    layout = _compile_fixed_width(datetime_format)
+    if layout is None:
+        return None
+    width, fields, literals = layout
+    # One character more than the format's width, so longer strings are told apart from exact
+    # ones; as UCS-4 every character is one uint32, whatever the text
+    raw = values.astype(f'U{width + 1}')
+
+    matrix = raw.view(np.uint32).reshape(len(raw), width + 1)
+    valid = matrix[:, width] == 0
+    for position, literal in literals:
+        valid &= matrix[:, position] == literal
+
+    numbers = {}
+    for directive, (digits, largest) in FIXED_WIDTH_FIELDS.items():
+        if directive not in fields:
+            numbers[directive] = np.zeros(len(raw), dtype=np.int64)
+            continue
+        number = np.zeros(len(raw), dtype=np.int64)
+        for position in range(fields[directive], fields[directive] + digits):
+            digit = matrix[:, position] - np.uint32(ord('0'))
+            valid &= digit < 10
+            number = number * 10 + digit
+        valid &= number <= largest
+        numbers[directive] = number
+    valid &= (numbers['%m'] >= 1) & (numbers['%d'] >= 1)
+
+    month = ((numbers['%Y'] - 1970) * 12 + numbers['%m'] - 1).astype('datetime64[M]')
+    day = month.astype('datetime64[D]') + (numbers['%d'] - 1)
+    # A day past the end of its month, like 31/04, rolls over into the next month
+    valid &= day.astype('datetime64[M]') == month
+    seconds = numbers['%H'] * 3600 + numbers['%M'] * 60 + numbers['%S']
+    parsed = (day.astype('datetime64[s]') + seconds).astype('datetime64[ns]')
+    parsed[~valid] = np.datetime64('NaT')
+    return parsed
+
+
+def parse_datetime_column(col, formats=DATETIME_FORMATS, sample_size=FORMAT_SAMPLE_SIZE):
+    """
+    Parse a column of datetime strings into datetime64[ns], coercing unparseable values to NaT.
+
+    The dominant format is detected from a sample and every value is parsed with that fixed
+    format in one vectorized pass: pandas' ISO 8601 parser for ISO formats, NumPy arithmetic
+    on the bytes for other fixed-width formats. Only the values it rejects go through
+    pandas' slow per-value parser. A column that already holds datetimes is returned as it is.
+
+    :param col: Series of datetime strings (object, string or categorical) or datetimes.
+    :return: (parsed Series, report dict with the detected 'format' and the number of values
+             parsed on the 'fast_path', sent to the 'fallback' parser and 'coerced' to NaT
+             although they were not empty).
+    """
+    if pd.api.types.is_datetime64_any_dtype(col):
+        return col, {'format': None, 'fast_path': 0, 'fallback': 0, 'coerced': 0}
+
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        # Parse each distinct string once and map the results back through the codes
+        categories = pd.Series(col.cat.categories.astype(object))
+        parsed_categories, datetime_format, masks = _parse_strings(categories, formats, sample_size)
+        codes = col.cat.codes.to_numpy()
+        parsed = parsed_categories.to_numpy()[np.maximum(codes, 0)]
+        parsed[codes < 0] = np.datetime64('NaT')
+        # Each category counts as often as it occurs
+        occurrences = np.bincount(codes[codes >= 0], minlength=len(categories))
+        counts = {key: int(occurrences[mask].sum()) for key, mask in masks.items()}
+        return pd.Series(parsed, index=col.index, name=col.name), {'format': datetime_format, **counts}
+
+    parsed, datetime_format, masks = _parse_strings(col, formats, sample_size)
+    return parsed, {'format': datetime_format, **{key: int(mask.sum()) for key, mask in masks.items()}}
+
+
+def _parse_strings(col, formats, sample_size):
+    """Parse a Series of strings; returns the parsed Series, the detected format and the masks of the report."""
+    values = col.to_numpy(dtype=object)
+    datetime_format = detect_datetime_format(values, formats, sample_size)
+
+    parsed = None
+    if datetime_format is not None and not datetime_format.startswith('%Y-%m-%d'):
+        # pandas has a fast C parser for ISO 8601 only
+        fixed_width = _parse_fixed_width(values, datetime_format)
+        if fixed_width is not None:
+            parsed = pd.Series(fixed_width, index=col.index, name=col.name)
+    if parsed is None and datetime_format is not None:
+        parsed = pd.to_datetime(col, format=datetime_format, errors='coerce').astype('datetime64[ns]')
+    if parsed is None:
+        parsed = pd.Series(pd.NaT, index=col.index, dtype='datetime64[ns]', name=col.name)
+
+    # Values the fast path rejected, leaving out missing values and empty strings; only
+    # the NaT rows are checked, as a null check over the whole object column is costly
+    fallback = parsed.isna().to_numpy()
+    rejected = values[fallback]
+    fallback[fallback] = pd.notna(rejected) & (rejected != '')
+    if fallback.any():
+        with warnings.catch_warnings():
+            # pandas warns that it parses value by value, which is intended for the few outliers here
+            warnings.simplefilter('ignore', UserWarning)
+            # Values with a UTC offset are converted to UTC; naive values are kept as they are.
+            # Ambiguous dates like 01/02 are read in the day/month order of the detected format.
+            dayfirst = bool(datetime_format) and 0 <= datetime_format.find('%d') < datetime_format.find('%m')
+            outliers = pd.to_datetime(col[fallback], format='mixed', errors='coerce', utc=True, dayfirst=dayfirst)
+        parsed[fallback] = outliers.dt.tz_localize(None).astype('datetime64[ns]').to_numpy()
+
+    parsed_mask = parsed.notna().to_numpy()
+    return parsed, datetime_format, {'fast_path': parsed_mask & ~fallback, 'fallback': fallback,
+                                     'coerced': fallback & ~parsed_mask}
@@ -0,0 +1,242 @@
+import io
+import os
+import shutil
+import pandas as pd
+from src.metrics import stage
+from src.schema import CSV_READ_DTYPES, apply_order_schema
+
+# Supported file formats and the extension used for each
+FILE_EXTENSIONS = {
+    'csv': '.csv',
+    'parquet': '.parquet',
+    'arrow': '.arrows'
+}
+
+# Compression codec used for the columnar formats
+COLUMNAR_COMPRESSION = 'zstd'
+
+
+def _import_pyarrow():
+    """Import pyarrow lazily, so CSV-only runs never pay for it."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Parquet and Arrow files need the 'pyarrow' package: pip install pyarrow") from e
+    return pa, pq
+
+
+def get_file_format(file_path):
+    """Return the file format ('csv', 'parquet' or 'arrow') of a path based on its extension."""
+    extension = os.path.splitext(file_path)[1].lower()
+    for file_format, format_extension in FILE_EXTENSIONS.items():
+        if extension == format_extension:
+            return file_format
+    raise ValueError(f"Unsupported file extension '{extension}' for '{file_path}'.")
+
+
+def get_file_extension(file_format):
+    """Return the extension for `file_format`, raising a ValueError for unknown formats."""
+    if file_format not in FILE_EXTENSIONS:
+        raise ValueError(f"Unsupported file format '{file_format}'. Choose one of {list(FILE_EXTENSIONS)}.")
+    return FILE_EXTENSIONS[file_format]
+
+
+def _to_arrow_table(df, schema=None):
+    """Convert a DataFrame to an Arrow table with dictionary-encoded string columns."""
+    pa, _ = _import_pyarrow()
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    if schema is not None:
+        return table.cast(schema)
+
+    # Order data has few distinct values per string column, so store them as dictionaries
+    for i, field in enumerate(table.schema):
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            table = table.set_column(i, field.name, table.column(i).dictionary_encode())
+    return table
+
+
+class ChunkedFrameWriter:
+    """
+    Appends DataFrame chunks to a single CSV, Parquet or Arrow IPC stream file.
+
+    Use as a context manager; the file format is taken from the path's extension.
+    CSV chunks are appended as text with a single header row, Parquet chunks become
+    row groups and Arrow chunks become record batches. Arrow uses the IPC stream
+    format because, unlike the IPC file format, it lets each batch carry its own
+    dictionaries.
+
+    Instead of a path, a writable binary file object (for example a compressing stream
+    or a blob upload) can be given together with `file_format`; it is written to but
+    left open on close. If the `with` block raises, a partially written file at a path
+    is removed, so an interrupted run never leaves a truncated file behind.
+    """
+
+    def __init__(self, file_path, file_format=None):
+        self.file_path = file_path
+        self.file_format = file_format or get_file_format(file_path)
+        get_file_extension(self.file_format)
+        self._file = None
+        self._writer = None
+        self._schema = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        if exc_type is not None and isinstance(self.file_path, str) and os.path.exists(self.file_path):
+            os.remove(self.file_path)
+
+    def write(self, df):
+        """Append one chunk to the file."""
+        with stage('io.write', rows_in=len(df), rows_out=len(df)):
+            self._write(df)
+
+    def _write(self, df):
+        if self.file_format == 'csv':
+            header = self._file is None
+            if self._file is None:
+                if isinstance(self.file_path, str):
+                    self._file = open(self.file_path, 'w', newline='')
+                else:
+                    self._file = io.TextIOWrapper(self.file_path, encoding='utf-8', newline='')
+            # Only the first chunk carries the header row
+            df.to_csv(self._file, index=False, header=header)
+            return
+
+        pa, pq = _import_pyarrow()
+        table = _to_arrow_table(df, self._schema)
+        if self._writer is None:
+            self._schema = table.schema
+            if self.file_format == 'parquet':
+                self._writer = pq.ParquetWriter(self.file_path, self._schema,
+                                                compression=COLUMNAR_COMPRESSION, use_dictionary=True)
+            else:
+                options = pa.ipc.IpcWriteOptions(compression=COLUMNAR_COMPRESSION)
+                self._writer = pa.ipc.new_stream(self.file_path, self._schema, options=options)
+        self._writer.write_table(table)
+
+    def close(self):
+        """Flush and close the underlying file."""
+        if self._file is None and self._writer is None:
+            return
+
+        # Part of the writing time, but not another write call; the file size is known now
+        with stage('io.write', calls=0) as record:
+            if self._file is not None:
+                if isinstance(self.file_path, str):
+                    self._file.close()
+                else:
+                    # Flush the text layer but leave the caller's file object open
+                    self._file.flush()
+                    self._file.detach()
+                self._file = None
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            if isinstance(self.file_path, str):
+                record.bytes_written = os.path.getsize(self.file_path)
+
+
+def write_frame(df, file_path):
+    """Write a DataFrame to `file_path` in the format given by its extension."""
+    with ChunkedFrameWriter(file_path) as writer:
+        writer.write(df)
+
+
+def read_frame(file_path, columns=None):
+    """
+    Read a CSV, Parquet or Arrow IPC stream file into a DataFrame.
+
+    The compact order schema is applied to the result: string columns become categoricals
+    and integer columns are narrowed. Columnar files keep their datetime types, so no text
+    needs to be re-parsed.
+
+    :param file_path: Path of the file to read.
+    :param columns: Optional list of columns to load.
+    """
+    file_format = get_file_format(file_path)
+    with stage('io.read', bytes_read=os.path.getsize(file_path)) as record:
+        if file_format == 'csv':
+            df = apply_order_schema(pd.read_csv(file_path, usecols=columns, dtype=CSV_READ_DTYPES))
+        else:
+            pa, pq = _import_pyarrow()
+            if file_format == 'parquet':
+                table = pq.read_table(file_path, columns=columns)
+            else:
+                with pa.memory_map(file_path) as source:
+                    table = pa.ipc.open_stream(source).read_all()
+                if columns is not None:
+                    table = table.select(columns)
+            df = apply_order_schema(table.to_pandas())
+        record.rows_out = len(df)
+    return df
+
+
+def iter_frame_chunks(file_path, chunksize):
+    """
+    Yield a CSV, Parquet or Arrow IPC stream file as DataFrames of at most `chunksize` rows,
+    each with the compact order schema applied.
+    """
+    chunks = _iter_frame_chunks(file_path, chunksize)
+    # The whole file is read by the end, so its size is counted with the first chunk
+    bytes_read = os.path.getsize(file_path)
+    while True:
+        # Only the reading is timed, not what the caller does with each chunk
+        with stage('io.read', bytes_read=bytes_read) as record:
+            chunk = next(chunks, None)
+            if chunk is None:
+                record.calls = 0
+            else:
+                record.rows_out = len(chunk)
+        if chunk is None:
+            return
+        bytes_read = 0
+        yield chunk
+
+
+def _iter_frame_chunks(file_path, chunksize):
+    file_format = get_file_format(file_path)
+    if file_format == 'csv':
+        for chunk in pd.read_csv(file_path, chunksize=chunksize, dtype=CSV_READ_DTYPES):
+            yield apply_order_schema(chunk)
+        return
+
+    pa, pq = _import_pyarrow()
+    if file_format == 'parquet':
+        for batch in pq.ParquetFile(file_path).iter_batches(batch_size=chunksize):
+            yield apply_order_schema(batch.to_pandas())
+    else:
+        with pa.memory_map(file_path) as source:
+            for batch in pa.ipc.open_stream(source):
+                table = pa.Table.from_batches([batch])
+                for offset in range(0, table.num_rows, chunksize):
+                    yield apply_order_schema(table.slice(offset, chunksize).to_pandas())
+
+
+def merge_files(part_paths, file_path, remove_parts=True):
+    """
+    Concatenate files of the same format into `file_path`.
+
+    CSV parts are joined byte-wise, keeping only the first header; Parquet and Arrow parts
+    are streamed into the merged file one chunk at a time.
+    """
+    if get_file_format(file_path) == 'csv':
+        with open(file_path, 'wb') as merged:
+            for part_number, part_path in enumerate(part_paths):
+                with open(part_path, 'rb') as part:
+                    header = part.readline()
+                    if part_number == 0:
+                        merged.write(header)
+                    shutil.copyfileobj(part, merged, length=16 * 1024 * 1024)
+    else:
+        with ChunkedFrameWriter(file_path) as writer:
+            for part_path in part_paths:
+                for chunk in iter_frame_chunks(part_path, chunksize=1_000_000):
+                    writer.write(chunk)
+
+    if remove_parts:
+        for part_path in part_paths:
+            os.remove(part_path)
@@ -0,0 +1,253 @@
+import functools
+import itertools
+import queue
+import threading
+import time
+from src.data_cleaner import clean_raw_file, get_latest_rogue_csv_file
+from src.pipeline import ChunkPipeline
+from src.rogue_record_generator import RogueRecordGenerator
+
+# Number of jobs run at the same time; further jobs wait in the queue
+DEFAULT_JOB_WORKERS = 1
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's stage when the job has been cancelled."""
+
+
+class Job:
+    """
+    A named sequence of pipeline stages, run in the background by a JobRunner.
+
+    Each stage is a (name, function) pair. The function is called with the job, can read
+    earlier stages' results from `job.results`, reports processed rows through
+    `job.report` and returns its result; a falsy result, like the None returned by the
+    pipeline functions when they fail, fails the job. Cancellation is cooperative:
+    `job.report` raises JobCancelled once the job has been cancelled, which stops the
+    stage at its next chunk.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, name, stages):
+        """
+        :param name: Name shown in the UI.
+        :param stages: List of (stage name, function) pairs, run in order.
+        """
+        self.job_id = next(self._ids)
+        self.name = name
+        self.stages = list(stages)
+        self.status = QUEUED
+        self.stage = None
+        self.stage_number = 0
+        self.rows_processed = 0
+        self.stage_rows = 0
+        self.results = {}
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._stage_started_at = None
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def report(self, rows):
+        """Record `rows` processed by the current stage; raises JobCancelled if the job was cancelled."""
+        if self._cancel_event.is_set():
+            raise JobCancelled(f"Job '{self.name}' was cancelled.")
+        with self._lock:
+            self.rows_processed += rows
+            self.stage_rows += rows
+
+    def cancel(self):
+        """Ask the job to stop; a queued job never starts, a running one stops at its next report."""
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    def progress(self):
+        """Return a snapshot of the job's state, stage and throughput as a dict."""
+        with self._lock:
+            now = self.finished_at or time.time()
+            elapsed = now - self.started_at if self.started_at else 0.0
+            stage_elapsed = now - self._stage_started_at if self._stage_started_at else 0.0
+            return {
+                'job_id': self.job_id,
+                'name': self.name,
+                'status': self.status,
+                'stage': self.stage,
+                'stage_number': self.stage_number,
+                'stages_total': len(self.stages),
+                'rows_processed': self.rows_processed,
+                'stage_rows': self.stage_rows,
+                'rows_per_second': self.stage_rows / stage_elapsed if stage_elapsed > 0 else 0.0,
+                'elapsed_seconds': elapsed,
+                'error': self.error
+            }
+
+    def run(self):
+        """Run the stages in order in the calling thread, recording the outcome."""
+        with self._lock:
+            self.status = RUNNING
+            self.started_at = time.time()
+
+        try:
+            for stage_number, (stage, func) in enumerate(self.stages, start=1):
+                if self.cancelled:
+                    raise JobCancelled(f"Job '{self.name}' was cancelled.")
+                with self._lock:
+                    self.stage, self.stage_number, self.stage_rows = stage, stage_number, 0
+                    self._stage_started_at = time.time()
+
+                result = func(self)
+
+                # Pipeline functions report errors by returning None, which also covers a cancellation
+                if self.cancelled:
+                    raise JobCancelled(f"Job '{self.name}' was cancelled.")
+                if not result:
+                    raise RuntimeError(f"Stage '{stage}' failed.")
+                self.results[stage] = result
+            status, error = DONE, None
+        except JobCancelled:
+            status, error = CANCELLED, None
+        except Exception as e:
+            status, error = FAILED, str(e)
+
+        with self._lock:
+            self.status, self.error = status, error
+            self.finished_at = time.time()
+
+
+class JobRunner:
+    """
+    Runs jobs on background worker threads, so UIs stay responsive while they run.
+
+    Submitted jobs wait in a FIFO queue until a worker is free; `num_workers` jobs run at
+    the same time. UIs poll `job.progress()` to show the stage, rows and throughput.
+    """
+
+    def __init__(self, num_workers=DEFAULT_JOB_WORKERS):
+        """
+        :param num_workers: Number of jobs run at the same time.
+        """
+        self._queue = queue.Queue()
+        self._jobs = {}
+        self._lock = threading.Lock()
+        # Daemon threads, so a running job never keeps the application from exiting
+        self._workers = [threading.Thread(target=self._work, daemon=True, name=f"job-worker-{i}")
+                         for i in range(num_workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, name, stages):
+        """
+        Queue a job and return it immediately.
+
+        :param name: Name shown in the UI.
+        :param stages: List of (stage name, function) pairs, run in order.
+        :return: The queued Job.
+        """
+        job = Job(name, stages)
+        with self._lock:
+            self._jobs[job.job_id] = job
+        self._queue.put(job)
+        return job
+
+    def get_job(self, job_id):
+        """Return the job with this id, or None."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self):
+        """Return all submitted jobs, oldest first."""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job; returns False if there is no such job."""
+        job = self.get_job(job_id)
+        if job is None:
+            return False
+        job.cancel()
+        return True
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            try:
+                # A job cancelled while queued ends as cancelled before its first stage
+                job.run()
+            finally:
+                self._queue.task_done()
+
+
+@functools.lru_cache(maxsize=None)
+def get_job_runner():
+    """Return the process-wide JobRunner, shared by all UI sessions."""
+    return JobRunner()
+
+
+def generate_stage(num_records=10000, rogue_prob=0.1):
+    """Stage that streams new rogue records to 'data/raw' and returns the file's path."""
+    def generate(job):
+        generator = RogueRecordGenerator(num_records=num_records, rogue_prob=rogue_prob)
+        return generator.save_to_csv_stream('rogue.csv', progress_callback=job.report)
+
+    return 'generate', generate
+
+
+def clean_stage(file_path_prefix='data/cleaned/cleaned.csv'):
+    """
+    Stage that cleans the file from the 'generate' stage, or else the latest raw file,
+    and returns the cleaned file's path.
+    """
+    def clean(job):
+        raw_path = job.results.get('generate') or get_latest_rogue_csv_file()
+        if not raw_path:
+            raise FileNotFoundError("No rogue files found to process.")
+        return clean_raw_file(raw_path, file_path_prefix, progress_callback=job.report)
+
+    return 'clean', clean
+
+
+def upload_stage(uploader, bucket_name, destination_blob_name, source_stage='clean', file_path=None):
+    """
+    Stage that uploads the file produced by `source_stage`, or `file_path` if given, and returns
+    the blob name; the job fails if the upload does.
+    """
+    def upload(job):
+        source_file_name = file_path or job.results[source_stage]
+        if not uploader.upload_file(bucket_name, source_file_name, destination_blob_name):
+            raise RuntimeError(f"Uploading '{source_file_name}' failed.")
+        return destination_blob_name
+
+    return 'upload', upload
+
+
+def pipeline_stage(num_records=10000, rogue_prob=0.1, file_path_prefix='data/cleaned/cleaned.csv'):
+    """
+    Stage that generates and cleans records as an overlapping ChunkPipeline and returns its summary.
+
+    Its 'raw_path' and 'cleaned_path' replace the results of separate generate and clean stages.
+    """
+    def run_pipeline(job):
+        summary = ChunkPipeline(num_records=num_records, rogue_prob=rogue_prob).run(
+            cleaned_file_path_prefix=file_path_prefix, progress_callback=job.report)
+        if summary:
+            job.results['generate'], job.results['clean'] = summary['raw_path'], summary['cleaned_path']
+        return summary
+
+    return 'pipeline', run_pipeline
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+
+# Block size used when hashing files, so large files are never read into memory at once
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class CleaningManifest:
+    """
+    Persistent record of which raw files have already been cleaned.
+
+    Entries map a raw file's content hash and the cleaning configuration to the cleaned
+    output produced from it, so a raw file with the same content is not cleaned twice.
+    File hashes are cached by path, size and modification time, so an unchanged raw file
+    is not even re-read to compute its hash.
+    """
+
+    def __init__(self, manifest_path='data/cleaned/manifest.json'):
+        """
+        Loads the manifest, starting an empty one if the file does not exist yet.
+
+        :param manifest_path: Path of the JSON manifest file.
+        """
+        self.manifest_path = manifest_path
+        self.entries = {}
+        self.file_hashes = {}
+
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                data = json.load(f)
+            self.entries = data.get('entries', {})
+            self.file_hashes = data.get('file_hashes', {})
+
+    def hash_file(self, file_path):
+        """Return the SHA-256 of a file, reusing the cached hash if the file is unchanged."""
+        stat = os.stat(file_path)
+        cache_key = os.path.abspath(file_path)
+        cached = self.file_hashes.get(cache_key)
+        if cached and cached['size'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns:
+            return cached['sha256']
+
+        content_hash = hash_file(file_path)
+
+        self.file_hashes[cache_key] = {
+            'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': content_hash
+        }
+        return content_hash
+
+    @staticmethod
+    def _entry_key(content_hash, config_key):
+        return f"{content_hash}:{config_key}"
+
+    def lookup(self, content_hash, config_key):
+        """Return the cleaned output recorded for this content and configuration, if it still exists."""
+        entry = self.entries.get(self._entry_key(content_hash, config_key))
+        if entry and os.path.exists(entry['cleaned_path']):
+            return entry['cleaned_path']
+        return None
+
+    def record(self, content_hash, config_key, raw_path, cleaned_path):
+        """Record that `raw_path` with this content and configuration was cleaned into `cleaned_path`."""
+        self.entries[self._entry_key(content_hash, config_key)] = {
+            'raw_path': raw_path,
+            'cleaned_path': cleaned_path,
+            'cleaned_at': datetime.now().isoformat(timespec='seconds')
+        }
+
+    def source_hashes(self):
+        """Return the content hash of the raw file each recorded cleaned file came from, keyed by its absolute path."""
+        return {os.path.abspath(entry['cleaned_path']): key.split(':', 1)[0] for key, entry in self.entries.items()}
+
+    def save(self):
+        """Write the manifest to disk atomically."""
+        directory = os.path.dirname(self.manifest_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        temp_path = f"{self.manifest_path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({'entries': self.entries, 'file_hashes': self.file_hashes}, f, indent=2)
+        os.replace(temp_path, self.manifest_path)
+
+
+def hash_file(file_path):
+    """Return the SHA-256 of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
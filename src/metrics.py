@@ -0,0 +1,229 @@
+import contextlib
+import json
+import os
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+# Files written by export_json and export_prometheus
+DEFAULT_METRICS_JSON_PATH = os.path.join('data', 'metrics', 'metrics.json')
+DEFAULT_METRICS_PROM_PATH = os.path.join('data', 'metrics', 'metrics.prom')
+
+# Prefix of the Prometheus metric names
+PROMETHEUS_PREFIX = 'rogue_pipeline_stage'
+
+# Counters summed over all calls of a stage, with their Prometheus help text
+COUNTERS = {
+    'calls': "Number of times the stage ran.",
+    'seconds': "Wall time spent in the stage, in seconds.",
+    'rows_in': "Rows passed into the stage.",
+    'rows_out': "Rows coming out of the stage.",
+    'rows_dropped': "Rows removed by the stage.",
+    'bytes_read': "Bytes read from files by the stage.",
+    'bytes_written': "Bytes written to files or blobs by the stage."
+}
+
+
+class StageRecord:
+    """
+    Measurements of one run of a stage, filled in by the code being measured.
+
+    `measure()` adds the wall time (and, while memory tracing is on, the peak memory) of
+    its block, so a stage spread over several blocks, like a cleaning step whose mask and
+    column fix run apart, adds up into one record.
+    """
+
+    def __init__(self, name, rows_in=None, rows_out=None, bytes_read=0, bytes_written=0, calls=1):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = rows_out
+        self.bytes_read = bytes_read
+        self.bytes_written = bytes_written
+        self.calls = calls
+        self.seconds = 0.0
+        self.peak_memory_bytes = None
+
+    @contextlib.contextmanager
+    def measure(self):
+        """Add the wall time and peak memory of the `with` block to this record."""
+        trace = tracemalloc.is_tracing()
+        if trace:
+            stack = _active_measurements()
+            start_memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            # Peaks of nested blocks, which reset the process-wide peak while this block runs
+            stack.append(0)
+
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.seconds += time.perf_counter() - start
+            if trace:
+                peak = max(tracemalloc.get_traced_memory()[1], stack.pop())
+                if stack:
+                    stack[-1] = max(stack[-1], peak)
+                self.peak_memory_bytes = max(self.peak_memory_bytes or 0, peak - start_memory)
+
+    @property
+    def rows_dropped(self):
+        if self.rows_in is None or self.rows_out is None:
+            return 0
+        return max(self.rows_in - self.rows_out, 0)
+
+
+_local = threading.local()
+
+
+def _active_measurements():
+    """Per-thread stack of the absolute memory peaks of the measure() blocks still running."""
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+class MetricsRegistry:
+    """
+    Collects per-stage metrics of the pipeline: wall time, rows in/out, rows dropped,
+    bytes read/written and, while memory tracing is on, peak memory.
+
+    Stages are named by dotted paths, e.g. 'generate', 'io.read' or 'upload.file'. A
+    stage whose prefix is also a stage runs inside it, like 'clean.negative_qty'
+    inside 'clean', so its time is part of its parent's. The totals can be exported as
+    JSON or as a Prometheus textfile (for node_exporter's textfile collector) to see
+    which stage dominates a run.
+
+    Memory tracing uses tracemalloc, which slows allocation-heavy code down noticeably,
+    so it is off unless turned on with `set_memory_tracing`. tracemalloc's peak is
+    process-wide, so stages running at the same time in other threads add to it.
+    Stages run in worker processes (parallel generation and cleaning) are recorded in
+    those processes and do not show up here.
+    """
+
+    def __init__(self):
+        self._stages = {}
+        self._lock = threading.Lock()
+        self.started_at = datetime.now()
+
+    @contextlib.contextmanager
+    def stage(self, name, rows_in=None, rows_out=None, bytes_read=0, bytes_written=0, calls=1):
+        """
+        Measure the `with` block as one run of stage `name` and add it to the totals.
+
+        The block receives the StageRecord and can fill in rows and bytes known only at
+        the end, e.g. `record.rows_out = len(df)`. Runs that raise are recorded too.
+        """
+        record = StageRecord(name, rows_in, rows_out, bytes_read, bytes_written, calls)
+        try:
+            with record.measure():
+                yield record
+        finally:
+            self.add(record)
+
+    def add(self, record):
+        """Add a finished StageRecord to the totals of its stage."""
+        with self._lock:
+            totals = self._stages.setdefault(record.name, dict.fromkeys(COUNTERS, 0))
+            totals['calls'] += record.calls
+            totals['seconds'] += record.seconds
+            totals['rows_in'] += record.rows_in or 0
+            totals['rows_out'] += record.rows_out or 0
+            totals['rows_dropped'] += record.rows_dropped
+            totals['bytes_read'] += record.bytes_read
+            totals['bytes_written'] += record.bytes_written
+            if record.peak_memory_bytes is not None:
+                totals['peak_memory_bytes'] = max(totals.get('peak_memory_bytes', 0), record.peak_memory_bytes)
+
+    def snapshot(self):
+        """Return the totals per stage, sorted by name, with the throughput of each stage."""
+        with self._lock:
+            stages = {name: dict(totals) for name, totals in sorted(self._stages.items())}
+        for totals in stages.values():
+            rows = max(totals['rows_in'], totals['rows_out'])
+            totals['rows_per_second'] = rows / totals['seconds'] if totals['seconds'] > 0 else 0.0
+        return stages
+
+    def reset(self):
+        """Drop all totals, e.g. before measuring a new run."""
+        with self._lock:
+            self._stages.clear()
+            self.started_at = datetime.now()
+
+    def to_json(self):
+        """Return the totals as a JSON document."""
+        return json.dumps({
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'exported_at': datetime.now().isoformat(timespec='seconds'),
+            'memory_tracing': tracemalloc.is_tracing(),
+            'stages': self.snapshot()
+        }, indent=2)
+
+    def to_prometheus(self):
+        """Return the totals in the Prometheus text exposition format."""
+        stages = self.snapshot()
+        lines = []
+        for counter, help_text in COUNTERS.items():
+            metric = f"{PROMETHEUS_PREFIX}_{counter}_total"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for name, totals in stages.items():
+                lines.append(f'{metric}{{stage="{name}"}} {totals[counter]}')
+
+        metric = f"{PROMETHEUS_PREFIX}_peak_memory_bytes"
+        lines.append(f"# HELP {metric} Highest memory allocated by one run of the stage, in bytes.")
+        lines.append(f"# TYPE {metric} gauge")
+        for name, totals in stages.items():
+            if 'peak_memory_bytes' in totals:
+                lines.append(f'{metric}{{stage="{name}"}} {totals["peak_memory_bytes"]}')
+        return "\n".join(lines) + "\n"
+
+    def export_json(self, file_path=DEFAULT_METRICS_JSON_PATH):
+        """Write the totals as JSON to `file_path` and return the path."""
+        return _write_atomically(file_path, self.to_json())
+
+    def export_prometheus(self, file_path=DEFAULT_METRICS_PROM_PATH):
+        """Write the totals as a Prometheus textfile to `file_path` and return the path."""
+        return _write_atomically(file_path, self.to_prometheus())
+
+
+def _write_atomically(file_path, text):
+    """Write `text` through a temporary file, so a collector never reads a half-written file."""
+    directory = os.path.dirname(file_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f"{file_path}.tmp"
+    with open(temp_path, 'w') as f:
+        f.write(text)
+    os.replace(temp_path, file_path)
+    return file_path
+
+
+# Registry shared by the whole process
+registry = MetricsRegistry()
+
+
+def stage(name, **counts):
+    """Measure the `with` block as one run of stage `name` in the shared registry."""
+    return registry.stage(name, **counts)
+
+
+def set_memory_tracing(enabled):
+    """Turn tracemalloc-based peak memory measurement of every stage on or off."""
+    if enabled and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not enabled and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def export_metrics(json_path=DEFAULT_METRICS_JSON_PATH, prometheus_path=DEFAULT_METRICS_PROM_PATH):
+    """Export the shared registry as JSON and as a Prometheus textfile; returns the written paths."""
+    paths = []
+    try:
+        if json_path:
+            paths.append(registry.export_json(json_path))
+        if prometheus_path:
+            paths.append(registry.export_prometheus(prometheus_path))
+    except Exception as e:
+        print(f"An error occurred while exporting the metrics: {e}")
+    return paths
@@ -0,0 +1,403 @@
+import argparse
+import operator
+import os
+import re
+from datetime import datetime
+from urllib.parse import quote, unquote
+import numpy as np
+import pandas as pd
+from src.datetime_parser import parse_datetime_column
+from src.file_io import FILE_EXTENSIONS, ChunkedFrameWriter, get_file_extension, iter_frame_chunks, read_frame
+from src.metrics import stage
+from src.schema import ORDER_COLUMNS, apply_order_schema
+
+# Root folder of the partitioned cleaned dataset
+DEFAULT_PARTITION_ROOT = os.path.join('data', 'partitioned')
+
+# Partition keys, outermost first; 'year' and 'month' come from the 'datetime' column
+DEFAULT_PARTITION_BY = ['year', 'month']
+PARTITION_KEYS = ['year', 'month', 'country']
+DATETIME_PARTITION_KEYS = ['year', 'month']
+
+# Directory value of a partition whose key is missing, as in Hive
+NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+# A partition's buffered rows are written out once they reach this many, so files get large row groups
+PARTITION_FLUSH_ROWS = 100_000
+
+# All buffers are written out once they hold this many rows in total, which bounds memory
+MAX_BUFFERED_ROWS = 1_000_000
+
+# Comparison operators of filter predicates
+FILTER_OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    'in': lambda value, values: value in values
+}
+
+# 'key=value' directory names of a partitioned dataset
+PARTITION_DIR_PATTERN = re.compile(r'^([A-Za-z_]\w*)=(.*)$')
+
+
+def _check_partition_by(partition_by):
+    unknown = [key for key in partition_by if key not in PARTITION_KEYS]
+    if unknown or len(set(partition_by)) != len(partition_by):
+        raise ValueError(f"Partition keys must be distinct keys from {PARTITION_KEYS}, got {list(partition_by)}.")
+
+
+def _months(df):
+    """Return the 'datetime' column as datetime64[M], parsing it if it was read as text."""
+    datetimes = df['datetime']
+    if not pd.api.types.is_datetime64_any_dtype(datetimes):
+        datetimes = parse_datetime_column(datetimes)[0]
+    return datetimes.to_numpy().astype('datetime64[M]')
+
+
+def _partition_codes(df, key, months):
+    """Return a key's integer code per row and the directory value of each code."""
+    if key in DATETIME_PARTITION_KEYS:
+        numbers = months.view(np.int64)
+        values = numbers // 12 + 1970 if key == 'year' else numbers % 12 + 1
+        values = np.where(np.isnat(months), -1, values)
+        codes, levels = pd.factorize(values)
+        return codes, [NULL_PARTITION if level < 0 else f"{level:04d}" if key == 'year' else f"{level:02d}"
+                       for level in levels]
+
+    codes, levels = pd.factorize(df[key], use_na_sentinel=False)
+    return codes, [NULL_PARTITION if pd.isna(level) or level == '' else quote(str(level), safe=' ')
+                   for level in levels]
+
+
+def partition_path(partition_values):
+    """Return the relative directory of a partition, e.g. 'year=2023/month=03/country=Germany'."""
+    return os.path.join(*(f"{key}={value}" for key, value in partition_values))
+
+
+class PartitionedWriter:
+    """
+    Writes order chunks into a Hive-style partitioned dataset, laid out as
+    `root/year=YYYY/month=MM[/country=NAME]/<part_name>.<ext>`.
+
+    Each chunk is split by its partition keys in one pass (a factorize of the combined key
+    and a stable argsort) and the rows are buffered per partition, so each partition's
+    file gets large row groups rather than a sliver per chunk. 'year' and 'month' are
+    derived from the 'datetime' column; a stored key column like 'country' is left out of
+    the files, as its value is in the path, and added back by `read_partitioned`.
+
+    Every writer adds one file per partition it touches, named `part_name`, so files of
+    different runs sit side by side and writing the same part again replaces it. `close()`
+    returns the touched partitions, e.g. for `GCSUploader.upload_partitions`. Used as a
+    context manager, the files of an interrupted write are removed.
+    """
+
+    def __init__(self, root=DEFAULT_PARTITION_ROOT, partition_by=DEFAULT_PARTITION_BY, file_format='parquet',
+                 part_name=None):
+        """
+        :param root: Root folder of the dataset.
+        :param partition_by: Partition keys, outermost first, from PARTITION_KEYS.
+        :param file_format: Format of the part files: 'parquet' (default), 'csv' or 'arrow'.
+        :param part_name: Name of this writer's file in each partition; defaults to a timestamped 'part-*'.
+        """
+        _check_partition_by(partition_by)
+        self.root = root
+        self.partition_by = list(partition_by)
+        self.file_name = (part_name or f"part-{datetime.now().strftime('%Y%m%d_%H%M%S')}") \
+            + get_file_extension(file_format)
+        self._stored_keys = [key for key in self.partition_by if key not in DATETIME_PARTITION_KEYS]
+        self._buffers = {}
+        self._buffered_rows = 0
+        self._writers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+            return
+        for writer in self._writers.values():
+            writer.__exit__(exc_type, exc_value, traceback)
+        self._writers.clear()
+        self._buffers.clear()
+
+    def write(self, df):
+        """Split one chunk into its partitions and buffer the rows, writing out full buffers."""
+        if len(df) == 0:
+            return
+        with stage('partition.split', rows_in=len(df), rows_out=len(df)):
+            months = _months(df) if set(self.partition_by) & set(DATETIME_PARTITION_KEYS) else None
+            keys = [_partition_codes(df, key, months) for key in self.partition_by]
+            shape = tuple(len(levels) for _, levels in keys)
+            groups, combined = pd.factorize(np.ravel_multi_index([codes for codes, _ in keys], shape))
+            # One copy of the chunk with the rows of each partition next to each other, in their
+            # original order; each partition's rows are then a slice of it
+            order = np.argsort(groups, kind='stable')
+            sorted_groups = groups[order]
+            starts = np.concatenate([[0], np.flatnonzero(np.diff(sorted_groups)) + 1])
+            ends = np.append(starts[1:], len(order))
+            rows = df.drop(columns=self._stored_keys).take(order)
+
+            for start, end in zip(starts, ends):
+                codes = np.unravel_index(combined[sorted_groups[start]], shape)
+                partition = tuple((key, levels[code]) for key, (_, levels), code in zip(self.partition_by, keys, codes))
+                self._buffers.setdefault(partition, []).append(rows.iloc[start:end])
+                self._buffered_rows += int(end - start)
+
+        for partition in [partition for partition, frames in self._buffers.items()
+                          if sum(len(frame) for frame in frames) >= PARTITION_FLUSH_ROWS]:
+            self._flush(partition)
+        if self._buffered_rows >= MAX_BUFFERED_ROWS:
+            for partition in list(self._buffers):
+                self._flush(partition)
+
+    def _flush(self, partition):
+        frames = self._buffers.pop(partition)
+        self._buffered_rows -= sum(len(frame) for frame in frames)
+        writer = self._writers.get(partition)
+        if writer is None:
+            directory = os.path.join(self.root, partition_path(partition))
+            os.makedirs(directory, exist_ok=True)
+            writer = self._writers[partition] = ChunkedFrameWriter(os.path.join(directory, self.file_name))
+        writer.write(pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0])
+
+    def close(self):
+        """Write out the buffered rows, close every file and return the touched partitions' relative directories."""
+        for partition in list(self._buffers):
+            self._flush(partition)
+        for writer in self._writers.values():
+            writer.close()
+        touched = sorted(partition_path(partition) for partition in self._writers)
+        self._writers.clear()
+        return touched
+
+
+def remove_part(root, part_name):
+    """Remove the files of a part from every partition, e.g. before writing it again; returns their partitions."""
+    extensions = tuple(FILE_EXTENSIONS.values())
+    removed = []
+    for directory, _, file_names in os.walk(root):
+        for file_name in file_names:
+            if file_name.startswith(part_name) and file_name[len(part_name):] in extensions:
+                os.remove(os.path.join(directory, file_name))
+                removed.append(os.path.relpath(directory, root))
+    return sorted(removed)
+
+
+def part_name_for(file_path):
+    """Return the part name of the files a cleaned file is laid out as, e.g. 'part-cleaned_20241006_184420'."""
+    return 'part-' + os.path.splitext(os.path.basename(file_path))[0]
+
+
+def partition_file(file_path, root=DEFAULT_PARTITION_ROOT, partition_by=DEFAULT_PARTITION_BY, file_format='parquet',
+                   chunksize=PARTITION_FLUSH_ROWS):
+    """
+    Lay a cleaned file out as a part of the partitioned dataset, replacing an earlier part made from it.
+
+    :return: Relative directories of the partitions that changed.
+    """
+    part_name = part_name_for(file_path)
+    removed = remove_part(root, part_name)
+    with PartitionedWriter(root, partition_by, file_format, part_name) as writer:
+        for chunk in iter_frame_chunks(file_path, chunksize):
+            writer.write(chunk)
+        touched = writer.close()
+    return sorted(set(removed) | set(touched))
+
+
+def _normalize_filters(filters):
+    """Return filters as a list of (column, operator, value) tuples; a dict means equality on each column."""
+    if not filters:
+        return []
+    if isinstance(filters, dict):
+        filters = [(column, '==', value) for column, value in filters.items()]
+    normalized = []
+    for column, op, value in filters:
+        if op not in FILTER_OPERATORS:
+            raise ValueError(f"Unknown filter operator '{op}', expected one of {list(FILTER_OPERATORS)}.")
+        if column in DATETIME_PARTITION_KEYS:
+            # Compared with the partitions' numbers, so '2023' and 2023 mean the same
+            value = [int(v) for v in value] if op == 'in' else int(value)
+        normalized.append((column, op, value))
+    return normalized
+
+
+def _parse_partition_value(key, value):
+    """Return a directory value as the value filters compare with: an int for 'year'/'month', None if missing."""
+    if value == NULL_PARTITION:
+        return None
+    return int(value) if key in DATETIME_PARTITION_KEYS else unquote(value)
+
+
+def _datetime_interval(values):
+    """Return the [start, end) datetimes covered by known 'year' (and 'month') partition values, or None."""
+    year, month = values.get('year'), values.get('month')
+    if year is None:
+        return None
+    if month is None:
+        return pd.Timestamp(year, 1, 1), pd.Timestamp(year + 1, 1, 1)
+    start = pd.Timestamp(year, month, 1)
+    return start, start + pd.DateOffset(months=1)
+
+
+def _may_match(values, filters):
+    """Return False if no row of a partition with these (partly known) key values can pass the filters."""
+    interval = _datetime_interval(values)
+    for column, op, value in filters:
+        if column in values:
+            # Rows with a missing key pass no predicate on it
+            if values[column] is None or not FILTER_OPERATORS[op](values[column], value):
+                return False
+        elif column == 'datetime' and any(key in values and values[key] is None for key in DATETIME_PARTITION_KEYS):
+            # Rows without a datetime pass no predicate on it
+            return False
+        elif column == 'datetime' and interval is not None:
+            start, end = interval
+            bounds = [pd.Timestamp(v) for v in value] if op == 'in' else [pd.Timestamp(value)]
+            if op in ('>', '>=') and end <= bounds[0]:
+                return False
+            if (op == '<' and start >= bounds[0]) or (op == '<=' and start > bounds[0]):
+                return False
+            if op in ('==', 'in') and not any(start <= bound < end for bound in bounds):
+                return False
+    return True
+
+
+def find_partitions(root=DEFAULT_PARTITION_ROOT, filters=None):
+    """
+    Return the partitions that can hold rows passing `filters`, as (key values dict, directory) tuples.
+
+    The directory tree is walked one key at a time and a directory is skipped, with
+    everything below it, as soon as its key values rule the filters out: predicates on a
+    partition key are checked against its value, and 'datetime' predicates against the
+    dates a year or month partition covers.
+    """
+    filters = _normalize_filters(filters)
+    partitions = []
+
+    def walk(directory, values):
+        subdirectories = []
+        has_files = False
+        for entry in sorted(os.scandir(directory), key=lambda entry: entry.name):
+            match = PARTITION_DIR_PATTERN.match(entry.name)
+            if entry.is_dir() and match:
+                subdirectories.append((entry.path, match.group(1), match.group(2)))
+            elif entry.is_file():
+                has_files = True
+        if has_files and values:
+            partitions.append((values, directory))
+        for path, key, raw_value in subdirectories:
+            child = {**values, key: _parse_partition_value(key, raw_value)}
+            if _may_match(child, filters):
+                walk(path, child)
+
+    if os.path.isdir(root):
+        walk(root, {})
+    return partitions
+
+
+def list_partition_files(root=DEFAULT_PARTITION_ROOT, filters=None):
+    """Return the data files of the partitions that can hold rows passing `filters`, as (key values, path) tuples."""
+    extensions = tuple(FILE_EXTENSIONS.values())
+    return [(values, os.path.join(directory, file_name))
+            for values, directory in find_partitions(root, filters)
+            for file_name in sorted(os.listdir(directory)) if file_name.endswith(extensions)]
+
+
+def _row_mask(df, filters):
+    """Return a boolean array, True for the rows passing every filter."""
+    mask = np.ones(len(df), dtype=bool)
+    for column, op, value in filters:
+        if column in DATETIME_PARTITION_KEYS and column not in df.columns:
+            months = _months(df)
+            numbers = months.view(np.int64)
+            col = pd.Series(numbers // 12 + 1970 if column == 'year' else numbers % 12 + 1, index=df.index)
+            col = col.where(~np.isnat(months))
+        else:
+            col = df[column]
+        if column == 'datetime':
+            value = [pd.Timestamp(v) for v in value] if op == 'in' else pd.Timestamp(value)
+        elif isinstance(col.dtype, pd.CategoricalDtype) and op not in ('==', '!=', 'in'):
+            # Unordered categoricals only compare for equality, so ordering compares the text values
+            col = col.astype('string')
+        result = col.isin(value) if op == 'in' else FILTER_OPERATORS[op](col, value)
+        # Missing text values compare as <NA>, and pass no filter
+        mask &= result.fillna(False).to_numpy(dtype=bool)
+    return mask
+
+
+def read_partitioned(root=DEFAULT_PARTITION_ROOT, filters=None, columns=None):
+    """
+    Read the rows of a partitioned dataset that pass `filters`, opening only the partitions that can hold them.
+
+    :param root: Root folder of the dataset.
+    :param filters: Dict of column -> value, or list of (column, operator, value) tuples with the
+                    operators of FILTER_OPERATORS, e.g. [('country', '==', 'Germany'),
+                    ('datetime', '>=', '2023-03-01'), ('datetime', '<', '2023-04-01')].
+                    Columns can be partition keys, including 'year' and 'month', or data columns.
+    :param columns: Optional list of columns to return.
+    :return: DataFrame with the compact order schema, stored partition keys added back as columns.
+    """
+    filters = _normalize_filters(filters)
+    frames = []
+    with stage('partition.read') as record:
+        files = list_partition_files(root, filters)
+        for values, file_path in files:
+            df = read_frame(file_path)
+            for key, value in values.items():
+                if key not in DATETIME_PARTITION_KEYS:
+                    df[key] = value
+            if 'datetime' in df.columns and not pd.api.types.is_datetime64_any_dtype(df['datetime']):
+                df['datetime'] = parse_datetime_column(df['datetime'])[0]
+            if filters:
+                df = df[_row_mask(df, filters)]
+            frames.append(df[columns] if columns else df)
+        df = apply_order_schema(pd.concat(frames, ignore_index=True)) if frames else pd.DataFrame(columns=columns)
+        if not columns:
+            # Keys added back from the paths go to their place in the order schema, not to the end
+            df = df[[column for column in ORDER_COLUMNS if column in df.columns]
+                    + [column for column in df.columns if column not in ORDER_COLUMNS]]
+        record.rows_out = len(df)
+    print(f"Read {len(df)} rows from {len(files)} partition file(s) under '{root}'.")
+    return df
+
+
+def _parse_filter(text):
+    """Parse a 'column<op>value' filter given on the command line, e.g. 'country==Germany' or 'year>=2023'."""
+    match = re.match(r'^(\w+)\s*(==|!=|<=|>=|<|>)\s*(.+)$', text)
+    if not match:
+        raise ValueError(f"Can't parse filter '{text}', expected e.g. 'country==Germany'.")
+    column, op, value = match.groups()
+    return column, op, value
+
+
+def main():
+    """Partition cleaned files into the partitioned dataset, or read from it with filters."""
+    parser = argparse.ArgumentParser(description="Write and read the Hive-style partitioned cleaned dataset.")
+    parser.add_argument('files', nargs='*', help="Cleaned files to add to the dataset.")
+    parser.add_argument('--root', default=DEFAULT_PARTITION_ROOT, help="Root folder of the dataset.")
+    parser.add_argument('--partition-by', default=','.join(DEFAULT_PARTITION_BY),
+                        help=f"Comma-separated partition keys from {PARTITION_KEYS}.")
+    parser.add_argument('--format', default='parquet', choices=list(FILE_EXTENSIONS), help="Format of the part files.")
+    parser.add_argument('--filter', action='append', default=[], metavar='EXPR',
+                        help="Read the rows passing a filter like 'country==Germany' or 'month>=3' (repeatable).")
+    args = parser.parse_args()
+
+    try:
+        partition_by = args.partition_by.split(',')
+        for file_path in args.files:
+            touched = partition_file(file_path, args.root, partition_by, args.format)
+            print(f"'{file_path}' written to {len(touched)} partition(s) under '{args.root}'.")
+        if args.filter or not args.files:
+            df = read_partitioned(args.root, [_parse_filter(text) for text in args.filter])
+            print(df.head().to_string())
+    except Exception as e:
+        print(f"An error occurred with the partitioned dataset: {e}")
+
+# Usage: python -m src.partitioning data/cleaned/cleaned_*.csv [--partition-by year,month,country]
+#        python -m src.partitioning --filter country==Germany --filter year==2023 --filter month==3
+if __name__ == "__main__":
+    main()
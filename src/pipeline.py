@@ -0,0 +1,322 @@
+import argparse
+import contextlib
+import os
+import queue
+import threading
+import time
+from src.catalog import record_artifact
+from src.data_cleaner import (DataCleaner, build_cleaned_file_path, build_quarantine_file_path, cleaning_config_key,
+                              load_cleaning_manifest)
+from src.file_io import ChunkedFrameWriter
+from src.metrics import export_metrics, set_memory_tracing
+from src.partitioning import DEFAULT_PARTITION_BY, DEFAULT_PARTITION_ROOT, PartitionedWriter, part_name_for
+from src.profiler import DataProfile, profile_path_for
+from src.rogue_record_generator import DEFAULT_CHUNK_SIZE, RogueRecordGenerator
+from src.rollups import RollupBatch, update_rollups
+from src.rules import load_rules
+
+# Maximum number of chunks waiting between two stages; bounds memory to a few chunks per queue
+DEFAULT_QUEUE_SIZE = 4
+
+# How long, in seconds, a blocked stage waits before checking whether the pipeline was stopped
+QUEUE_POLL_SECONDS = 0.1
+
+# Marks the end of the chunk stream in a queue
+_END = object()
+
+
+class PipelineStopped(Exception):
+    """Raised in a stage when another stage failed and the pipeline is shutting down."""
+
+
+class _StageQueue:
+    """Bounded queue between two stages; blocking calls give up once the pipeline is stopped."""
+
+    def __init__(self, maxsize, stop_event):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._stop_event = stop_event
+
+    def put(self, item):
+        # Blocks while the queue is full, which is what slows a stage down to the pace of the next one
+        while not self._stop_event.is_set():
+            try:
+                self._queue.put(item, timeout=QUEUE_POLL_SECONDS)
+                return
+            except queue.Full:
+                continue
+        raise PipelineStopped("another pipeline stage failed")
+
+    def get(self):
+        while not self._stop_event.is_set():
+            try:
+                return self._queue.get(timeout=QUEUE_POLL_SECONDS)
+            except queue.Empty:
+                continue
+        raise PipelineStopped("another pipeline stage failed")
+
+
+class ChunkPipeline:
+    """
+    Generates, cleans and writes or uploads order records as a pipeline of chunks.
+
+    Each stage runs in its own thread and passes chunks to the next one over a bounded
+    queue, so cleaning chunk N overlaps generating chunk N+1 and writing or uploading
+    chunk N-1. When a stage falls behind, the queue in front of it fills up and the
+    stages before it block, so at most about `queue_size` chunks per queue are held in
+    memory whatever the number of records. The total time approaches that of the slowest
+    stage instead of the sum of all stages.
+
+    The raw file is written by the generating stage. The cleaned chunks are written to a
+    cleaned file and/or streamed to a bucket by the last stage, so nothing is re-read
+    from disk between the stages. Once the run succeeds, one file is read once more to be
+    hashed: the raw file, whose hash keys the cleaning manifest, the catalog entry and the
+    rollups, or without one the cleaned file, for the rollups.
+    """
+
+    def __init__(self, num_records=10000, rogue_prob=0.1, seed=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                 queue_size=DEFAULT_QUEUE_SIZE, file_format='csv'):
+        """
+        :param num_records: Number of records to generate.
+        :param rogue_prob: Probability that a record is rogue.
+        :param seed: Optional seed for reproducible records.
+        :param chunk_size: Number of rows per chunk.
+        :param queue_size: Maximum number of chunks waiting between two stages.
+        :param file_format: Format of the raw and cleaned files: 'csv' (default), 'parquet' or 'arrow'.
+        """
+        self.generator = RogueRecordGenerator(num_records=num_records, rogue_prob=rogue_prob, seed=seed)
+        self.chunk_size = chunk_size
+        self.queue_size = queue_size
+        self.file_format = file_format
+
+    def run(self, save_raw=True, cleaned_file_path_prefix='data/cleaned/cleaned.csv', uploader=None,
+            bucket_name=None, destination_blob_name=None, compression='gzip', progress_callback=None,
+            partition_root=None, partition_by=DEFAULT_PARTITION_BY):
+        """
+        Runs the pipeline and returns a summary, or None if a stage failed.
+
+        :param save_raw: Write the generated records to a timestamped 'data/raw/rogue_*' file.
+        :param cleaned_file_path_prefix: Path whose directory receives the cleaned file; None to not write one.
+        :param uploader: Optional GCSUploader to stream the cleaned chunks to `bucket_name`/`destination_blob_name`.
+        :param bucket_name: Name of the GCS bucket.
+        :param destination_blob_name: The destination path in the GCS bucket.
+        :param compression: Stream compression of an uploaded CSV: 'gzip' (default), 'zstd' or None.
+        :param progress_callback: Optional callable receiving the number of rows of each finished chunk;
+                                  if it raises, the pipeline stops.
+        :param partition_root: Optional root of a partitioned dataset (see src.partitioning) the cleaned
+                               chunks are also added to; with an uploader, only the partitions this run
+                               touched are then synced to the bucket.
+        :param partition_by: Partition keys of the partitioned dataset.
+        :return: Dict with the output paths, row counts, elapsed time, each stage's busy time and
+                 the cleaned data's DataProfile (also saved next to the cleaned file). The cleaned
+                 file is added to the rollup store (see src.rollups). Rows rejected
+                 by the cleaning rules are written to a 'quarantine_*' file next to the cleaned file.
+                 'partitions' lists the partitions written to under `partition_root`.
+        """
+        if not uploader and not cleaned_file_path_prefix:
+            raise ValueError("The pipeline needs a cleaned file path prefix, an uploader, or both.")
+
+        stop_event = threading.Event()
+        generated = _StageQueue(self.queue_size, stop_event)
+        cleaned = _StageQueue(self.queue_size, stop_event)
+        errors = []
+        busy_seconds = {'generate': 0.0, 'clean': 0.0, 'write': 0.0}
+        summary = {'rows_generated': 0, 'rows_cleaned': 0, 'rows_quarantined': 0, 'datetimes_coerced': 0,
+                   'raw_path': None, 'cleaned_path': None, 'quarantine_path': None, 'blob_name': None,
+                   'partitions': []}
+        # Profiled and rolled up in the cleaning stage, which has the most time to spare
+        profile = DataProfile()
+        rollup = RollupBatch()
+
+        raw_path = self.generator._build_file_path('rogue.csv', self.file_format) if save_raw else None
+        timestamp = os.path.basename(raw_path).split('_', 1)[1].split('.')[0] if raw_path else None
+        cleaned_path = (build_cleaned_file_path(cleaned_file_path_prefix, self.file_format, timestamp)
+                        if cleaned_file_path_prefix else None)
+        quarantine_path = build_quarantine_file_path(cleaned_path) if cleaned_path else None
+        rules = load_rules()
+
+        def run_stage(name, func):
+            try:
+                func()
+            except PipelineStopped:
+                pass
+            except Exception as e:
+                errors.append(f"{name}: {e}")
+                stop_event.set()
+
+        def generate():
+            writer = ChunkedFrameWriter(raw_path) if raw_path else None
+            try:
+                start = time.perf_counter()
+                for chunk in self.generator.iter_chunks(self.chunk_size):
+                    if writer:
+                        writer.write(chunk)
+                    summary['rows_generated'] += len(chunk)
+                    busy_seconds['generate'] += time.perf_counter() - start
+                    generated.put(chunk)
+                    start = time.perf_counter()
+                generated.put(_END)
+            finally:
+                if writer:
+                    writer.close()
+
+        def clean():
+            # Rejected rows are few, so the cleaning stage writes them itself; the file is created on the first one
+            quarantine_writer = ChunkedFrameWriter(quarantine_path) if quarantine_path else None
+            try:
+                while True:
+                    chunk = generated.get()
+                    if chunk is _END:
+                        cleaned.put(_END)
+                        return
+                    start = time.perf_counter()
+                    cleaner = DataCleaner(chunk, rules).apply_cleaning_steps()
+                    cleaned_chunk = cleaner.get_cleaned_data()
+                    summary['datetimes_coerced'] += cleaner.coerced_datetimes
+                    summary['rows_quarantined'] += len(cleaner.quarantine)
+                    if quarantine_writer and not cleaner.quarantine.empty:
+                        quarantine_writer.write(cleaner.quarantine)
+                    profile.update(cleaned_chunk)
+                    rollup.update(cleaned_chunk)
+                    busy_seconds['clean'] += time.perf_counter() - start
+                    cleaned.put(cleaned_chunk)
+            finally:
+                if quarantine_writer:
+                    quarantine_writer.close()
+
+        def iter_cleaned():
+            # Runs in the writing stage; time between chunks is spent writing the previous one
+            while True:
+                chunk = cleaned.get()
+                if chunk is _END:
+                    return
+                start = time.perf_counter()
+                yield chunk
+                summary['rows_cleaned'] += len(chunk)
+                if progress_callback:
+                    progress_callback(len(chunk))
+                busy_seconds['write'] += time.perf_counter() - start
+
+        def write():
+            writer = ChunkedFrameWriter(cleaned_path) if cleaned_path else None
+            # Removes its partition files if the pipeline fails
+            partitions = (PartitionedWriter(partition_root, partition_by, self.file_format,
+                                            part_name_for(cleaned_path) if cleaned_path else None)
+                          if partition_root else contextlib.nullcontext())
+            try:
+                with partitions as partition_writer:
+                    stopped = []
+
+                    def tee():
+                        try:
+                            for chunk in iter_cleaned():
+                                if writer:
+                                    writer.write(chunk)
+                                if partition_writer:
+                                    partition_writer.write(chunk)
+                                yield chunk
+                        except PipelineStopped:
+                            stopped.append(True)
+                            raise
+
+                    if uploader:
+                        if not uploader.upload_frames(bucket_name, tee(), destination_blob_name, self.file_format,
+                                                      compression):
+                            # upload_frames reports every error as a failed upload; a stop caused by
+                            # another stage is raised again, so the error names that stage
+                            if stopped:
+                                raise PipelineStopped("another pipeline stage failed")
+                            raise RuntimeError(f"Streaming to {destination_blob_name} failed.")
+                    else:
+                        for _ in tee():
+                            pass
+                    if partition_writer:
+                        summary['partitions'] = partition_writer.close()
+            finally:
+                if writer:
+                    writer.close()
+
+        print(f"Running the pipeline for {self.generator.num_records} records in chunks of {self.chunk_size}...")
+        start_time = time.perf_counter()
+        threads = [threading.Thread(target=run_stage, args=(name, func), name=f"pipeline-{name}")
+                   for name, func in (('generate', generate), ('clean', clean))]
+        for thread in threads:
+            thread.start()
+        # The last stage runs in the calling thread
+        run_stage('write', write)
+        stop_event.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start_time
+
+        if errors:
+            print(f"An error occurred in the pipeline: {'; '.join(errors)}")
+            # Remove partial outputs, as an interrupted run must not look like a finished one
+            for path in (raw_path, cleaned_path, quarantine_path):
+                if path and os.path.exists(path):
+                    os.remove(path)
+            return None
+
+        raw_hash = None
+        if raw_path and cleaned_path:
+            # Lets later cleaning runs know this raw file is already cleaned; the one read of the raw
+            # file after it was written, its hash is shared with the catalog and the rollups below
+            manifest = load_cleaning_manifest(cleaned_file_path_prefix)
+            raw_hash = manifest.hash_file(raw_path)
+            manifest.record(raw_hash, cleaning_config_key(self.file_format), raw_path, cleaned_path)
+            manifest.save()
+        if raw_path:
+            record_artifact(raw_path, 'raw', rows=summary['rows_generated'], content_hash=raw_hash)
+            summary['raw_path'] = raw_path
+        if cleaned_path:
+            record_artifact(cleaned_path, 'cleaned', rows=summary['rows_cleaned'])
+            profile.save(profile_path_for(cleaned_path))
+            # Keyed by the raw file's content, so cleaning it again later replaces this run's contribution
+            update_rollups(cleaned_path, rollup, raw_hash)
+            summary['cleaned_path'] = cleaned_path
+        if quarantine_path and os.path.exists(quarantine_path):
+            summary['quarantine_path'] = quarantine_path
+        if uploader:
+            summary['blob_name'] = destination_blob_name
+            if summary['partitions'] and not uploader.upload_partitions(bucket_name, partition_root,
+                                                                        summary['partitions']):
+                print("Some partitions could not be synced to the bucket; run upload_partitions again to retry.")
+
+        summary['elapsed_seconds'] = elapsed
+        summary['busy_seconds'] = busy_seconds
+        summary['profile'] = profile
+        print(f"Pipeline completed: {summary['rows_generated']} rows generated, {summary['rows_cleaned']} kept, "
+              f"{summary['rows_quarantined']} quarantined, "
+              f"in {elapsed:.2f}s (busy: " + ", ".join(f"{name} {seconds:.2f}s"
+                                                          for name, seconds in busy_seconds.items()) + ").")
+        return summary
+
+
+def main():
+    """Generate and clean records as an overlapping pipeline, writing 'data/raw' and 'data/cleaned' files."""
+    parser = argparse.ArgumentParser(description="Generate and clean order records as a pipeline of chunks.")
+    parser.add_argument('--records', type=int, default=1_000_000, help="Number of records to generate.")
+    parser.add_argument('--rogue-prob', type=float, default=0.1, help="Probability that a record is rogue.")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per chunk.")
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE, help="Chunks buffered between stages.")
+    parser.add_argument('--format', default='csv', choices=['csv', 'parquet', 'arrow'], help="Output file format.")
+    parser.add_argument('--partitioned', action='store_true',
+                        help=f"Also add the cleaned data to the partitioned dataset in '{DEFAULT_PARTITION_ROOT}'.")
+    parser.add_argument('--metrics', action='store_true',
+                        help="Write per-stage metrics to 'data/metrics' as JSON and a Prometheus textfile.")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="Also measure each stage's peak memory with tracemalloc (slower).")
+    args = parser.parse_args()
+
+    set_memory_tracing(args.trace_memory)
+    pipeline = ChunkPipeline(num_records=args.records, rogue_prob=args.rogue_prob, chunk_size=args.chunk_size,
+                             queue_size=args.queue_size, file_format=args.format)
+    pipeline.run(partition_root=DEFAULT_PARTITION_ROOT if args.partitioned else None)
+
+    if args.metrics:
+        for path in export_metrics():
+            print(f"Metrics saved to '{path}'.")
+
+# Usage: python -m src.pipeline [--records N] [--chunk-size N] [--format csv|parquet|arrow] [--partitioned]
+#                              [--metrics [--trace-memory]]
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,38 @@
+import numpy as np
 import pandas as pd
-import random
 import os
-from datetime import datetime, timedelta
-import secrets
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from src.catalog import record_artifact
+from src.file_io import ChunkedFrameWriter, get_file_extension, merge_files, write_frame
+from src.metrics import stage
+from src.schema import INTEGER_DTYPES, ORDER_COLUMNS
 
-# Helper function for generating random dates
-def random_date(start, end):
-    return start + timedelta(seconds=secrets.randbelow(int((end - start).total_seconds())))
+# Issue types that can be injected into a rogue record
+ROGUE_ISSUE_TYPES = [
+    'missing_customer_name', 'invalid_payment_type',
+    'negative_qty', 'missing_product_id', 'future_order_date'
+]
+
+# Number of rows generated per chunk when streaming records to disk
+DEFAULT_CHUNK_SIZE = 100_000
 
 # Class for generating rogue records
 class RogueRecordGenerator:
-    def __init__(self, num_records=10000, rogue_prob=0.1):
+    def __init__(self, num_records=10000, rogue_prob=0.1, seed=None, first_order_id=1):
+        """
+        Initializes the generator.
+
+        :param num_records: Number of records to generate.
+        :param rogue_prob: Probability of a record being turned into a rogue record.
+        :param seed: Optional seed for NumPy's random Generator, for reproducible output.
+        :param first_order_id: order_id given to the first generated record.
+        """
         self.num_records = num_records
         self.rogue_prob = rogue_prob
+        self.seed = seed
+        self.first_order_id = first_order_id
+        self.rng = np.random.default_rng(seed)
         self.electronics = [
             'Smartphone', 'Laptop', 'Tablet', 'Smartwatch', 'Bluetooth Speaker', 
             'Headphones', 'Gaming Console', 'Camera', 'Drone', 'External Hard Drive', 
@@ -56,109 +76,258 @@ class RogueRecordGenerator:
             'Australia': ['Sydney', 'Melbourne', 'Brisbane']
         }
         self.websites = ['www.amazon.com', 'www.flipkart.com', 'www.ebay.in', 'www.tatacliq.com']
+        self.customer_names = ['John Smith', 'Mary Jane', 'Joe Smith', 'Neo', 'Trinity']
+        self.failure_reasons = ['Invalid CVV', 'Insufficient Funds', 'Timeout']
 
         self.start_date = datetime(2021, 1, 1)
         self.end_date = datetime(2023, 12, 31)
 
-    def _get_product(self, category):
-        """Returns a random product based on category."""
-        if category == 'Electronics':
-            return random.choice(self.electronics)
-        elif category == 'Stationery':
-            return random.choice(self.stationery)
-        elif category == 'Books':
-            return random.choice(self.books)
-        elif category == 'Clothing':
-            return random.choice(self.clothing)
-        elif category == 'Home & Kitchen':
-            return random.choice(self.home_kitchen)
-
-    def _introduce_rogue_records(self, record):
-        """Introduces rogue records with certain issues."""
-        issue_type = random.choice([
-            'missing_customer_name', 'invalid_payment_type',
-            'negative_qty', 'missing_product_id', 'future_order_date'
-        ])
-        
-        if issue_type == 'missing_customer_name':
-            record['customer_name'] = ""
-        elif issue_type == 'invalid_payment_type':
-            record['payment_type'] = "Invalid"
-        elif issue_type == 'negative_qty':
-            record['qty'] = secrets.randbelow(50) * -1
-        elif issue_type == 'future_order_date':
-            record['datetime'] = datetime(2023, 1, 1)
-        return record
+        self._build_lookups()
+
+    def _build_lookups(self):
+        """Builds the array lookups used to draw whole columns at once."""
+        # Category -> product lookup, one row of products per category
+        products_by_category = {
+            'Electronics': self.electronics,
+            'Stationery': self.stationery,
+            'Books': self.books,
+            'Clothing': self.clothing,
+            'Home & Kitchen': self.home_kitchen
+        }
+        product_table = [products_by_category[category] for category in self.product_categories]
+        self._products_per_category = len(product_table[0])
+
+        # Country -> city lookup, one row of cities per country
+        city_table = [self.cities[country] for country in self.countries]
+        self._cities_per_country = len(city_table[0])
+
+        # Categories of each categorical column; rogue values are appended after the valid ones
+        # so rogue injection only has to overwrite codes. Product and city codes are
+        # row * row_length + column in the lookup tables above.
+        self._categories = {
+            'customer_name': self.customer_names + [''],
+            'product_name': [product for products in product_table for product in products],
+            'product_category': self.product_categories,
+            'payment_type': self.payment_types + ['Invalid'],
+            'country': self.countries,
+            'city': [city for cities in city_table for city in cities],
+            'ecommerce_website_name': self.websites,
+            'payment_txn_success': ['Y', 'N'],
+            'failure_reason': self.failure_reasons + ['']
+        }
+
+    def _generate_chunk(self, rng, first_order_id, size):
+        """Draws `size` records column by column and returns them as a DataFrame."""
+        # Product columns: pick a category, then a product within that category
+        category_codes = rng.integers(0, len(self.product_categories), size=size, dtype=np.int8)
+        product_codes = (category_codes * self._products_per_category
+                         + rng.integers(0, self._products_per_category, size=size, dtype=np.int8))
+
+        # Location columns: pick a country, then a city within that country
+        country_codes = rng.integers(0, len(self.countries), size=size, dtype=np.int8)
+        city_codes = (country_codes * self._cities_per_country
+                      + rng.integers(0, self._cities_per_country, size=size, dtype=np.int8))
+
+        # Order dates are whole seconds between start_date and end_date
+        total_seconds = int((self.end_date - self.start_date).total_seconds())
+        offsets = rng.integers(0, total_seconds, size=size).astype('timedelta64[s]')
+        order_datetime = (np.datetime64(self.start_date, 's') + offsets).astype('datetime64[ns]')
+
+        # Failed payments (code 1, 'N') get a failure reason, successful ones an empty string
+        payment_success_codes = rng.integers(0, 2, size=size, dtype=np.int8)
+        failure_reason_codes = rng.integers(0, len(self.failure_reasons), size=size, dtype=np.int8)
+        failure_reason_codes[payment_success_codes == 0] = len(self.failure_reasons)
+
+        # Categorical columns hold codes into self._categories until the DataFrame is built
+        columns = {
+            'order_id': np.arange(first_order_id, first_order_id + size, dtype=INTEGER_DTYPES['order_id']),
+            'customer_id': rng.integers(100, 201, size=size, dtype=INTEGER_DTYPES['customer_id']),
+            'customer_name': rng.integers(0, len(self.customer_names), size=size, dtype=np.int8),
+            'product_id': rng.integers(200, 301, size=size, dtype=INTEGER_DTYPES['product_id']),
+            'product_name': product_codes,
+            'product_category': category_codes,
+            'payment_type': rng.integers(0, len(self.payment_types), size=size, dtype=np.int8),
+            'qty': rng.integers(1, 51, size=size, dtype=INTEGER_DTYPES['qty']),
+            'price': rng.integers(5, 10001, size=size, dtype=INTEGER_DTYPES['price']),
+            'datetime': order_datetime,
+            'country': country_codes,
+            'city': city_codes,
+            'ecommerce_website_name': rng.integers(0, len(self.websites), size=size, dtype=np.int8),
+            'payment_txn_id': rng.integers(10000, 100000, size=size, dtype=INTEGER_DTYPES['payment_txn_id']),
+            'payment_txn_success': payment_success_codes,
+            'failure_reason': failure_reason_codes
+        }
+
+        # Introduce rogue records based on the probability
+        self._introduce_rogue_records(rng, columns, size)
+
+        for column, categories in self._categories.items():
+            columns[column] = pd.Categorical.from_codes(columns[column], categories=categories)
+
+        return pd.DataFrame(columns, columns=ORDER_COLUMNS)
+
+    def _introduce_rogue_records(self, rng, columns, size):
+        """Introduces rogue records with certain issues, in place on the column arrays."""
+        rogue_rows = np.flatnonzero(rng.random(size) < self.rogue_prob)
+        issue_types = rng.integers(0, len(ROGUE_ISSUE_TYPES), size=len(rogue_rows))
+
+        for issue_code, issue_type in enumerate(ROGUE_ISSUE_TYPES):
+            rows = rogue_rows[issue_types == issue_code]
+            if len(rows) == 0:
+                continue
+
+            if issue_type == 'missing_customer_name':
+                columns['customer_name'][rows] = self._categories['customer_name'].index("")
+            elif issue_type == 'invalid_payment_type':
+                columns['payment_type'][rows] = self._categories['payment_type'].index("Invalid")
+            elif issue_type == 'negative_qty':
+                columns['qty'][rows] = rng.integers(0, 50, size=len(rows)) * -1
+            elif issue_type == 'future_order_date':
+                columns['datetime'][rows] = np.datetime64(datetime(2023, 1, 1), 'ns')
+            # 'missing_product_id' is drawn like the other issues but, as before, leaves the row untouched
 
     def generate_records(self):
         """Generates the records, including rogue ones based on the rogue probability."""
-        records = []
-
-        for i in range(self.num_records):
-            order_id = i + 1
-            customer_id = secrets.randbelow(101) + 100
-            customer_name = random.choice(['John Smith', 'Mary Jane', 'Joe Smith', 'Neo', 'Trinity'])
-
-            product_category = random.choice(self.product_categories)
-            product_name = self._get_product(product_category)
-            product_id = secrets.randbelow(101) + 200
-
-            payment_type = random.choice(self.payment_types)
-            qty = secrets.randbelow(50) + 1
-            price = secrets.randbelow(9996) + 5
-            order_datetime = random_date(self.start_date, self.end_date)
-
-            country = random.choice(self.countries)
-            city = random.choice(self.cities[country])
-            website = random.choice(self.websites)
-
-            payment_txn_id = secrets.randbelow(90000) + 10000
-            payment_success = random.choice(['Y', 'N'])
-            failure_reason = ''
-            if payment_success == 'N':
-                failure_reason = random.choice(['Invalid CVV', 'Insufficient Funds', 'Timeout'])
-
-            # Create the initial record
-            record = {
-                'order_id': order_id, 'customer_id': customer_id, 'customer_name': customer_name, 
-                'product_id': product_id, 'product_name': product_name, 'product_category': product_category,
-                'payment_type': payment_type, 'qty': qty, 'price': price, 'datetime': order_datetime,
-                'country': country, 'city': city, 'ecommerce_website_name': website, 'payment_txn_id': payment_txn_id,
-                'payment_txn_success': payment_success, 'failure_reason': failure_reason
-            }
-
-            # Introduce rogue record based on the probability
-            if random.random() < self.rogue_prob:
-                record = self._introduce_rogue_records(record)
-
-            records.append(record)
-
-        return pd.DataFrame(records)
-
-    def save_to_csv(self, df, filename='rogue.csv'):
-        """Saves the DataFrame to a CSV file in the 'data/raw' folder with a unique timestamp."""
+        with stage('generate', rows_out=self.num_records):
+            return self._generate_chunk(self.rng, self.first_order_id, self.num_records)
+
+    def iter_chunks(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Yields the records as DataFrame chunks of at most `chunk_size` rows, in order_id order."""
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be a positive integer.")
+
+        for offset in range(0, self.num_records, chunk_size):
+            size = min(chunk_size, self.num_records - offset)
+            with stage('generate', rows_out=size):
+                chunk = self._generate_chunk(self.rng, self.first_order_id + offset, size)
+            yield chunk
+
+    def _build_file_path(self, filename, file_format='csv'):
+        """Returns a unique, timestamped path for `filename` in the 'data/raw' folder."""
+        # Define the folder path
+        folder_path = os.path.join('data', 'raw')
+
+        # Ensure the folder exists
+        os.makedirs(folder_path, exist_ok=True)
+
+        # Append timestamp to filename to ensure it's unique
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        new_filename = f"{filename.split('.')[0]}_{timestamp}{get_file_extension(file_format)}"
+
+        return os.path.join(folder_path, new_filename)
+
+    def save_to_csv(self, df, filename='rogue.csv', file_format='csv'):
+        """
+        Saves the DataFrame to a file in the 'data/raw' folder with a unique timestamp.
+
+        :param file_format: 'csv' (default), or 'parquet' / 'arrow' for a compressed columnar file.
+        """
+        try:
+            # Save the file in the specified folder
+            file_path = self._build_file_path(filename, file_format)
+
+            write_frame(df, file_path)
+            record_artifact(file_path, 'raw', rows=len(df))
+
+            print(f"File saved successfully as {file_path}")
+            return file_path
+        except Exception as e:
+            print(f"An error occurred while saving the file: {e}")
+
+    def save_to_csv_stream(self, filename='rogue.csv', chunk_size=DEFAULT_CHUNK_SIZE, file_format='csv',
+                           progress_callback=None):
+        """
+        Generates the records chunk by chunk and appends each chunk to a file in the
+        'data/raw' folder, so only one chunk is held in memory at a time.
+
+        :param filename: Base file name; a timestamp is appended as in save_to_csv.
+        :param chunk_size: Number of rows generated and written per chunk.
+        :param file_format: 'csv' (default), 'parquet' or 'arrow'.
+        :param progress_callback: Optional callable receiving the number of rows of each written
+                                  chunk; if it raises, generation stops and the file is removed.
+        :return: Path of the written file, or None if saving failed.
+        """
         try:
-            # Define the folder path
-            folder_path = os.path.join('data', 'raw')
+            file_path = self._build_file_path(filename, file_format)
+            self._write_chunks(file_path, chunk_size, progress_callback)
+            record_artifact(file_path, 'raw', rows=self.num_records)
 
-            # Ensure the folder exists
-            os.makedirs(folder_path, exist_ok=True)
+            print(f"File saved successfully as {file_path}")
+            return file_path
+        except Exception as e:
+            print(f"An error occurred while saving the file: {e}")
+
+    def _write_chunks(self, file_path, chunk_size, progress_callback=None):
+        """Streams all records into `file_path`, one chunk at a time."""
+        with ChunkedFrameWriter(file_path) as writer:
+            for chunk in self.iter_chunks(chunk_size):
+                writer.write(chunk)
+                if progress_callback:
+                    progress_callback(len(chunk))
+
+    def save_to_csv_parallel(self, filename='rogue.csv', num_shards=None, max_workers=None,
+                             merge=True, chunk_size=DEFAULT_CHUNK_SIZE, file_format='csv'):
+        """
+        Generates the records in shards across a process pool and saves them to the 'data/raw' folder.
+
+        Each shard gets a sub-seed spawned from this generator's seed and a disjoint order_id
+        range, so the output is reproducible for a given seed and shard count and order_ids
+        never collide.
 
-            # Append timestamp to filename to ensure it's unique
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            new_filename = f"{filename.split('.')[0]}_{timestamp}.csv"
+        :param filename: Base file name; a timestamp is appended as in save_to_csv.
+        :param num_shards: Number of shards to split num_records into (defaults to max_workers).
+        :param max_workers: Number of worker processes (defaults to the number of CPUs).
+        :param merge: If True, merge the shards into a single rogue_* file and remove them.
+        :param chunk_size: Number of rows generated and written per chunk inside each shard.
+        :param file_format: 'csv' (default), 'parquet' or 'arrow'.
+        :return: Path of the merged file, or the list of shard file paths if merge is False.
+        """
+        try:
+            max_workers = max_workers or os.cpu_count() or 1
+            num_shards = max(1, min(num_shards or max_workers, self.num_records))
+
+            extension = get_file_extension(file_format)
+            file_path = self._build_file_path(filename, file_format)
+            base_path = file_path[:-len(extension)]
+
+            # Split num_records as evenly as possible and give every shard its own order_id range
+            shard_sizes = [self.num_records // num_shards + (1 if i < self.num_records % num_shards else 0)
+                           for i in range(num_shards)]
+            shard_seeds = np.random.SeedSequence(self.seed).spawn(num_shards)
 
-            # Save the CSV file in the specified folder
-            file_path = os.path.join(folder_path, new_filename)
+            shard_args = []
+            first_order_id = self.first_order_id
+            for shard_number, (shard_size, shard_seed) in enumerate(zip(shard_sizes, shard_seeds)):
+                shard_path = f"{base_path}_part{shard_number:05d}{extension}"
+                shard_args.append((shard_size, self.rogue_prob, shard_seed, first_order_id,
+                                   shard_path, chunk_size))
+                first_order_id += shard_size
 
-            df.to_csv(file_path, index=False)
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                shard_paths = list(executor.map(_generate_shard, shard_args))
 
+            if not merge:
+                print(f"{len(shard_paths)} shard files saved as {base_path}_part*{extension}")
+                return shard_paths
+
+            merge_files(shard_paths, file_path)
+            record_artifact(file_path, 'raw', rows=self.num_records)
             print(f"File saved successfully as {file_path}")
+            return file_path
         except Exception as e:
             print(f"An error occurred while saving the file: {e}")
 
 
-# Usage
+def _generate_shard(shard_args):
+    """Generates one shard of records in a worker process and writes it to its shard file."""
+    num_records, rogue_prob, seed, first_order_id, shard_path, chunk_size = shard_args
+    generator = RogueRecordGenerator(num_records=num_records, rogue_prob=rogue_prob,
+                                     seed=seed, first_order_id=first_order_id)
+    generator._write_chunks(shard_path, chunk_size)
+    return shard_path
+
+
+# Usage: python -m src.rogue_record_generator
 if __name__ == "__main__":
     # Input the number of records and rogue record probability from the user
     num_records = int(input("Enter the number of records to generate: "))
@@ -167,6 +336,5 @@ if __name__ == "__main__":
     # Create generator instance
     generator = RogueRecordGenerator(num_records=num_records, rogue_prob=rogue_prob)
 
-    # Generate records and save to CSV
-    df_with_rogue_records = generator.generate_records()
-    generator.save_to_csv(df_with_rogue_records, 'rogue.csv')
+    # Generate records and stream them to CSV chunk by chunk
+    generator.save_to_csv_stream('rogue.csv')
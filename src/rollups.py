@@ -0,0 +1,411 @@
+import argparse
+import contextlib
+import os
+import sqlite3
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from src.cache import list_files
+from src.catalog import ARTIFACT_PATTERNS
+from src.file_io import iter_frame_chunks
+from src.manifest import CleaningManifest, hash_file
+from src.metrics import stage
+from src.profiler import PROFILE_CHUNK_SIZE, _parse_datetime_columns
+
+# SQLite database holding the rollups
+DEFAULT_ROLLUP_DB_PATH = os.path.join('data', 'rollups', 'rollups.sqlite')
+
+# Layout of the rollup tables; a database of another version is rebuilt empty, as its totals can't be trusted
+ROLLUP_SCHEMA_VERSION = 2
+
+# Key stored for a missing dimension value, as NULL keys never match in SQLite upserts
+UNKNOWN = 'unknown'
+
+# Rollups kept in the store: the dimensions they are grouped by, finest first, and their additive measures
+ROLLUPS = {
+    'revenue': {'dimensions': ['month', 'product_category', 'country', 'ecommerce_website_name'],
+                'measures': ['orders', 'units', 'revenue']},
+    'payments': {'dimensions': ['month', 'payment_type', 'failure_reason'],
+                 'measures': ['attempts', 'failures']}
+}
+
+# Value of 'payment_txn_success' for a failed payment
+FAILED_PAYMENT = 'N'
+
+
+def _aggregate(df):
+    """Return each rollup of one order DataFrame, keyed by rollup name, with text keys and one row per group."""
+    datetimes = df['datetime']
+    if not pd.api.types.is_datetime64_any_dtype(datetimes):
+        datetimes = _parse_datetime_columns(df[['datetime']].copy())['datetime']
+    # Month number as a plain integer (NaT is the smallest int64); only the few group keys become text
+    month = pd.Series(datetimes.to_numpy().astype('datetime64[M]').view(np.int64))
+
+    qty = pd.to_numeric(df['qty'], errors='coerce').to_numpy(dtype=np.float64)
+    price = pd.to_numeric(df['price'], errors='coerce').to_numpy(dtype=np.float64)
+    measures = {
+        'revenue': {'orders': None, 'units': np.nan_to_num(qty), 'revenue': np.nan_to_num(qty * price)},
+        'payments': {'attempts': None,
+                     'failures': (df['payment_txn_success'] == FAILED_PAYMENT).to_numpy(dtype=np.float64)}
+    }
+
+    rollups = {}
+    for name, spec in ROLLUPS.items():
+        # One integer per row for its combination of dimension values, built from each dimension's
+        # codes in mixed radix, so grouping is a factorize and a bincount per measure
+        columns = [_group_codes(month if dimension == 'month' else df[dimension]) for dimension in spec['dimensions']]
+        shape = tuple(len(levels) for _, levels in columns)
+        key = np.ravel_multi_index([codes for codes, _ in columns], shape)
+        groups, keys = pd.factorize(key)
+
+        frame = pd.DataFrame({dimension: levels[codes] for dimension, (_, levels), codes
+                              in zip(spec['dimensions'], columns, np.unravel_index(keys, shape))})
+        for measure, values in measures[name].items():
+            # None counts the rows of each group
+            sums = np.bincount(groups, weights=values, minlength=len(keys))
+            frame[measure] = sums if measure == 'revenue' else sums.astype(np.int64)
+        rollups[name] = _format_keys(frame, spec['dimensions'])
+    return rollups
+
+
+def _group_codes(col):
+    """Return a column's integer codes and the value of each code, with missing values as a code of their own."""
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        levels = np.append(col.cat.categories.to_numpy(dtype=object), None)
+        codes = col.cat.codes.to_numpy().astype(np.int64)
+        codes[codes < 0] = len(levels) - 1
+        return codes, levels
+    codes, levels = pd.factorize(col, use_na_sentinel=False)
+    return codes, np.asarray(levels, dtype=object)
+
+
+def _format_keys(frame, dimensions):
+    """Turn the group keys into text: months as 'YYYY-MM', missing values as UNKNOWN."""
+    for dimension in dimensions:
+        if dimension == 'month':
+            months = frame[dimension].to_numpy(dtype=np.int64).view('datetime64[M]')
+            keys = np.datetime_as_string(months, unit='M').astype(object)
+            keys[np.isnat(months)] = UNKNOWN
+            frame[dimension] = keys
+        else:
+            frame[dimension] = frame[dimension].where(frame[dimension].notna(), UNKNOWN).astype(str)
+    return frame
+
+
+class RollupBatch:
+    """
+    Rollups of a stream of order chunks, e.g. the chunks of one cleaned file, ready to be
+    added to a RollupStore.
+
+    Each chunk is aggregated as it goes by and merged into the running aggregates, which
+    have one row per group, so memory depends on the number of groups, not on the rows.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.frames = {name: None for name in ROLLUPS}
+
+    def update(self, df):
+        """Add the rows of an order DataFrame."""
+        with stage('rollup', rows_in=len(df)):
+            self._add(_aggregate(df))
+            self.rows += len(df)
+        return self
+
+    def merge(self, other):
+        """Add the rows of another RollupBatch."""
+        self._add({name: frame for name, frame in other.frames.items() if frame is not None})
+        self.rows += other.rows
+        return self
+
+    def _add(self, rollups):
+        for name, frame in rollups.items():
+            if self.frames[name] is not None:
+                frame = pd.concat([self.frames[name], frame], ignore_index=True)\
+                          .groupby(ROLLUPS[name]['dimensions'], sort=False).sum().reset_index()
+            self.frames[name] = frame
+
+
+class RollupStore:
+    """
+    Incrementally maintained aggregates of the cleaned orders in a SQLite database.
+
+    Each rollup table holds additive measures (orders, units and revenue = qty * price by
+    month, product category, country and website; payment attempts and failures by month,
+    payment type and failure reason), so adding a cleaned file only upserts its groups into
+    the totals, and queries read the small rollup tables instead of rescanning every
+    cleaned file; their latency depends on the number of groups, not on the history.
+
+    Each contribution's own groups are kept as well, keyed by its source: the content hash
+    of the raw file the cleaned file came from, as recorded in the cleaning manifest, or
+    else the cleaned file's own content hash. Ingesting a source again, e.g. a raw file
+    cleaned again with new rules or into another format, takes its earlier groups back out
+    of the totals before its new ones go in, so a source is never counted twice, however
+    many cleaned files it has.
+    """
+
+    def __init__(self, db_path=DEFAULT_ROLLUP_DB_PATH):
+        """
+        Opens the rollup database, creating it and its tables if needed.
+
+        :param db_path: Path of the SQLite database file.
+        """
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("PRAGMA user_version").fetchone()[0] != ROLLUP_SCHEMA_VERSION:
+                # Earlier versions keyed contributions by cleaned file, counting a raw file once per output
+                tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+                for table in tables:
+                    conn.execute(f"DROP TABLE {table}")
+                if tables:
+                    print(f"Rollups in '{db_path}' were rebuilt empty; run RollupStore.sync to add the cleaned files.")
+                conn.execute(f"PRAGMA user_version = {ROLLUP_SCHEMA_VERSION}")
+            conn.execute("CREATE TABLE IF NOT EXISTS sources (source_hash TEXT PRIMARY KEY, file_path TEXT, "
+                         "size INTEGER, mtime_ns INTEGER, rows INTEGER, ingested_at TEXT)")
+            for name, spec in ROLLUPS.items():
+                dimensions = ", ".join(f"{dimension} TEXT NOT NULL" for dimension in spec['dimensions'])
+                measures = ", ".join(f"{measure} NUMERIC NOT NULL" for measure in spec['measures'])
+                keys = ", ".join(spec['dimensions'])
+                conn.execute(f"CREATE TABLE IF NOT EXISTS {name} ({dimensions}, {measures}, PRIMARY KEY ({keys}))")
+                conn.execute(f"CREATE TABLE IF NOT EXISTS {name}_by_source (source_hash TEXT NOT NULL, "
+                             f"{dimensions}, {measures}, PRIMARY KEY (source_hash, {keys}))")
+
+    @contextlib.contextmanager
+    def _connection(self):
+        """Yield a connection inside one transaction, committed if the block succeeds and rolled back otherwise."""
+        # Cleaning workers in other processes may be ingesting at the same time; they wait for each other's lock
+        conn = sqlite3.connect(self.db_path, timeout=60)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _file_key(file_path):
+        return os.path.abspath(file_path)
+
+    def counted_sources(self):
+        """Return the cleaned file counted for each ingested source, with its size and modification time."""
+        with self._connection() as conn:
+            return {source_hash: (file_path, size, mtime_ns) for source_hash, file_path, size, mtime_ns
+                    in conn.execute("SELECT source_hash, file_path, size, mtime_ns FROM sources")}
+
+    def is_current(self, file_path):
+        """Return True if the file is the one counted for its source and has not changed since."""
+        stat = os.stat(file_path)
+        counted = (self._file_key(file_path), stat.st_size, stat.st_mtime_ns)
+        return counted in self.counted_sources().values()
+
+    def ingest(self, file_path, batch, source_hash=None):
+        """
+        Add the rollups of a file's rows to the totals, replacing what its source, or an earlier
+        version of the file, added before.
+
+        :param file_path: Path of the cleaned file the rows were read from or written to.
+        :param batch: RollupBatch of the file's rows.
+        :param source_hash: Content hash of the raw file the rows were cleaned from; defaults to
+                            the content hash of `file_path` itself.
+        """
+        file_key = self._file_key(file_path)
+        stat = os.stat(file_path)
+        source_hash = source_hash or hash_file(file_path)
+        # Not a sub-stage of 'rollup', which aggregates chunks; ingesting runs once per file, after them
+        with stage('rollup_ingest', rows_in=batch.rows), self._connection() as conn:
+            # Take the write lock up front, so two ingests of the same source can't interleave
+            conn.execute("BEGIN IMMEDIATE")
+            # The source's earlier contribution, and whatever this file added under another source before
+            replaced = [row[0] for row in conn.execute("SELECT source_hash FROM sources "
+                                                       "WHERE source_hash = ? OR file_path = ?",
+                                                       (source_hash, file_key))]
+            for name, spec in ROLLUPS.items():
+                columns = spec['dimensions'] + spec['measures']
+                for old_source in replaced:
+                    old_rows = conn.execute(f"SELECT {', '.join(columns)} FROM {name}_by_source "
+                                            f"WHERE source_hash = ?", (old_source,)).fetchall()
+                    if old_rows:
+                        keys = len(spec['dimensions'])
+                        self._upsert(conn, name, spec, [row[:keys] + tuple(-value for value in row[keys:])
+                                                        for row in old_rows])
+                        conn.execute(f"DELETE FROM {name}_by_source WHERE source_hash = ?", (old_source,))
+                if replaced:
+                    # Groups only the replaced sources contributed to are empty now
+                    conn.execute(f"DELETE FROM {name} WHERE {spec['measures'][0]} = 0")
+
+                frame = batch.frames[name]
+                if frame is None or frame.empty:
+                    continue
+                rows = [tuple(row) for row in frame[columns].to_dict('split')['data']]
+                self._upsert(conn, name, spec, rows)
+                conn.executemany(f"INSERT INTO {name}_by_source (source_hash, {', '.join(columns)}) "
+                                 f"VALUES (?, {', '.join('?' for _ in columns)})",
+                                 [(source_hash,) + row for row in rows])
+
+            conn.executemany("DELETE FROM sources WHERE source_hash = ?", [(old_source,) for old_source in replaced])
+            conn.execute("INSERT INTO sources (source_hash, file_path, size, mtime_ns, rows, ingested_at) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", (source_hash, file_key, stat.st_size, stat.st_mtime_ns,
+                                                       batch.rows, datetime.now().isoformat(timespec='seconds')))
+
+    @staticmethod
+    def _upsert(conn, name, spec, rows):
+        """Add `rows` of (dimensions..., measures...) to the totals of rollup `name`."""
+        columns = spec['dimensions'] + spec['measures']
+        updates = ", ".join(f"{measure} = {measure} + excluded.{measure}" for measure in spec['measures'])
+        conn.executemany(f"INSERT INTO {name} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)}) "
+                         f"ON CONFLICT ({', '.join(spec['dimensions'])}) DO UPDATE SET {updates}", rows)
+
+    def ingest_file(self, file_path, chunksize=PROFILE_CHUNK_SIZE, source_hash=None):
+        """Ingest a cleaned file chunk by chunk unless it is unchanged since last time; returns True if ingested."""
+        if self.is_current(file_path):
+            return False
+        batch = RollupBatch()
+        for chunk in iter_frame_chunks(file_path, chunksize):
+            batch.update(chunk)
+        self.ingest(file_path, batch, source_hash)
+        return True
+
+    def sync(self, folder_path='data/cleaned', chunksize=PROFILE_CHUNK_SIZE):
+        """
+        Ingest the cleaned files in `folder_path` whose source is not counted yet; returns the paths ingested.
+
+        Sources are looked up in the folder's cleaning manifest. Of several cleaned files with
+        the same source, only the newest is ingested, and none while the one already counted
+        for that source is still on disk; a counted file that changed is ingested again.
+        """
+        source_hashes = CleaningManifest(os.path.join(folder_path, 'manifest.json')).source_hashes()
+        counted = self.counted_sources()
+        current = set(counted.values())
+        ingested = []
+        # Newest first, as the timestamp is in the name, so the latest cleaning of a source wins
+        for file_name in reversed(list_files(folder_path, ARTIFACT_PATTERNS['cleaned'])):
+            file_path = os.path.join(folder_path, file_name)
+            stat = os.stat(file_path)
+            file_key = self._file_key(file_path)
+            if (file_key, stat.st_size, stat.st_mtime_ns) in current:
+                continue
+            # Cleaned files copied in by hand have no manifest entry, so identical copies share a source
+            source_hash = source_hashes.get(file_key) or hash_file(file_path)
+            counted_path = counted.get(source_hash, (None,))[0]
+            if counted_path and counted_path != file_key and os.path.exists(counted_path):
+                continue
+            if self.ingest_file(file_path, chunksize, source_hash):
+                ingested.append(file_path)
+                counted[source_hash] = (file_key, stat.st_size, stat.st_mtime_ns)
+        return ingested
+
+    def ingested_files(self):
+        """Return the cleaned file counted for each source, with its size, modification time, rows and ingest time."""
+        with self._connection() as conn:
+            return pd.read_sql_query("SELECT * FROM sources ORDER BY file_path", conn)
+
+    def query(self, rollup, by=(), start_month=None, end_month=None, filters=None):
+        """
+        Return the measures of a rollup summed by the dimensions in `by`.
+
+        :param rollup: Name of the rollup, a key of ROLLUPS.
+        :param by: Dimensions to group by; none gives the grand totals.
+        :param start_month: Optional first month to include, as 'YYYY-MM'.
+        :param end_month: Optional last month to include, as 'YYYY-MM'.
+        :param filters: Optional dict of dimension -> value to restrict the rows to.
+        """
+        spec = ROLLUPS[rollup]
+        filters = dict(filters or {})
+        # Names are put into the SQL text, so only known dimensions are accepted
+        unknown = [dimension for dimension in list(by) + list(filters) if dimension not in spec['dimensions']]
+        if unknown:
+            raise ValueError(f"Unknown dimension(s) for rollup '{rollup}': {unknown}.")
+
+        conditions, params = [], []
+        if start_month:
+            conditions.append("month >= ?")
+            params.append(start_month)
+        if end_month:
+            conditions.append("month <= ?")
+            params.append(end_month)
+        for dimension, value in filters.items():
+            conditions.append(f"{dimension} = ?")
+            params.append(value)
+
+        selected = list(by) + [f"SUM({measure}) AS {measure}" for measure in spec['measures']]
+        sql = f"SELECT {', '.join(selected)} FROM {rollup}"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        if by:
+            sql += f" GROUP BY {', '.join(by)} ORDER BY {', '.join(by)}"
+        with self._connection() as conn:
+            return pd.read_sql_query(sql, conn, params=params)
+
+    def revenue(self, by=('product_category',), start_month=None, end_month=None, filters=None):
+        """Return orders, units and revenue (qty * price) by the dimensions in `by`."""
+        return self.query('revenue', by, start_month, end_month, filters)
+
+    def failure_rates(self, by=('payment_type',), start_month=None, end_month=None, filters=None):
+        """
+        Return payment attempts, failures and the failure rate by the dimensions in `by`.
+
+        Grouped by 'failure_reason', each reason's rate is its share of all attempts of the
+        other dimensions' group, e.g. the share of UPI payments failing with a timeout.
+        """
+        by = list(by)
+        if 'failure_reason' not in by:
+            rates = self.query('payments', by, start_month, end_month, filters)
+            rates['failure_rate'] = (rates['failures'] / rates['attempts']).fillna(0.0)
+            return rates
+
+        others = [dimension for dimension in by if dimension != 'failure_reason']
+        rates = self.query('payments', by, start_month, end_month, filters)
+        rates = rates[rates['failures'] > 0].drop(columns='attempts')
+        totals = self.query('payments', others, start_month, end_month, filters)[others + ['attempts']]
+        rates = rates.merge(totals, on=others) if others else rates.assign(attempts=totals['attempts'].iloc[0])
+        rates['failure_rate'] = rates['failures'] / rates['attempts']
+        return rates[by + ['attempts', 'failures', 'failure_rate']].reset_index(drop=True)
+
+
+def update_rollups(file_path, batch, source_hash=None, db_path=DEFAULT_ROLLUP_DB_PATH):
+    """
+    Ingest a cleaned file's RollupBatch into the rollup store, replacing its source's earlier
+    contribution; errors are reported, not raised.
+
+    :param source_hash: Content hash of the raw file `file_path` was cleaned from; defaults to
+                        the content hash of `file_path` itself.
+    """
+    try:
+        RollupStore(db_path).ingest(file_path, batch, source_hash)
+        return True
+    except Exception as e:
+        print(f"An error occurred while updating the rollups for '{file_path}': {e}")
+        return False
+
+
+def main():
+    """Bring the rollups up to date with 'data/cleaned' and print revenue and payment failure rates."""
+    parser = argparse.ArgumentParser(description="Update and query the rollups of the cleaned order files.")
+    parser.add_argument('--db', default=DEFAULT_ROLLUP_DB_PATH, help="SQLite rollup database (default: %(default)s).")
+    parser.add_argument('--folder', default='data/cleaned', help="Folder of the cleaned files to ingest.")
+    parser.add_argument('--by', default='product_category',
+                        help=f"Comma-separated revenue dimensions, from {ROLLUPS['revenue']['dimensions']}.")
+    parser.add_argument('--start-month', help="First month to include, as YYYY-MM.")
+    parser.add_argument('--end-month', help="Last month to include, as YYYY-MM.")
+    args = parser.parse_args()
+
+    try:
+        store = RollupStore(args.db)
+        ingested = store.sync(args.folder)
+        print(f"{len(ingested)} new or changed cleaned file(s) ingested into '{args.db}'.")
+
+        by = [dimension for dimension in args.by.split(',') if dimension]
+        print("\nRevenue:")
+        print(store.revenue(by, args.start_month, args.end_month).to_string(index=False))
+        print("\nPayment failure rates:")
+        print(store.failure_rates(['payment_type'], args.start_month, args.end_month).to_string(index=False))
+    except Exception as e:
+        print(f"An error occurred while updating the rollups: {e}")
+
+# Usage: python -m src.rollups [--by country,month] [--start-month 2023-01 --end-month 2023-03]
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+import argparse
+import functools
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+from src.datetime_parser import parse_datetime_column
+
+# Rules DataCleaner applies unless it is given others; found from the repository root, whatever the working directory
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  'config', 'cleaning_rules.json')
+
+# Column added to quarantined rows, holding the bits of the drop rules they failed
+REASON_COLUMN = 'reject_reasons'
+
+# Highest reason bit, so a reason bitmask fits in a uint32
+MAX_REASON_BIT = 31
+
+# Checks a rule can make, with the actions it can take on the values failing them
+CHECK_ACTIONS = {
+    'not_null': ('drop', 'fill'),
+    'allowed': ('drop', 'fill'),
+    'range': ('drop', 'fill', 'clamp'),
+    'date_range': ('drop', 'fill', 'clamp')
+}
+
+
+class Rule:
+    """
+    A declarative cleaning rule: a check on one column and the action taken on the values failing it.
+
+    Checks:
+      - 'not_null': the value is not missing (null or, in text columns, an empty string).
+      - 'allowed': the value is one of `values`.
+      - 'range': the value, read as a number, lies within `min` and/or `max`.
+      - 'date_range': the value, read as a datetime, lies within `min` and/or `max`; a bound
+        is a date string or 'now'.
+    Missing values pass every check but 'not_null', so each defect is flagged by one rule.
+
+    Actions:
+      - 'drop': the row is removed from the cleaned data and quarantined with bit `bit` set
+        in its reason bitmask.
+      - 'fill': the failing value is replaced with `value`.
+      - 'clamp': the failing value is moved to the nearest bound ('range' and 'date_range').
+
+    `passes` and `fix` work on a whole column at once, so a rule costs one vectorized
+    expression over its column, never a loop over the rows.
+    """
+
+    def __init__(self, name, column, check, action, values=None, minimum=None, maximum=None, value=None, bit=None):
+        if check not in CHECK_ACTIONS:
+            raise ValueError(f"Rule '{name}': unknown check '{check}', expected one of {list(CHECK_ACTIONS)}.")
+        if action not in CHECK_ACTIONS[check]:
+            raise ValueError(f"Rule '{name}': action '{action}' can't be used with check '{check}'.")
+        if check == 'allowed' and not values:
+            raise ValueError(f"Rule '{name}': an 'allowed' check needs a list of 'values'.")
+        if check in ('range', 'date_range') and minimum is None and maximum is None:
+            raise ValueError(f"Rule '{name}': a '{check}' check needs a 'min', a 'max' or both.")
+        if action == 'fill' and value is None:
+            raise ValueError(f"Rule '{name}': a 'fill' action needs a 'value'.")
+        if action == 'drop' and not (isinstance(bit, int) and 0 <= bit <= MAX_REASON_BIT):
+            raise ValueError(f"Rule '{name}': a 'drop' action needs a reason 'bit' from 0 to {MAX_REASON_BIT}.")
+
+        self.name = name
+        self.column = column
+        self.check = check
+        self.action = action
+        self.values = list(values) if values is not None else None
+        self.minimum = minimum
+        self.maximum = maximum
+        self.value = value
+        self.bit = bit if action == 'drop' else None
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a rule from its config entry."""
+        return cls(data['name'], data['column'], data['check'], data['action'], values=data.get('values'),
+                   minimum=data.get('min'), maximum=data.get('max'), value=data.get('value'), bit=data.get('bit'))
+
+    def to_dict(self):
+        """Return the rule as a config entry."""
+        data = {'name': self.name, 'column': self.column, 'check': self.check, 'action': self.action}
+        for key, attribute in (('values', self.values), ('min', self.minimum), ('max', self.maximum),
+                               ('value', self.value), ('bit', self.bit)):
+            if attribute is not None:
+                data[key] = attribute
+        return data
+
+    def passes(self, col):
+        """Return a boolean array, True for the values of `col` that pass the check."""
+        if self.check == 'not_null':
+            return ~_is_missing(col)
+
+        if self.check == 'allowed':
+            if isinstance(col.dtype, pd.CategoricalDtype):
+                # Checked once per category and spread over the rows through the codes
+                categories = col.cat.categories
+                return _by_category(col, categories.isin(self.values) | _is_missing(pd.Series(categories)), True)
+            return col.isin(self.values).to_numpy() | _is_missing(col)
+
+        values = self._comparable(col)
+        lower, upper = self._bounds()
+        fails = np.zeros(len(col), dtype=bool)
+        # Comparisons with missing values are False, so they pass
+        if lower is not None:
+            fails |= (values < lower).to_numpy(dtype=bool, na_value=False)
+        if upper is not None:
+            fails |= (values > upper).to_numpy(dtype=bool, na_value=False)
+        return ~fails
+
+    def fix(self, col):
+        """Return `col` with the values failing the check filled or clamped, for 'fill' and 'clamp' rules."""
+        if self.action == 'fill' and self.check == 'not_null':
+            return _fill_missing(col, self.value)
+
+        if self.action == 'clamp':
+            lower, upper = self._bounds()
+            return self._comparable(col).clip(lower=lower, upper=upper)
+
+        failing = ~self.passes(col)
+        if self.check == 'allowed':
+            if isinstance(col.dtype, pd.CategoricalDtype) and self.value not in col.cat.categories:
+                col = col.cat.add_categories([self.value])
+            return col.mask(failing, self.value)
+        value = pd.Timestamp(self.value) if self.check == 'date_range' else self.value
+        return self._comparable(col).mask(failing, value)
+
+    def _comparable(self, col):
+        """Return `col` as numbers ('range') or datetimes ('date_range'), unparseable values becoming missing."""
+        if self.check == 'date_range':
+            return col if pd.api.types.is_datetime64_any_dtype(col) else parse_datetime_column(col)[0]
+        return col if pd.api.types.is_numeric_dtype(col) else pd.to_numeric(col, errors='coerce')
+
+    def _bounds(self):
+        """Return the (lower, upper) bounds, with date bounds as Timestamps and 'now' resolved to the current time."""
+        if self.check != 'date_range':
+            return self.minimum, self.maximum
+        return tuple(None if bound is None else pd.Timestamp.now() if bound == 'now' else pd.Timestamp(bound)
+                     for bound in (self.minimum, self.maximum))
+
+
+class RuleSet:
+    """
+    An ordered list of cleaning rules, as declared in a rules file (see config/cleaning_rules.json).
+
+    Rule names and reason bits are unique, so a quarantined row's reason bitmask can be
+    decoded back into the names of the rules it failed with `describe`. Reason bits are
+    part of the quarantine files' contents, so a rule keeps its bit when others are added.
+    """
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+
+        names = [rule.name for rule in self.rules]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise ValueError(f"Duplicate rule names: {duplicates}.")
+        bits = [rule.bit for rule in self.rules if rule.bit is not None]
+        if len(bits) != len(set(bits)):
+            raise ValueError("Every 'drop' rule needs its own reason bit.")
+
+    def __iter__(self):
+        return iter(self.rules)
+
+    def __len__(self):
+        return len(self.rules)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(Rule.from_dict(entry) for entry in data['rules'])
+
+    def to_dict(self):
+        return {'rules': [rule.to_dict() for rule in self.rules]}
+
+    @classmethod
+    def load(cls, rules_path=DEFAULT_RULES_PATH):
+        """Load and validate the rules declared in a JSON rules file."""
+        with open(rules_path) as f:
+            return cls.from_dict(json.load(f))
+
+    def select(self, names=None):
+        """Return the rules called `names`, in the order given, or all rules; raises KeyError for unknown names."""
+        if names is None:
+            return list(self.rules)
+        by_name = {rule.name: rule for rule in self.rules}
+        unknown = [name for name in names if name not in by_name]
+        if unknown:
+            raise KeyError(f"Unknown cleaning rule(s): {unknown}.")
+        return [by_name[name] for name in names]
+
+    def describe(self, bitmask):
+        """Return the names of the 'drop' rules whose bit is set in a reason bitmask."""
+        return [rule.name for rule in self.rules if rule.bit is not None and int(bitmask) >> rule.bit & 1]
+
+    @property
+    def fingerprint(self):
+        """Short hash of the rules, which changes whenever a rule does."""
+        canonical = json.dumps(self.to_dict(), sort_keys=True)
+        return hashlib.sha256(canonical.encode()).hexdigest()[:12]
+
+
+def load_rules(rules_path=DEFAULT_RULES_PATH):
+    """Return the RuleSet of a rules file, parsed once per version of the file."""
+    return _load_rules(os.path.abspath(rules_path), os.stat(rules_path).st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=8)
+def _load_rules(rules_path, mtime_ns):
+    # Keyed on the modification time as well, so edits to the file are picked up
+    return RuleSet.load(rules_path)
+
+
+def _is_missing(col):
+    """Return a boolean array, True for nulls and, in text columns, empty strings."""
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        return _by_category(col, col.cat.categories == '', True)
+    missing = col.isna().to_numpy()
+    if pd.api.types.is_object_dtype(col) or pd.api.types.is_string_dtype(col):
+        # CSV turns empty fields into NaN, but columnar files keep them as empty strings
+        missing |= col.to_numpy(dtype=object) == ''
+    return missing
+
+
+def _by_category(col, category_values, null_value):
+    """Spread one boolean per category over the rows of a categorical column, with `null_value` for nulls."""
+    # Null rows have code -1, which picks the value appended at the end
+    return np.append(np.asarray(category_values, dtype=bool), null_value)[col.cat.codes.to_numpy()]
+
+
+def _fill_missing(col, value):
+    """Fill nulls and empty strings in `col` with `value`, keeping categorical columns categorical."""
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        if '' in col.cat.categories:
+            col = col.cat.remove_categories([''])
+        if value not in col.cat.categories:
+            col = col.cat.add_categories([value])
+        return col.fillna(value)
+    return col.where(col != '').fillna(value)
+
+
+def main():
+    """Validate a rules file and list its rules, or decode a quarantined row's reason bitmask."""
+    parser = argparse.ArgumentParser(description="Validate and list the declarative cleaning rules.")
+    parser.add_argument('--rules', default=DEFAULT_RULES_PATH, help="JSON rules file (default: %(default)s).")
+    parser.add_argument('--decode', type=int, default=None, metavar='BITMASK',
+                        help=f"Print the rules set in a '{REASON_COLUMN}' value of a quarantine file.")
+    args = parser.parse_args()
+
+    try:
+        rules = load_rules(args.rules)
+    except Exception as e:
+        print(f"An error occurred while loading the rules: {e}")
+        return
+
+    if args.decode is not None:
+        print(", ".join(rules.describe(args.decode)) or "No rule matches this bitmask.")
+        return
+
+    print(f"{len(rules)} rule(s) in '{args.rules}' (fingerprint {rules.fingerprint}):")
+    for rule in rules:
+        reason = f" (reason bit {rule.bit})" if rule.bit is not None else ""
+        print(f"  {rule.name}: {rule.check} on '{rule.column}' -> {rule.action}{reason}")
+
+# Usage: python -m src.rules [--rules config/cleaning_rules.json] [--decode BITMASK]
+if __name__ == "__main__":
+    main()
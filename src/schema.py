@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+# Version of the order schema below; bump it whenever the columns or their types change
+ORDER_SCHEMA_VERSION = 1
+
+# Columns of an order record, in file order
+ORDER_COLUMNS = [
+    'order_id', 'customer_id', 'customer_name', 'product_id', 'product_name', 'product_category',
+    'payment_type', 'qty', 'price', 'datetime', 'country', 'city', 'ecommerce_website_name',
+    'payment_txn_id', 'payment_txn_success', 'failure_reason'
+]
+
+# Low-cardinality string columns, stored as pandas categoricals
+CATEGORICAL_COLUMNS = [
+    'customer_name', 'product_name', 'product_category', 'payment_type', 'country', 'city',
+    'ecommerce_website_name', 'payment_txn_success', 'failure_reason'
+]
+
+# Timestamp columns, stored as text in CSV files
+DATETIME_COLUMNS = ['datetime']
+
+# Narrowest integer type that holds every valid value of each integer column
+INTEGER_DTYPES = {
+    'order_id': 'int64',
+    'customer_id': 'int16',        # 100 - 200
+    'product_id': 'int16',         # 200 - 300
+    'qty': 'int8',                 # -49 - 50, negatives are rogue values
+    'price': 'int16',              # 5 - 10000
+    'payment_txn_id': 'int32'      # 10000 - 99999
+}
+
+# dtype argument for pd.read_csv, so categoricals are built while parsing
+CSV_READ_DTYPES = {column: 'category' for column in CATEGORICAL_COLUMNS}
+
+
+def _fits_dtype(col, dtype):
+    """Return True if an integer-valued column can be cast to `dtype` without loss."""
+    if not pd.api.types.is_numeric_dtype(col) or col.isna().any():
+        return False
+    if len(col) == 0:
+        return True
+
+    values = col.to_numpy()
+    if not pd.api.types.is_integer_dtype(col) and not np.array_equal(values, np.round(values)):
+        return False
+    info = np.iinfo(dtype)
+    return info.min <= values.min() and values.max() <= info.max
+
+
+def apply_order_schema(df):
+    """
+    Return `df` with the compact order schema applied.
+
+    String columns become categoricals and integer columns are narrowed to their schema
+    dtype. Columns that cannot be converted safely, for example integers with missing or
+    out-of-range values in raw data, are left as they are so the cleaner can still see them.
+    Columns that are not part of the schema are kept unchanged.
+    """
+    df = df.copy(deep=False)
+
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype('category')
+
+    for column, dtype in INTEGER_DTYPES.items():
+        if column in df.columns and df[column].dtype != dtype and _fits_dtype(df[column], dtype):
+            df[column] = df[column].astype(dtype)
+
+    return df
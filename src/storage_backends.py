@@ -0,0 +1,229 @@
+import base64
+import contextlib
+import hashlib
+import io
+import os
+import shutil
+import threading
+
+# Size of each request of a streaming GCS upload; must be a multiple of 256 KB
+STREAM_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Block size used when checksumming files, so large files are never read into memory at once
+CHECKSUM_BLOCK_SIZE = 1024 * 1024
+
+
+def compute_checksums(fileobj):
+    """
+    Return the MD5 and CRC32C of a binary file object, base64-encoded as GCS reports them.
+
+    CRC32C needs the 'google-crc32c' package, which google-cloud-storage installs; without
+    it the 'crc32c' entry is None.
+    """
+    try:
+        import google_crc32c
+        crc32c = google_crc32c.Checksum()
+    except ImportError:
+        crc32c = None
+
+    md5 = hashlib.md5()
+    for block in iter(lambda: fileobj.read(CHECKSUM_BLOCK_SIZE), b''):
+        md5.update(block)
+        if crc32c is not None:
+            crc32c.update(block)
+
+    return {
+        'md5': base64.b64encode(md5.digest()).decode('ascii'),
+        'crc32c': base64.b64encode(crc32c.digest()).decode('ascii') if crc32c is not None else None
+    }
+
+
+class StorageBackend:
+    """
+    Minimal object-storage interface used by GCSUploader.
+
+    Implementations exist for Google Cloud Storage, a local folder and an in-process
+    dictionary, so upload code can be exercised without a real bucket.
+    """
+
+    def upload_file(self, bucket_name, source_file_name, blob_name, content_type=None):
+        """Upload a local file to `blob_name`."""
+        raise NotImplementedError
+
+    def upload_bytes(self, bucket_name, data, blob_name, content_type=None):
+        """Upload an in-memory bytes object to `blob_name`."""
+        raise NotImplementedError
+
+    def compose(self, bucket_name, source_blob_names, blob_name, content_type=None):
+        """Concatenate existing blobs, in order, into `blob_name`."""
+        raise NotImplementedError
+
+    def open_writer(self, bucket_name, blob_name, content_type=None, content_encoding=None):
+        """
+        Context manager yielding a binary file object that streams its writes to `blob_name`.
+
+        The blob is only created once the block exits without an error; if it raises, the
+        partial upload is abandoned and an existing blob of that name is left untouched.
+        """
+        raise NotImplementedError
+
+    def get_checksums(self, bucket_name, blob_name):
+        """Return the blob's checksums as a dict with base64 'md5' and 'crc32c', or None if it does not exist."""
+        raise NotImplementedError
+
+    def delete(self, bucket_name, blob_name):
+        """Delete `blob_name`, ignoring blobs that do not exist."""
+        raise NotImplementedError
+
+
+class GCSBackend(StorageBackend):
+    """Storage backend for Google Cloud Storage, wrapping a google.cloud.storage.Client."""
+
+    def __init__(self, storage_client):
+        self.storage_client = storage_client
+
+    def _blob(self, bucket_name, blob_name):
+        return self.storage_client.bucket(bucket_name).blob(blob_name)
+
+    def upload_file(self, bucket_name, source_file_name, blob_name, content_type=None):
+        self._blob(bucket_name, blob_name).upload_from_filename(source_file_name, content_type=content_type)
+
+    def upload_bytes(self, bucket_name, data, blob_name, content_type=None):
+        self._blob(bucket_name, blob_name).upload_from_string(data, content_type=content_type)
+
+    def compose(self, bucket_name, source_blob_names, blob_name, content_type=None):
+        bucket = self.storage_client.bucket(bucket_name)
+        destination = bucket.blob(blob_name)
+        destination.content_type = content_type
+        destination.compose([bucket.blob(name) for name in source_blob_names])
+
+    @contextlib.contextmanager
+    def open_writer(self, bucket_name, blob_name, content_type=None, content_encoding=None):
+        blob = self._blob(bucket_name, blob_name)
+        blob.content_encoding = content_encoding
+        # Resumable upload sent in STREAM_CHUNK_SIZE pieces; flush() is a no-op, as GCS only accepts full chunks
+        writer = blob.open('wb', content_type=content_type, chunk_size=STREAM_CHUNK_SIZE, ignore_flush=True)
+        yield writer
+        # Only finalize on success; an unfinished resumable upload never becomes a blob
+        writer.close()
+
+    def get_checksums(self, bucket_name, blob_name):
+        # Reads the blob's metadata only; composite blobs have a CRC32C but no MD5
+        blob = self.storage_client.bucket(bucket_name).get_blob(blob_name)
+        if blob is None:
+            return None
+        return {'md5': blob.md5_hash, 'crc32c': blob.crc32c}
+
+    def delete(self, bucket_name, blob_name):
+        from google.api_core.exceptions import NotFound
+        try:
+            self._blob(bucket_name, blob_name).delete()
+        except NotFound:
+            pass
+
+
+class LocalFileSystemBackend(StorageBackend):
+    """Storage backend that keeps each bucket as a folder under `root_path`."""
+
+    def __init__(self, root_path):
+        self.root_path = root_path
+
+    def _path(self, bucket_name, blob_name):
+        path = os.path.join(self.root_path, bucket_name, *blob_name.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def upload_file(self, bucket_name, source_file_name, blob_name, content_type=None):
+        shutil.copyfile(source_file_name, self._path(bucket_name, blob_name))
+
+    def upload_bytes(self, bucket_name, data, blob_name, content_type=None):
+        with open(self._path(bucket_name, blob_name), 'wb') as f:
+            f.write(data)
+
+    def compose(self, bucket_name, source_blob_names, blob_name, content_type=None):
+        # Build the result next to the destination first, as a source may also be the destination
+        destination = self._path(bucket_name, blob_name)
+        temp_path = f"{destination}.composing"
+        with open(temp_path, 'wb') as composed:
+            for source_blob_name in source_blob_names:
+                with open(self._path(bucket_name, source_blob_name), 'rb') as source:
+                    shutil.copyfileobj(source, composed)
+        os.replace(temp_path, destination)
+
+    @contextlib.contextmanager
+    def open_writer(self, bucket_name, blob_name, content_type=None, content_encoding=None):
+        destination = self._path(bucket_name, blob_name)
+        temp_path = f"{destination}.writing"
+        try:
+            with open(temp_path, 'wb') as f:
+                yield f
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        os.replace(temp_path, destination)
+
+    def get_checksums(self, bucket_name, blob_name):
+        path = os.path.join(self.root_path, bucket_name, *blob_name.split('/'))
+        if not os.path.isfile(path):
+            return None
+        with open(path, 'rb') as f:
+            return compute_checksums(f)
+
+    def delete(self, bucket_name, blob_name):
+        bucket_path = os.path.join(self.root_path, bucket_name)
+        path = os.path.join(bucket_path, *blob_name.split('/'))
+        if os.path.exists(path):
+            os.remove(path)
+
+        # Remove folders left empty by the deleted blob, like a bucket has no empty "directories"
+        folder = os.path.dirname(path)
+        while folder != bucket_path and os.path.isdir(folder) and not os.listdir(folder):
+            os.rmdir(folder)
+            folder = os.path.dirname(folder)
+
+
+class InMemoryBackend(StorageBackend):
+    """Thread-safe fake bucket store that keeps blobs in a dict; useful for tests and benchmarks."""
+
+    def __init__(self):
+        self.buckets = {}
+        self.content_types = {}
+        self._lock = threading.Lock()
+
+    def _put(self, bucket_name, blob_name, data, content_type):
+        with self._lock:
+            self.buckets.setdefault(bucket_name, {})[blob_name] = data
+            self.content_types[(bucket_name, blob_name)] = content_type
+
+    def get_bytes(self, bucket_name, blob_name):
+        """Return the content of a stored blob."""
+        with self._lock:
+            return self.buckets[bucket_name][blob_name]
+
+    def upload_file(self, bucket_name, source_file_name, blob_name, content_type=None):
+        with open(source_file_name, 'rb') as f:
+            self._put(bucket_name, blob_name, f.read(), content_type)
+
+    def upload_bytes(self, bucket_name, data, blob_name, content_type=None):
+        self._put(bucket_name, blob_name, bytes(data), content_type)
+
+    def compose(self, bucket_name, source_blob_names, blob_name, content_type=None):
+        data = b''.join(self.get_bytes(bucket_name, name) for name in source_blob_names)
+        self._put(bucket_name, blob_name, data, content_type)
+
+    @contextlib.contextmanager
+    def open_writer(self, bucket_name, blob_name, content_type=None, content_encoding=None):
+        buffer = io.BytesIO()
+        yield buffer
+        self._put(bucket_name, blob_name, buffer.getvalue(), content_type)
+
+    def get_checksums(self, bucket_name, blob_name):
+        with self._lock:
+            data = self.buckets.get(bucket_name, {}).get(blob_name)
+        return None if data is None else compute_checksums(io.BytesIO(data))
+
+    def delete(self, bucket_name, blob_name):
+        with self._lock:
+            self.buckets.get(bucket_name, {}).pop(blob_name, None)
+            self.content_types.pop((bucket_name, blob_name), None)
+
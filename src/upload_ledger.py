@@ -0,0 +1,99 @@
+import json
+import os
+import threading
+from datetime import datetime
+from src.storage_backends import compute_checksums
+
+
+class UploadLedger:
+    """
+    Persistent record of which file contents have been uploaded to which blobs.
+
+    Uploads are keyed by bucket and blob name and store the content's MD5 and CRC32C
+    checksums, in the base64 form GCS reports them in, so content that is already in a
+    bucket can be found under any blob name. File checksums are cached by path, size and
+    modification time, so an unchanged file is not re-read to check it. The ledger is
+    shared by concurrent uploads, so all access goes through a lock.
+    """
+
+    def __init__(self, ledger_path='data/upload_ledger.json'):
+        """
+        Loads the ledger, starting an empty one if the file does not exist yet.
+
+        :param ledger_path: Path of the JSON ledger file.
+        """
+        self.ledger_path = ledger_path
+        self.uploads = {}
+        self.file_checksums = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(ledger_path):
+            with open(ledger_path) as f:
+                data = json.load(f)
+            self.uploads = data.get('uploads', {})
+            self.file_checksums = data.get('file_checksums', {})
+
+    def checksums(self, file_path):
+        """Return the checksums of a file, reusing the cached ones if the file is unchanged."""
+        stat = os.stat(file_path)
+        cache_key = os.path.abspath(file_path)
+        with self._lock:
+            cached = self.file_checksums.get(cache_key)
+        if cached and cached['size'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns:
+            return cached['checksums']
+
+        with open(file_path, 'rb') as f:
+            checksums = compute_checksums(f)
+
+        with self._lock:
+            self.file_checksums[cache_key] = {
+                'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'checksums': checksums
+            }
+        return checksums
+
+    def find_blobs(self, bucket_name, checksums):
+        """Return the blobs of `bucket_name` recorded with the same content, most recent first."""
+        with self._lock:
+            matches = [(entry['uploaded_at'], blob_name)
+                       for blob_name, entry in self.uploads.get(bucket_name, {}).items()
+                       if checksums_match(entry['checksums'], checksums)]
+        return [blob_name for _, blob_name in sorted(matches, reverse=True)]
+
+    def record(self, bucket_name, blob_name, source_file_name, checksums):
+        """Record that `source_file_name`, with these checksums, was uploaded to `blob_name`."""
+        with self._lock:
+            self.uploads.setdefault(bucket_name, {})[blob_name] = {
+                'source_file_name': source_file_name,
+                'checksums': checksums,
+                'uploaded_at': datetime.now().isoformat(timespec='seconds')
+            }
+
+    def forget(self, bucket_name, blob_name):
+        """Drop the record of a blob, e.g. one that was deleted or overwritten in the bucket."""
+        with self._lock:
+            self.uploads.get(bucket_name, {}).pop(blob_name, None)
+
+    def save(self):
+        """Write the ledger to disk atomically."""
+        directory = os.path.dirname(self.ledger_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._lock:
+            temp_path = f"{self.ledger_path}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump({'uploads': self.uploads, 'file_checksums': self.file_checksums}, f, indent=2)
+            os.replace(temp_path, self.ledger_path)
+
+
+def checksums_match(local, remote):
+    """
+    Return True if two checksum dicts describe the same content.
+
+    MD5 is compared when both sides have it; composite GCS objects only carry a CRC32C,
+    which is compared otherwise. Content with no checksum in common never matches.
+    """
+    for algorithm in ('md5', 'crc32c'):
+        if local.get(algorithm) and remote.get(algorithm):
+            return local[algorithm] == remote[algorithm]
+    return False
@@ -1,87 +1,405 @@
+import contextlib
+import functools
+import gzip
 import os
-import re
-from datetime import datetime
-from google.cloud import storage
-from google.oauth2 import service_account
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pandas as pd
+from src.cache import list_files
+from src.catalog import find_latest_artifact, record_upload
+from src.file_io import FILE_EXTENSIONS, ChunkedFrameWriter, get_file_format
+from src.metrics import stage
+from src.partitioning import find_partitions
+from src.storage_backends import GCSBackend
+from src.upload_ledger import UploadLedger, checksums_match
+
+# Content type stored on the blob for each supported file format
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.stream'
+}
+
+# Files at least this large are uploaded in parallel parts and composed server-side
+LARGE_FILE_THRESHOLD = 256 * 1024 * 1024
+DEFAULT_PART_SIZE = 32 * 1024 * 1024
+DEFAULT_UPLOAD_WORKERS = 8
+DEFAULT_MAX_RETRIES = 3
+
+# Connections kept open per host by the storage client, shared by all concurrent uploads
+HTTP_POOL_SIZE = 32
+
+# Maximum number of source blobs in one GCS compose request
+MAX_COMPOSE_SOURCES = 32
+
+# Base delay, in seconds, of the exponential backoff between retries
+RETRY_BACKOFF_SECONDS = 0.5
+
+# Compression applied to CSV streamed straight to a bucket, stored as the blob's Content-Encoding.
+# GCS decompresses gzip blobs transparently on download; zstd needs the 'zstandard' package.
+STREAM_COMPRESSIONS = ('gzip', 'zstd', None)
+GZIP_COMPRESSION_LEVEL = 6
 
 class GCSUploader:
-    def __init__(self, project_id, service_account_key_path):
+    def __init__(self, project_id=None, service_account_key_path=None, backend=None, ledger=None):
         """
         Initializes the GCSUploader with the project ID and service account key file.
 
         :param project_id: GCP project ID.
         :param service_account_key_path: Path to the service account key file.
+        :param backend: Optional StorageBackend to upload through instead of GCS, e.g. a
+                        LocalFileSystemBackend or InMemoryBackend for tests.
+        :param ledger: UploadLedger recording uploaded content; defaults to 'data/upload_ledger.json'.
         """
         self.project_id = project_id
-        self.credentials = service_account.Credentials.from_service_account_file(service_account_key_path)
-        self.storage_client = storage.Client(credentials=self.credentials, project=self.project_id)
+        self.ledger = ledger or UploadLedger()
 
-    def upload_file(self, bucket_name, source_file_name, destination_blob_name):
+        if backend is None:
+            # The Google Cloud libraries are slow to import, so load them only when an uploader is built
+            import requests
+            from google.auth.transport.requests import AuthorizedSession
+            from google.cloud import storage
+            from google.oauth2 import service_account
+
+            self.credentials = service_account.Credentials.from_service_account_file(service_account_key_path)
+
+            # One HTTP session with a connection pool large enough for concurrent uploads, so
+            # parallel requests reuse open connections instead of opening new ones
+            session = AuthorizedSession(self.credentials)
+            adapter = requests.adapters.HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount('https://', adapter)
+
+            self.storage_client = storage.Client(credentials=self.credentials, project=self.project_id,
+                                                 _http=session)
+            backend = GCSBackend(self.storage_client)
+
+        self.backend = backend
+
+    def upload_file(self, bucket_name, source_file_name, destination_blob_name, skip_unchanged=True):
         """
         Uploads a file to the specified GCS bucket.
 
+        Files of LARGE_FILE_THRESHOLD bytes or more are uploaded in parallel parts (see
+        upload_large_file); smaller files go up in a single request. With `skip_unchanged`,
+        nothing is uploaded if the bucket already holds the same content (see find_existing_blob).
+
         :param bucket_name: Name of the GCS bucket.
         :param source_file_name: Path to the file to be uploaded.
         :param destination_blob_name: The destination path in the GCS bucket.
+        :param skip_unchanged: Skip the upload if the content is already in the bucket.
+        :return: True if the file was uploaded or skipped as already present, False if an error occurred.
+        """
+        try:
+            self._upload_file(bucket_name, source_file_name, destination_blob_name, skip_unchanged)
+            return True
+
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            return False
+
+    def _upload_file(self, bucket_name, source_file_name, destination_blob_name, skip_unchanged=True):
+        """
+        Upload one file, in parts if it is large, letting any error propagate.
+
+        :return: True if the file was uploaded, False if it was skipped as already present.
+        """
+        if skip_unchanged:
+            with stage('upload.check'):
+                existing_blob_name = self.find_existing_blob(bucket_name, source_file_name, destination_blob_name)
+            if existing_blob_name:
+                print(f"File {source_file_name} is already in the bucket as {existing_blob_name}, skipping upload.")
+                return False
+
+        file_size = os.path.getsize(source_file_name)
+        with stage('upload.file', bytes_read=file_size, bytes_written=file_size):
+            checksums = self.ledger.checksums(source_file_name)
+            if file_size >= LARGE_FILE_THRESHOLD:
+                self.upload_large_file(bucket_name, source_file_name, destination_blob_name)
+            else:
+                # Upload the file, tagged with the content type of its format
+                self.backend.upload_file(bucket_name, source_file_name, destination_blob_name,
+                                         content_type=get_content_type(source_file_name))
+                print(f"File {source_file_name} uploaded to {destination_blob_name}.")
+
+        self.ledger.record(bucket_name, destination_blob_name, source_file_name, checksums)
+        self.ledger.save()
+        record_upload(bucket_name, destination_blob_name, source_file_name)
+        return True
+
+    def find_existing_blob(self, bucket_name, source_file_name, destination_blob_name=None):
+        """
+        Returns the name of a blob in the bucket that already holds this file's content.
+
+        The file's MD5/CRC32C (cached in the upload ledger) is compared with the remote
+        checksums of `destination_blob_name` and of every blob the ledger recorded with the
+        same content, so a file re-uploaded under a new, e.g. timestamped, name is found too.
+        Only blob metadata is fetched. Ledger entries whose blob was since deleted or
+        overwritten are dropped.
+
+        :param bucket_name: Name of the GCS bucket.
+        :param source_file_name: Path to the local file.
+        :param destination_blob_name: Optional blob the file is about to be uploaded to.
+        :return: Name of a blob with the same content, or None if there is none.
+        """
+        checksums = self.ledger.checksums(source_file_name)
+        recorded_blob_names = self.ledger.find_blobs(bucket_name, checksums)
+        candidates = ([destination_blob_name] if destination_blob_name else []) + recorded_blob_names
+
+        existing_blob_name = None
+        for blob_name in dict.fromkeys(candidates):
+            remote_checksums = self.backend.get_checksums(bucket_name, blob_name)
+            if remote_checksums and checksums_match(checksums, remote_checksums):
+                existing_blob_name = blob_name
+                break
+            if blob_name in recorded_blob_names:
+                self.ledger.forget(bucket_name, blob_name)
+
+        if existing_blob_name and existing_blob_name not in recorded_blob_names:
+            # Found by its remote checksums only, so remember it for next time
+            self.ledger.record(bucket_name, existing_blob_name, source_file_name, checksums)
+        self.ledger.save()
+        return existing_blob_name
+
+    def upload_files(self, bucket_name, files, max_workers=DEFAULT_UPLOAD_WORKERS, progress_callback=None,
+                     skip_unchanged=True):
+        """
+        Uploads many files concurrently through this uploader's shared storage client.
+
+        At most `max_workers` files are in flight at once. After each file finishes,
+        `progress_callback` (if given) is called with a dict holding the files and bytes
+        done so far, the totals and the aggregate throughput. Files whose content is already
+        in the bucket are counted in 'files_skipped' and their bytes are not counted as sent.
+
+        :param bucket_name: Name of the GCS bucket.
+        :param files: Iterable of local paths, or of (local path, destination blob name) tuples;
+                      a bare path is uploaded under its file name.
+        :param max_workers: Maximum number of concurrent uploads.
+        :param progress_callback: Optional callable receiving the progress dict.
+        :param skip_unchanged: Skip files whose content is already in the bucket.
+        :return: Dict mapping each destination blob name to True if it was uploaded or skipped, False otherwise.
+        """
+        uploads = [(f, os.path.basename(f)) if isinstance(f, str) else tuple(f) for f in files]
+        sizes = {source: os.path.getsize(source) if os.path.exists(source) else 0 for source, _ in uploads}
+        progress = {
+            'files_done': 0, 'files_total': len(uploads), 'files_failed': 0, 'files_skipped': 0,
+            'bytes_done': 0, 'bytes_total': sum(sizes.values()), 'elapsed_seconds': 0.0, 'mb_per_second': 0.0
+        }
+        progress_lock = threading.Lock()
+        results = {}
+        start_time = time.perf_counter()
+
+        def upload_one(source_file_name, destination_blob_name):
+            try:
+                uploaded = self._upload_file(bucket_name, source_file_name, destination_blob_name, skip_unchanged)
+                succeeded = True
+            except Exception as e:
+                print(f"An error occurred while uploading {source_file_name}: {e}")
+                uploaded = succeeded = False
+
+            with progress_lock:
+                results[destination_blob_name] = succeeded
+                progress['files_done'] += 1
+                progress['files_failed'] += 0 if succeeded else 1
+                progress['files_skipped'] += 1 if succeeded and not uploaded else 0
+                progress['bytes_done'] += sizes[source_file_name] if uploaded else 0
+                progress['elapsed_seconds'] = time.perf_counter() - start_time
+                progress['mb_per_second'] = progress['bytes_done'] / 1e6 / max(progress['elapsed_seconds'], 1e-9)
+                snapshot = dict(progress)
+            if progress_callback:
+                progress_callback(snapshot)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for future in [executor.submit(upload_one, source, destination) for source, destination in uploads]:
+                future.result()
+
+        uploaded_files = progress['files_done'] - progress['files_failed'] - progress['files_skipped']
+        print(f"Uploaded {uploaded_files} of {progress['files_total']} files "
+              f"({progress['bytes_done'] / 1e6:.1f} MB) in {progress['elapsed_seconds']:.1f}s, "
+              f"{progress['mb_per_second']:.1f} MB/s; {progress['files_skipped']} already in the bucket.")
+        return results
+
+    def upload_partitions(self, bucket_name, root, partitions=None, prefix=None, max_workers=DEFAULT_UPLOAD_WORKERS):
+        """
+        Syncs partitions of a partitioned dataset (see src.partitioning) to the bucket, keeping its layout.
+
+        Only the files of `partitions` are considered, e.g. the ones a PartitionedWriter just
+        touched, so a sync costs as much as the new data rather than the whole dataset; files
+        whose content is already in the bucket are skipped. Files removed locally are not
+        deleted from the bucket.
+
+        :param bucket_name: Name of the GCS bucket.
+        :param root: Root folder of the partitioned dataset.
+        :param partitions: Relative partition directories, e.g. 'year=2023/month=03'; defaults to all.
+        :param prefix: Blob name prefix the layout goes under; defaults to the root folder's name.
+        :param max_workers: Maximum number of concurrent uploads.
+        :return: True if every file was uploaded or skipped as already present, False otherwise.
+        """
+        if partitions is None:
+            partitions = [os.path.relpath(directory, root) for _, directory in find_partitions(root)]
+        prefix = os.path.basename(os.path.normpath(root)) if prefix is None else prefix
+
+        files = []
+        for partition in partitions:
+            directory = os.path.join(root, partition)
+            if not os.path.isdir(directory):
+                continue
+            for file_name in sorted(os.listdir(directory)):
+                if file_name.endswith(tuple(FILE_EXTENSIONS.values())):
+                    # Blob names always use '/', whatever the local path separator
+                    blob_name = '/'.join(part for part in (prefix, partition.replace(os.sep, '/'), file_name) if part)
+                    files.append((os.path.join(directory, file_name), blob_name))
+
+        print(f"Syncing {len(files)} file(s) of {len(partitions)} partition(s) to {bucket_name}...")
+        return all(self.upload_files(bucket_name, files, max_workers=max_workers).values())
+
+    def upload_frames(self, bucket_name, frames, destination_blob_name, file_format='csv', compression='gzip'):
+        """
+        Serializes DataFrames straight into a streaming blob upload, without a local file.
+
+        `frames` is a DataFrame, e.g. a DataCleaner result, or an iterable of DataFrame
+        chunks, e.g. data_cleaner.iter_cleaned_chunks, so only one chunk is held in memory.
+        CSV output is compressed on the fly; Parquet and Arrow output is already compressed
+        internally (zstd), so `compression` is ignored for them.
+
+        :param bucket_name: Name of the GCS bucket.
+        :param frames: DataFrame or iterable of DataFrames to upload.
+        :param destination_blob_name: The destination path in the GCS bucket.
+        :param file_format: 'csv' (default), 'parquet' or 'arrow'.
+        :param compression: 'gzip' (default), 'zstd' or None, for CSV output.
+        :return: True if the data was uploaded, False if an error occurred.
         """
         try:
-            # Get the bucket
-            bucket = self.storage_client.bucket(bucket_name)
+            if compression not in STREAM_COMPRESSIONS:
+                raise ValueError(f"Unsupported compression '{compression}'. Choose one of {list(STREAM_COMPRESSIONS)}.")
+            if file_format != 'csv':
+                compression = None
+            if isinstance(frames, pd.DataFrame):
+                frames = [frames]
+            # Resolved before the upload starts, so a missing compression library fails early
+            open_compressor = _get_compressor(compression)
 
-            # Create a new blob and upload the file
-            blob = bucket.blob(destination_blob_name)
-            blob.upload_from_filename(source_file_name)
+            rows = 0
+            # With lazily produced frames, e.g. cleaned chunks, this includes producing them
+            with stage('upload.stream') as record:
+                with self.backend.open_writer(bucket_name, destination_blob_name,
+                                              content_type=CONTENT_TYPES[file_format],
+                                              content_encoding=compression) as blob_file:
+                    with open_compressor(blob_file) as sink:
+                        with ChunkedFrameWriter(sink, file_format) as writer:
+                            for frame in frames:
+                                writer.write(frame)
+                                rows += len(frame)
+                    uploaded_bytes = blob_file.tell()
+                record.rows_in, record.bytes_written = rows, uploaded_bytes
 
-            print(f"File {source_file_name} uploaded to {destination_blob_name}.")
+            print(f"Streamed {rows} rows to {destination_blob_name} "
+                  f"({uploaded_bytes / 1e6:.1f} MB, {compression or 'no'} stream compression).")
+            return True
 
         except Exception as e:
-            print(f"An error occurred: {e}")
+            print(f"An error occurred while streaming to {destination_blob_name}: {e}")
+            return False
+
+    def upload_large_file(self, bucket_name, source_file_name, destination_blob_name,
+                          part_size=DEFAULT_PART_SIZE, max_workers=DEFAULT_UPLOAD_WORKERS,
+                          max_retries=DEFAULT_MAX_RETRIES):
+        """
+        Uploads a large file as parallel parts that are composed into one blob server-side.
+
+        The file is split into `part_size` byte ranges, which are uploaded concurrently as
+        temporary blobs. A failed part is retried on its own with exponential backoff, so a
+        network error never restarts the whole upload. The parts are then composed into
+        `destination_blob_name` (in rounds of at most 32, the GCS compose limit) and deleted.
+
+        :param bucket_name: Name of the GCS bucket.
+        :param source_file_name: Path to the file to be uploaded.
+        :param destination_blob_name: The destination path in the GCS bucket.
+        :param part_size: Size of each part in bytes.
+        :param max_workers: Number of parts uploaded at the same time.
+        :param max_retries: Number of retries per part before the upload is abandoned.
+        :raises Exception: The last error of a part that still failed after all retries.
+        """
+        file_size = os.path.getsize(source_file_name)
+        content_type = get_content_type(source_file_name)
+        parts_prefix = f"{destination_blob_name}.parts-{uuid.uuid4().hex[:12]}"
+        offsets = list(range(0, file_size, part_size)) or [0]
+        part_names = [f"{parts_prefix}/{i:05d}" for i in range(len(offsets))]
+        temporary_blobs = list(part_names)
+
+        def upload_part(part_name, offset):
+            with open(source_file_name, 'rb') as f:
+                f.seek(offset)
+                data = f.read(part_size)
+            _retry(lambda: self.backend.upload_bytes(bucket_name, data, part_name, content_type), max_retries)
 
-    def get_latest_cleaned_csv_file(self, folder_path='data/cleaned'):
-        """Find the latest cleaned CSV file in the given folder based on timestamp."""
         try:
-            # List all files in the folder
-            files = os.listdir(folder_path)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(upload_part, name, offset) for name, offset in zip(part_names, offsets)]
+                for future in as_completed(futures):
+                    future.result()
 
-            # Filter files that match the 'cleaned_YYYYMMDD_HHMMSS.csv' pattern
-            cleaned_files = [f for f in files if re.match(r'cleaned_\d{8}_\d{6}\.csv', f)]
+            # Compose in rounds, since a single compose call accepts at most MAX_COMPOSE_SOURCES blobs
+            round_number = 0
+            while len(part_names) > MAX_COMPOSE_SOURCES:
+                groups = [part_names[i:i + MAX_COMPOSE_SOURCES] for i in range(0, len(part_names), MAX_COMPOSE_SOURCES)]
+                part_names = []
+                for group_number, group in enumerate(groups):
+                    composed_name = f"{parts_prefix}/round{round_number}-{group_number:05d}"
+                    _retry(lambda: self.backend.compose(bucket_name, group, composed_name, content_type), max_retries)
+                    temporary_blobs.append(composed_name)
+                    part_names.append(composed_name)
+                round_number += 1
 
-            if not cleaned_files:
-                raise FileNotFoundError("No cleaned CSV files found in the specified folder.")
+            _retry(lambda: self.backend.compose(bucket_name, part_names, destination_blob_name, content_type),
+                   max_retries)
+            print(f"File {source_file_name} uploaded to {destination_blob_name} in {len(offsets)} parts.")
+        finally:
+            # Remove the temporary part blobs whether or not the upload succeeded
+            for blob_name in temporary_blobs:
+                try:
+                    self.backend.delete(bucket_name, blob_name)
+                except Exception as e:
+                    print(f"Could not delete temporary blob {blob_name}: {e}")
 
-            # Sort files by timestamp extracted from the filename
-            cleaned_files.sort(
-                key=lambda x: datetime.strptime(x.split('_')[1] + x.split('_')[2].split('.')[0], '%Y%m%d%H%M%S'),
-                reverse=True
-            )
+    def get_latest_cleaned_csv_file(self, folder_path='data/cleaned'):
+        """Find the latest cleaned CSV, Parquet or Arrow file in the given folder based on timestamp."""
+        try:
+            # Look the file up in the artifact catalog's index instead of scanning the folder
+            latest_path = find_latest_artifact('cleaned', folder_path)
+
+            if not latest_path:
+                raise FileNotFoundError("No cleaned CSV files found in the specified folder.")
 
             # Return the most recent cleaned file
-            return os.path.join(folder_path, cleaned_files[0])
+            return latest_path
 
         except Exception as e:
             print(f"An error occurred while finding the latest cleaned CSV file: {e}")
             return None
 
-    def get_latest_rogue_csv_file(self, folder_path='data/raw'):
-        """Find the latest rogue CSV file in the given folder based on timestamp."""
+    def get_all_cleaned_files(self, folder_path='data/cleaned'):
+        """Return every cleaned CSV, Parquet or Arrow file in the given folder, oldest first."""
         try:
-            # List all files in the folder
-            files = os.listdir(folder_path)
+            cleaned_files = list_files(folder_path, r'cleaned_\d{8}_\d{6}\.(csv|parquet|arrows)$')
+            return [os.path.join(folder_path, f) for f in cleaned_files]
 
-            # Filter files that match the 'rogue_YYYYMMDD_HHMMSS.csv' pattern
-            rogue_files = [f for f in files if re.match(r'rogue_\d{8}_\d{6}\.csv', f)]
+        except Exception as e:
+            print(f"An error occurred while listing the cleaned files: {e}")
+            return []
 
-            if not rogue_files:
-                raise FileNotFoundError("No rogue CSV files found in the specified folder.")
+    def get_latest_rogue_csv_file(self, folder_path='data/raw'):
+        """Find the latest rogue CSV, Parquet or Arrow file in the given folder based on timestamp."""
+        try:
+            # Look the file up in the artifact catalog's index instead of scanning the folder
+            latest_path = find_latest_artifact('raw', folder_path)
 
-            # Sort files by timestamp extracted from the filename
-            rogue_files.sort(
-                key=lambda x: datetime.strptime(x.split('_')[1] + x.split('_')[2].split('.')[0], '%Y%m%d%H%M%S'),
-                reverse=True
-            )
+            if not latest_path:
+                raise FileNotFoundError("No rogue CSV files found in the specified folder.")
 
             # Return the most recent rogue file
-            return os.path.join(folder_path, rogue_files[0])
+            return latest_path
 
         except Exception as e:
             print(f"An error occurred while finding the latest rogue CSV file: {e}")
@@ -103,10 +421,55 @@ class GCSUploader:
             print("Invalid choice. Please choose 'C' for cleaned, 'R' for rogue, or 'B' for both.")
             return None, None
 
-# Example usage of the class:
+@functools.lru_cache(maxsize=None)
+def get_uploader(project_id, service_account_key_path):
+    """
+    Return a process-wide GCSUploader for these credentials, creating it on first use.
+
+    Reusing one uploader avoids re-reading the service account key and rebuilding the
+    storage client (and its connection pool) for every upload.
+    """
+    return GCSUploader(project_id=project_id, service_account_key_path=service_account_key_path)
+
+def _retry(operation, max_retries):
+    """Run `operation`, retrying it up to `max_retries` times with exponential backoff."""
+    for attempt in range(max_retries + 1):
+        try:
+            return operation()
+        except Exception:
+            if attempt == max_retries:
+                raise
+            time.sleep(RETRY_BACKOFF_SECONDS * 2 ** attempt)
+
+def _get_compressor(compression):
+    """
+    Return a function wrapping a binary file object in a compressing stream for `compression`.
+
+    The stream is a context manager that finishes the compressed data on exit but leaves
+    the wrapped file object open.
+    """
+    if compression == 'gzip':
+        # mtime=0 keeps the output identical for identical data
+        return lambda fileobj: gzip.GzipFile(fileobj=fileobj, mode='wb', compresslevel=GZIP_COMPRESSION_LEVEL, mtime=0)
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError("zstd compression needs the 'zstandard' package: pip install zstandard") from e
+        return lambda fileobj: zstandard.ZstdCompressor().stream_writer(fileobj, closefd=False)
+    return contextlib.nullcontext
+
+def get_content_type(file_path):
+    """Return the content type for a CSV, Parquet or Arrow file, or None for other files."""
+    try:
+        return CONTENT_TYPES[get_file_format(file_path)]
+    except ValueError:
+        return None
+
+# Usage: python -m src.upload_to_gcs
 if __name__ == "__main__":
-    # Instantiate the GCSUploader
-    uploader = GCSUploader(
+    # Get the shared GCSUploader
+    uploader = get_uploader(
         project_id="batch5",
         service_account_key_path="C:\\Users\\yeruv\\Downloads\\projectp2-437312-1236b25e88e2.json"
     )
@@ -116,14 +479,13 @@ if __name__ == "__main__":
 
     # Handle single file upload or both files upload
     if isinstance(file_choice, tuple) and isinstance(file_choice[0], tuple):
-        # Upload both cleaned and rogue files
-        for file_path, destination_blob_name in file_choice:
-            if file_path:
-                # Upload the selected file
-                bucket_name = "revbucketgen"
-                uploader.upload_file(bucket_name, file_path, destination_blob_name)
-            else:
-                print("No files found to upload.")
+        # Upload both cleaned and rogue files concurrently
+        files_to_upload = [(file_path, blob_name) for file_path, blob_name in file_choice if file_path]
+        if files_to_upload:
+            bucket_name = "revbucketgen"
+            uploader.upload_files(bucket_name, files_to_upload)
+        else:
+            print("No files found to upload.")
     else:
         latest_csv_path, destination_blob_name = file_choice
         if latest_csv_path:
@@ -1,12 +1,16 @@
 import tkinter as tk
 from tkinter import messagebox
-import pandas as pd
 import os
 from datetime import datetime
 from src.rogue_record_generator import RogueRecordGenerator
-from src.data_cleaner import DataCleaner
+from src.data_cleaner import clean_raw_file
 from src.data_cleaner import get_latest_rogue_csv_file
-from src.upload_to_gcs import GCSUploader  # Import the GCSUploader from the upload_to_gcs module
+from src.catalog import record_artifact  # Files written here are added to the artifact catalog
+from src.upload_to_gcs import get_uploader  # Shared GCSUploader from the upload_to_gcs module
+from src.jobs import CANCELLED, DONE, RUNNING, get_job_runner, pipeline_stage, upload_stage
+
+# How often, in milliseconds, the window refreshes the progress of background jobs
+JOB_POLL_INTERVAL_MS = 200
 
 class DataProcessingApp:
     def __init__(self, master):
@@ -27,9 +31,18 @@ class DataProcessingApp:
         self.run_all_button = tk.Button(master, text="Run All Processes", command=self.run_all_processes)
         self.run_all_button.pack(pady=10)
 
+        # Cancels the running background job
+        self.cancel_button = tk.Button(master, text="Cancel Job", command=self.cancel_job, state=tk.DISABLED)
+        self.cancel_button.pack(pady=10)
+
         self.quit_button = tk.Button(master, text="Quit", command=master.quit)
         self.quit_button.pack(pady=10)
 
+        # Progress of background jobs
+        self.status_label = tk.Label(master, text="")
+        self.status_label.pack(pady=10)
+        self.jobs = []
+
     def generate_records(self):
         """Method to generate rogue records and save to CSV."""
         try:
@@ -42,6 +55,7 @@ class DataProcessingApp:
             filename = f"rogue_{timestamp}.csv"
             # Save to the specified directory
             rogue_df.to_csv(os.path.join('data', 'raw', filename), index=False)
+            record_artifact(os.path.join('data', 'raw', filename), 'raw', rows=len(rogue_df))
         
             messagebox.showinfo("Success", f"Rogue records generated and saved to 'data/raw/{filename}'")
         except Exception as e:
@@ -52,17 +66,11 @@ class DataProcessingApp:
         try:
             latest_csv_path = get_latest_rogue_csv_file()
             if latest_csv_path:
-                df_with_rogue_records = pd.read_csv(latest_csv_path)
-                cleaner = DataCleaner(df_with_rogue_records)
-
-                cleaner.perform_eda()\
-                       .clean_missing_customer_name()\
-                       .clean_invalid_payment_type()\
-                       .clean_negative_qty()\
-                       .clean_datetime_format()
-
-                cleaner.save_cleaned_data('data/cleaned/cleaned.csv')
-                messagebox.showinfo("Success", f"Data cleaned and saved to 'data/cleaned/cleaned.csv'")
+                # Raw files that were already cleaned are skipped and their cleaned output reused
+                cleaned_file_path = clean_raw_file(latest_csv_path, 'data/cleaned/cleaned.csv')
+                if not cleaned_file_path:
+                    raise RuntimeError(f"Cleaning '{latest_csv_path}' failed.")
+                messagebox.showinfo("Success", f"Data cleaned and saved to '{cleaned_file_path}'")
             else:
                 messagebox.showwarning("Warning", "No rogue files found to process.")
         except Exception as e:
@@ -71,7 +79,7 @@ class DataProcessingApp:
     def upload_to_gcs(self):
         """Method to upload the latest cleaned or rogue CSV file to GCS."""
         try:
-            uploader = GCSUploader(
+            uploader = get_uploader(
                 project_id="batch5",  # replace with your project ID
                 service_account_key_path="C:\\Users\\yeruv\\Downloads\\projectp2-437312-1236b25e88e2.json"  # replace with your service account key path
             )
@@ -79,23 +87,73 @@ class DataProcessingApp:
 
             if latest_csv_path:
                 bucket_name = "revbucketgen"  # replace with your bucket name
-                uploader.upload_file(bucket_name, latest_csv_path, destination_blob_name)
-                messagebox.showinfo("Success", f"Uploaded {destination_blob_name} to GCS.")
+                if uploader.upload_file(bucket_name, latest_csv_path, destination_blob_name):
+                    messagebox.showinfo("Success", f"Uploaded {destination_blob_name} to GCS.")
+                else:
+                    messagebox.showerror("Error", f"Uploading '{latest_csv_path}' failed.")
             else:
                 messagebox.showwarning("Warning", "No files found to upload.")
         except Exception as e:
             messagebox.showerror("Error", str(e))
 
     def run_all_processes(self):
-        """Method to run all processes: generate records, clean data, and upload to GCS."""
+        """Method to queue a background job that generates records, cleans them and uploads the cleaned file to GCS."""
         try:
-            self.generate_records()
-            self.clean_data()
-            self.upload_to_gcs()
-            messagebox.showinfo("Success", "All processes completed successfully.")
+            uploader = get_uploader(
+                project_id="batch5",  # replace with your project ID
+                service_account_key_path="C:\\Users\\yeruv\\Downloads\\projectp2-437312-1236b25e88e2.json"  # replace with your service account key path
+            )
+            bucket_name = "revbucketgen"  # replace with your bucket name
+
+            # The job runs on a worker thread, so the window stays responsive; more jobs wait in its queue
+            job = get_job_runner().submit("Run All Processes", [
+                # Generates and cleans in overlapping chunks; its cleaned file is the 'clean' result uploaded next
+                pipeline_stage(num_records=10000, rogue_prob=0.1, file_path_prefix='data/cleaned/cleaned.csv'),
+                upload_stage(uploader, bucket_name, "cleaned.csv")
+            ])
+            self.jobs.append(job)
+            if len(self.jobs) == 1:
+                self.master.after(JOB_POLL_INTERVAL_MS, self.poll_jobs)
+            self.update_status()
         except Exception as e:
             messagebox.showerror("Error", str(e))
 
+    def poll_jobs(self):
+        """Method to report finished jobs and refresh the progress line; runs on the Tk thread."""
+        for job in [job for job in self.jobs if job.finished]:
+            self.jobs.remove(job)
+            progress = job.progress()
+            if progress['status'] == DONE:
+                messagebox.showinfo("Success", f"All processes completed successfully in {progress['elapsed_seconds']:.1f}s.")
+            elif progress['status'] == CANCELLED:
+                messagebox.showwarning("Warning", "The job was cancelled.")
+            else:
+                messagebox.showerror("Error", progress['error'])
+
+        self.update_status()
+        if self.jobs:
+            self.master.after(JOB_POLL_INTERVAL_MS, self.poll_jobs)
+
+    def update_status(self):
+        """Method to show the stage, rows and throughput of the running job."""
+        running_job = next((job for job in self.jobs if job.status == RUNNING), None)
+        queued_jobs = len(self.jobs) - (1 if running_job else 0)
+
+        text = ""
+        if running_job:
+            progress = running_job.progress()
+            text = (f"{progress['name']}: {progress['stage']} ({progress['stage_number']}/{progress['stages_total']}), "
+                    f"{progress['stage_rows']} rows at {progress['rows_per_second']:.0f} rows/s")
+        if queued_jobs:
+            text += f"\n{queued_jobs} job(s) queued"
+        self.status_label.config(text=text.strip())
+        self.cancel_button.config(state=tk.NORMAL if self.jobs else tk.DISABLED)
+
+    def cancel_job(self):
+        """Method to cancel the oldest unfinished background job."""
+        if self.jobs:
+            self.jobs[0].cancel()
+
 
 # Initialize the application
 if __name__ == "__main__":
@@ -1,11 +1,11 @@
 import streamlit as st
-import pandas as pd
 import os
 from datetime import datetime
 from src.rogue_record_generator import RogueRecordGenerator
-from src.data_cleaner import DataCleaner
+from src.data_cleaner import clean_raw_file
 from src.data_cleaner import get_latest_rogue_csv_file
-from src.upload_to_gcs import GCSUploader  # Import the GCSUploader from the upload_to_gcs module
+from src.catalog import record_artifact  # Files written here are added to the artifact catalog
+from src.upload_to_gcs import get_uploader  # Shared GCSUploader from the upload_to_gcs module
 
 # Title of the app
 st.title("E-Com Data Analytics Workflow")
@@ -22,6 +22,7 @@ if st.button("Generate Rogue Records"):
         filename = f"rogue_{timestamp}.csv"
         # Save to the specified directory
         rogue_df.to_csv(os.path.join('data', 'raw', filename), index=False)
+        record_artifact(os.path.join('data', 'raw', filename), 'raw', rows=len(rogue_df))
         
         st.success(f"Rogue records generated and saved to 'data/raw/{filename}'")
     except Exception as e:
@@ -32,17 +33,10 @@ if st.button("Clean Data"):
     try:
         latest_csv_path = get_latest_rogue_csv_file()
         if latest_csv_path:
-            df_with_rogue_records = pd.read_csv(latest_csv_path)
-            cleaner = DataCleaner(df_with_rogue_records)
-
-            cleaner.perform_eda()\
-                   .clean_missing_customer_name()\
-                   .clean_invalid_payment_type()\
-                   .clean_negative_qty()\
-                   .clean_datetime_format()
-
-            cleaned_file_path = 'data/cleaned/cleaned.csv'
-            cleaner.save_cleaned_data(cleaned_file_path)
+            # Raw files that were already cleaned are skipped and their cleaned output reused
+            cleaned_file_path = clean_raw_file(latest_csv_path, 'data/cleaned/cleaned.csv')
+            if not cleaned_file_path:
+                raise RuntimeError(f"Cleaning '{latest_csv_path}' failed.")
             st.success(f"Data cleaned and saved to '{cleaned_file_path}'")
         else:
             st.warning("No rogue files found to process.")
@@ -52,7 +46,7 @@ if st.button("Clean Data"):
 # Button to upload to GCS
 if st.button("Upload to GCS"):
     try:
-        uploader = GCSUploader(
+        uploader = get_uploader(
             project_id="batch5",  # replace with your project ID
             service_account_key_path="C:\\Users\\yeruv\\Downloads\\projectp2-437312-1236b25e88e2.json"  # replace with your service account key path
         )
@@ -60,8 +54,10 @@ if st.button("Upload to GCS"):
 
         if latest_csv_path:
             bucket_name = "revbucketgen"  # replace with your bucket name
-            uploader.upload_file(bucket_name, latest_csv_path, destination_blob_name)
-            st.success(f"Uploaded {destination_blob_name} to GCS.")
+            if uploader.upload_file(bucket_name, latest_csv_path, destination_blob_name):
+                st.success(f"Uploaded {destination_blob_name} to GCS.")
+            else:
+                st.error(f"Uploading '{latest_csv_path}' failed.")
         else:
             st.warning("No files found to upload.")
     except Exception as e:
@@ -76,29 +72,24 @@ if st.button("Run All Processes"):
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"rogue_{timestamp}.csv"
         rogue_df.to_csv(os.path.join('data', 'raw', filename), index=False)
+        record_artifact(os.path.join('data', 'raw', filename), 'raw', rows=len(rogue_df))
 
         latest_csv_path = get_latest_rogue_csv_file()
         if latest_csv_path:
-            df_with_rogue_records = pd.read_csv(latest_csv_path)
-            cleaner = DataCleaner(df_with_rogue_records)
-
-            cleaner.perform_eda()\
-                   .clean_missing_customer_name()\
-                   .clean_invalid_payment_type()\
-                   .clean_negative_qty()\
-                   .clean_datetime_format()
-
-            cleaned_file_path = 'data/cleaned/cleaned.csv'
-            cleaner.save_cleaned_data(cleaned_file_path)
+            # Raw files that were already cleaned are skipped and their cleaned output reused
+            cleaned_file_path = clean_raw_file(latest_csv_path, 'data/cleaned/cleaned.csv')
+            if not cleaned_file_path:
+                raise RuntimeError(f"Cleaning '{latest_csv_path}' failed.")
 
-            uploader = GCSUploader(
+            uploader = get_uploader(
                 project_id="batch5",  
                 service_account_key_path="C:\\Users\\yeruv\\Downloads\\projectp2-437312-1236b25e88e2.json"  
             )
             latest_csv_path, destination_blob_name = uploader.choose_file_to_upload()
             if latest_csv_path:
                 bucket_name = "revbucketgen"  
-                uploader.upload_file(bucket_name, latest_csv_path, destination_blob_name)
+                if not uploader.upload_file(bucket_name, latest_csv_path, destination_blob_name):
+                    raise RuntimeError(f"Uploading '{latest_csv_path}' failed.")
 
             st.success("All processes completed successfully.")
         else: